@@ -3,16 +3,16 @@ using std::find;
 using std::sort;
 
 #include <iostream>
-#include <fstream>
 #include <locale>
 #include <map>
+#include <mutex>
 #include <sstream>
+#include <stdexcept>
 #include <string>
+#include <tuple>
 
 #include <util/Lists.hpp>
 #include <util/Strings.hpp>
-#include <util/OS.hpp>
-using util::OS;
 
 #include <basic/Dynamic_Array.h>
 #include <basic/Iterator.h>
@@ -22,6 +22,7 @@ using util::OS;
 #include <omega/closure.h>
 #include <omega/reach.h>
 #include <codegen.h>
+#include <code_gen/CG.h>
 #include <omega/parser/parser.tab.hh>
 
 using namespace omega;
@@ -39,6 +40,9 @@ namespace py = pybind11;
 int omega_run(std::istream *is, std::ostream *os);
 
 namespace omega {
+// An affine constraint sum(coefs[var] * var) + constant >= 0, or == 0 when the flag is set.
+typedef std::tuple<map<string, long>, long, bool> AffineConstraint;
+
 struct UninterpFunc {
     string name;
     vector<string> args;
@@ -93,6 +97,16 @@ struct UninterpFunc {
 
 struct OmegaLib {
 protected:
+    // The calculator parser (omega_run) and the Omega library keep global state,
+    // so at most one thread may be inside them at a time.
+    static std::mutex& omega_mutex() {
+        static std::mutex mutex;
+        return mutex;
+    }
+
+    // Guards the per-instance iterator and uninterpreted function state.
+    mutable std::mutex _mutex;
+
     vector<string> _kwords = {"exists", "union", "intersection", "complement", "compose", "inverse",
                               "domain", "range", "hull", "codegen", "farkas", "forall", "given", "and",
                               "or", "not", "within", "subsetof", "supersetof", "symbolic"};
@@ -368,27 +382,66 @@ protected:
         }
     }
 
-    void omega_cmd(const string& code, ostream& os) {
-        string exec = "/usr/local/bin/omegacalc";
-        string file = "/tmp/omega.in";
+    Variable_ID affine_var(Relation& rel, const string& name, const vector<string>& inputs,
+                           const vector<string>& outputs, const map<string, int>& functions,
+                           map<string, Free_Var_Decl*>& decls) {
+        int pos = Lists::index<string>(inputs, name);
+        if (pos >= 0) {
+            return rel.is_set() ? rel.set_var(pos + 1) : rel.input_var(pos + 1);
+        }
+        pos = Lists::index<string>(outputs, name);
+        if (pos >= 0) {
+            return rel.output_var(pos + 1);
+        }
 
-        ofstream ofs(file.c_str());
-        ofs << code << endl;
-        ofs.close();
+        auto fiter = functions.find(name);
+        int arity = fiter != functions.end() ? fiter->second : 0;
+        auto diter = decls.find(name);
+        if (diter == decls.end()) {
+            Free_Var_Decl* decl = arity > 0 ? new Free_Var_Decl(name, arity) : new Free_Var_Decl(name);
+            diter = decls.insert({name, decl}).first;
+        }
+        if (arity > 0) {
+            if (arity > (int) inputs.size()) {
+                throw std::invalid_argument("arity of '" + name + "' exceeds its input tuple");
+            }
+            return rel.get_local(diter->second, Input_Tuple);
+        }
+        return rel.get_local(diter->second);
+    }
 
-        string cmd = exec + " " + file;
-        string res = OS::run(cmd);
-        os << res;
+    void add_constraints(Relation& rel, const vector<AffineConstraint>& constraints,
+                         const vector<string>& inputs, const vector<string>& outputs,
+                         const map<string, int>& functions, map<string, Free_Var_Decl*>& decls) {
+        F_And* root = rel.add_and();
+        for (const AffineConstraint& constraint : constraints) {
+            const map<string, long>& coefs = std::get<0>(constraint);
+            if (std::get<2>(constraint)) {
+                EQ_Handle handle = root->add_EQ();
+                for (const auto& coef : coefs) {
+                    handle.update_coef(affine_var(rel, coef.first, inputs, outputs, functions, decls), coef.second);
+                }
+                handle.update_const(std::get<1>(constraint));
+            } else {
+                GEQ_Handle handle = root->add_GEQ();
+                for (const auto& coef : coefs) {
+                    handle.update_coef(affine_var(rel, coef.first, inputs, outputs, functions, decls), coef.second);
+                }
+                handle.update_const(std::get<1>(constraint));
+            }
+        }
     }
 
 public:
     OmegaLib() {}
 
     vector<string> in_iterators() const {
+        std::lock_guard<std::mutex> guard(_mutex);
         return _iterators;
     }
 
     vector<string> out_iterators() const {
+        std::lock_guard<std::mutex> guard(_mutex);
         vector<string> outiters;
         for (unsigned i = 0; i < _iterators.size(); i++) {
             outiters.emplace_back("t" + to_string(i + 1));
@@ -401,6 +454,7 @@ public:
                    map<string, vector<string> >& schedmap,
                    const vector<string>& names_in = {},
                    const vector<string>& givens_in = {}) {
+        std::unique_lock<std::mutex> guard(_mutex);
         string symlist;
         string givens;
         string cgexpr;
@@ -489,6 +543,7 @@ public:
         }
 
         // cerr << oss.str();
+        guard.unlock();
         return run(oss.str(), nstatements);
     }
 
@@ -497,7 +552,10 @@ public:
         if (!code.empty()) {
             istringstream iss(code);
             ostringstream oss;
-            omega_run(&iss, &oss);
+            {
+                std::lock_guard<std::mutex> guard(omega_mutex());
+                omega_run(&iss, &oss);
+            }
             lines = Strings::filter(Strings::split(oss.str(), '\n'), PROMPT, true);
         } else {
             for (unsigned i = 0; i < nstatements; i++) {
@@ -508,7 +566,73 @@ public:
         return Strings::join(lines, "\n");
     }
 
+    // Builds the iteration spaces and transformations as Omega relations and scans
+    // them with CodeGen+, without rendering them to calculator text first.
+    string codegen_affine(const vector<vector<string> >& iterators,
+                          const vector<vector<AffineConstraint> >& domains,
+                          const vector<vector<string> >& outputs,
+                          const vector<vector<AffineConstraint> >& xforms,
+                          const vector<AffineConstraint>& known = {},
+                          const map<string, int>& functions = {}) {
+        unsigned nstatements = domains.size();
+        if (iterators.size() != nstatements || outputs.size() != nstatements || xforms.size() != nstatements) {
+            throw std::invalid_argument("mismatched number of spaces and transformations");
+        }
+
+        std::lock_guard<std::mutex> guard(omega_mutex());
+        map<string, Free_Var_Decl*> decls;
+        string code;
+        try {
+            vector<Relation> spaces;
+            vector<Relation> transforms;
+            for (unsigned n = 0; n < nstatements; n++) {
+                Relation space(iterators[n].size());
+                for (unsigned i = 0; i < iterators[n].size(); i++) {
+                    space.name_set_var(i + 1, iterators[n][i]);
+                }
+                add_constraints(space, domains[n], iterators[n], {}, functions, decls);
+                space.finalize();
+                spaces.push_back(space);
+
+                Relation xform(iterators[n].size(), outputs[n].size());
+                for (unsigned i = 0; i < iterators[n].size(); i++) {
+                    xform.name_input_var(i + 1, iterators[n][i]);
+                }
+                for (unsigned i = 0; i < outputs[n].size(); i++) {
+                    xform.name_output_var(i + 1, outputs[n][i]);
+                }
+                add_constraints(xform, xforms[n], iterators[n], outputs[n], {}, decls);
+                xform.finalize();
+                transforms.push_back(xform);
+            }
+
+            Relation context(0);
+            add_constraints(context, known, {}, {}, {}, decls);
+            context.finalize();
+
+            CodeGen cg(transforms, spaces, context);
+            CG_result* result = cg.buildAST();
+            if (result != NULL) {
+                code = result->printString();
+                delete result;
+            } else {
+                code = "/* empty */";
+            }
+        } catch (...) {
+            for (auto& decl : decls) {
+                delete decl.second;
+            }
+            throw;
+        }
+
+        for (auto& decl : decls) {
+            delete decl.second;
+        }
+        return Strings::rtrim(code);
+    }
+
     map<string, string> macros() {
+        std::lock_guard<std::mutex> guard(_mutex);
         map<string, string> macros;
         for (auto itr = _ufuncs.begin(); itr != _ufuncs.end(); ++itr) {
             UninterpFunc ufunc = itr->second;
@@ -532,8 +656,20 @@ PYBIND11_MODULE(omega, mod) {
     // bindings to OmegaLib class
     py::class_<OmegaLib>(mod, "OmegaLib")
         .def(py::init<>())
-        .def("codegen", &OmegaLib::codegen, "Generate code using CodeGen+")
-        .def("run", &OmegaLib::run, "Run Omega+ statements");
+        .def("codegen", &OmegaLib::codegen, "Generate code using CodeGen+",
+             py::arg("relmap"), py::arg("schedmap"), py::arg("names") = vector<string>(),
+             py::arg("givens") = vector<string>(), py::call_guard<py::gil_scoped_release>())
+        .def("run", &OmegaLib::run, "Run Omega+ statements",
+             py::arg("code"), py::arg("nstatements") = 1, py::call_guard<py::gil_scoped_release>())
+        .def("codegen_affine", &OmegaLib::codegen_affine,
+             "Generate code using CodeGen+ from affine constraints, bypassing the calculator",
+             py::arg("iterators"), py::arg("domains"), py::arg("outputs"), py::arg("xforms"),
+             py::arg("known") = vector<AffineConstraint>(), py::arg("functions") = map<string, int>(),
+             py::call_guard<py::gil_scoped_release>());
+
+    // Calls release the GIL and serialize on an internal lock around the Omega
+    // parser, so OmegaLib may be shared between Python threads.
+    mod.attr("thread_safe") = true;
 
 #define VERSION_INFO "0.1.0"
 #ifdef VERSION_INFO
@@ -1,2 +1,57 @@
 # src/pyomega/__init__.py
+import importlib
+
 __version__ = "0.1.0"
+
+# Public names imported from their modules on first access, so that importing
+# the package, or only its parser, does not load the native backend, pycparser
+# or the code generators...
+_LAZY = {
+    "IRParser": "pyomega.parser",
+    "RelParser": "pyomega.parser",
+    "CompParser": "pyomega.parser",
+    "CodeGenerator": "pyomega.visit",
+    "ComputationGenerator": "pyomega.visit",
+    "BatchCodeGenerator": "pyomega.visit",
+    "OmegaBackend": "pyomega.backend",
+    "CalculatorSession": "pyomega.backend",
+    "JITCompiler": "pyomega.jit",
+    "Validator": "pyomega.validate",
+}
+
+_SUBMODULES = (
+    "affine",
+    "backend",
+    "bench",
+    "build",
+    "cache",
+    "console",
+    "cost",
+    "deps",
+    "dispatch",
+    "engine",
+    "flutter",
+    "instrument",
+    "ir",
+    "jit",
+    "parser",
+    "passes",
+    "schedule",
+    "server",
+    "stress",
+    "tune",
+    "validate",
+    "visit",
+)
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name]), name)
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY) | set(_SUBMODULES))
@@ -0,0 +1,224 @@
+# src/pyomega/affine.py
+import re
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Union
+
+from pyomega import ir
+
+
+"""
+Affine forms of IR expressions and constraints.
+"""
+
+
+# A variable is an iterator or constant name, or a call ``(name, args)`` to an
+# uninterpreted function with its arguments rendered as strings.
+Variable = Union[str, Tuple[str, Tuple[str, ...]]]
+
+
+@dataclass
+class AffineExpr:
+    coeffs: Dict[Variable, int] = ()
+    const: int = 0
+
+    def __init__(self, coeffs: Dict[Variable, int] = None, const: int = 0):
+        self.coeffs = {var: coeff for var, coeff in (coeffs or {}).items() if coeff != 0}
+        self.const = const
+
+    def __add__(self, other: "AffineExpr") -> "AffineExpr":
+        coeffs = dict(self.coeffs)
+        for var, coeff in other.coeffs.items():
+            coeffs[var] = coeffs.get(var, 0) + coeff
+        return AffineExpr(coeffs, self.const + other.const)
+
+    def __sub__(self, other: "AffineExpr") -> "AffineExpr":
+        return self + other.scale(-1)
+
+    def __str__(self) -> str:
+        terms = []
+        for var, coeff in self.coeffs.items():
+            name = var if isinstance(var, str) else f"{var[0]}({', '.join(var[1])})"
+            terms.append(name if coeff == 1 else f"{coeff}*{name}")
+        if self.const or not terms:
+            terms.append(str(self.const))
+        return " + ".join(terms)
+
+    def scale(self, factor: int) -> "AffineExpr":
+        return AffineExpr(
+            {var: coeff * factor for var, coeff in self.coeffs.items()}, self.const * factor
+        )
+
+    @property
+    def is_constant(self) -> bool:
+        return len(self.coeffs) == 0
+
+    def coeff(self, var: Variable) -> int:
+        return self.coeffs.get(var, 0)
+
+    def variables(self) -> List[Variable]:
+        return list(self.coeffs.keys())
+
+    def calls(self) -> List[Tuple[str, Tuple[str, ...]]]:
+        return [var for var in self.coeffs if not isinstance(var, str)]
+
+
+@dataclass
+class Constraint:
+    """``expr >= 0``, or ``expr == 0`` if ``is_eq`` is set."""
+
+    expr: AffineExpr = None
+    is_eq: bool = False
+
+
+def linearize(node: ir.Node) -> AffineExpr:
+    """Return the affine form of ``node``, or raise ValueError if it is not affine."""
+    if isinstance(node, (ir.Iterator, ir.Constant)):
+        return AffineExpr({node.name: 1})
+    if isinstance(node, ir.Literal):
+        value = float(node.value)
+        if not value.is_integer():
+            raise ValueError(f"Non-integer literal: {node.value}")
+        return AffineExpr(const=int(value))
+    if isinstance(node, ir.Function):
+        args = tuple(str(linearize(arg)) for arg in node.args)
+        return AffineExpr({(node.name, args): 1})
+    if isinstance(node, ir.BinOp):
+        left = linearize(node.left)
+        right = linearize(node.right)
+        if node.op == "+":
+            return left + right
+        if node.op == "-":
+            return left - right
+        if node.op == "*" and left.is_constant:
+            return right.scale(left.const)
+        if node.op == "*" and right.is_constant:
+            return left.scale(right.const)
+        if node.op in ("/", "%") and left.is_constant and right.is_constant and right.const:
+            value = left.const // right.const if node.op == "/" else left.const % right.const
+            return AffineExpr(const=value)
+        raise ValueError(f"Non-affine expression: {node}")
+    raise ValueError(f"Unsupported node: {node}")
+
+
+def _compare(left: AffineExpr, op: str, right: AffineExpr) -> Constraint:
+    if op == "<=":
+        return Constraint(right - left)
+    if op == "<":
+        return Constraint(right - left - AffineExpr(const=1))
+    if op == ">=":
+        return Constraint(left - right)
+    if op == ">":
+        return Constraint(left - right - AffineExpr(const=1))
+    if op == "==":
+        return Constraint(left - right, True)
+    raise ValueError(f"Unsupported comparison: {op}")
+
+
+def constraints(relation: ir.Relation) -> List[Constraint]:
+    """Return the affine constraints expressed by ``relation``."""
+    left = linearize(relation.left)
+    right = linearize(relation.right)
+    if relation.mid:
+        mid = linearize(relation.mid)
+        return [
+            _compare(left, relation.left_op, mid),
+            _compare(mid, relation.right_op, right),
+        ]
+    return [_compare(left, relation.left_op, right)]
+
+
+def space_constraints(space: ir.Space) -> List[Constraint]:
+    return [constraint for rel in space.relations for constraint in constraints(rel)]
+
+
+def identity_schedule(
+    iterators: List[str], position: int = 0, depth: int = 0
+) -> Tuple[List[str], List[Constraint]]:
+    """
+    Return the output tuple and constraints of the schedule
+    ``[position, i, 0, j, 0, ...]``, padded with zeros to ``depth`` loops.
+    """
+    n_loops = max(depth, len(iterators))
+    outputs = [f"c{n}" for n in range(1, 2 * n_loops + 2)]
+    schedule = [Constraint(AffineExpr({outputs[0]: 1}, -position), True)]
+    for n in range(n_loops):
+        loop = AffineExpr({outputs[2 * n + 1]: 1})
+        if n < len(iterators):
+            loop = loop - AffineExpr({iterators[n]: 1})
+        schedule.append(Constraint(loop, True))
+        schedule.append(Constraint(AffineExpr({outputs[2 * n + 2]: 1}), True))
+    return outputs, schedule
+
+
+@dataclass
+class UFunc:
+    """
+    An uninterpreted function call as declared to Omega. Omega functions take a
+    prefix of the input tuple, so ``col(n)`` in ``[i, n, j]`` becomes ``col(i, n)``,
+    and each distinct call on other arguments, like ``rp(i + 1)``, is declared
+    as its own function (``rp1``), as the calculator text path does.
+    """
+
+    name: str = ""
+    array: str = ""
+    args: Tuple[str, ...] = ()
+    params: Tuple[str, ...] = ()
+
+    @property
+    def arity(self) -> int:
+        return len(self.params)
+
+
+def functions(
+    iterators: List[str], constraints: List[Constraint]
+) -> Dict[Tuple[str, Tuple[str, ...]], UFunc]:
+    """
+    Return the Omega declaration for each distinct function call in ``constraints``.
+    Raise ValueError for calls whose arguments do not involve an iterator.
+    """
+    calls: Dict[str, List[Tuple[str, ...]]] = {}
+    for constraint in constraints:
+        for name, args in constraint.expr.calls():
+            if args not in calls.setdefault(name, []):
+                calls[name].append(args)
+
+    ufuncs: Dict[Tuple[str, Tuple[str, ...]], UFunc] = {}
+    names = set(calls)
+    for array, arglists in calls.items():
+        arglists = sorted(arglists)
+        for args in arglists:
+            positions = [
+                iterators.index(word)
+                for arg in args
+                for word in re.findall(r"\w+", arg)
+                if word in iterators
+            ]
+            if not positions:
+                raise ValueError(f"Unsupported call: {array}({', '.join(args)})")
+            params = tuple(iterators[: max(positions) + 1])
+
+            name = array
+            if args != arglists[0]:
+                diff = next((n for n, arg in enumerate(args) if arg not in arglists[0][n : n + 1]), 0)
+                name += ("_" if array[-1].isdigit() else "") + str(diff + 1)
+                while name in names:
+                    name += "_"
+                names.add(name)
+            ufuncs[(array, args)] = UFunc(name, array, args, params)
+
+    return ufuncs
+
+
+def to_native(
+    constraints: List[Constraint], ufuncs: Dict[Tuple[str, Tuple[str, ...]], UFunc] = None
+) -> List[Tuple[Dict[str, int], int, bool]]:
+    """Convert ``constraints`` to the tuples accepted by ``OmegaLib.codegen_affine``."""
+    native = []
+    for constraint in constraints:
+        coeffs: Dict[str, int] = {}
+        for var, coeff in constraint.expr.coeffs.items():
+            name = var if isinstance(var, str) else ufuncs[var].name
+            coeffs[name] = coeffs.get(name, 0) + coeff
+        native.append((coeffs, constraint.expr.const, constraint.is_eq))
+    return native
@@ -0,0 +1,322 @@
+# src/pyomega/backend.py
+import itertools
+import os
+import pickle
+import re
+import subprocess
+import sys
+import threading
+
+from collections import OrderedDict
+from concurrent import futures
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+from pyomega.cache import CacheStats
+
+
+"""
+Memoizing wrapper around the native OmegaLib bindings, and a session running
+them in a separate, restartable process.
+"""
+
+
+DEFAULT_CAPACITY = 256
+
+# The OmegaLib methods a CalculatorSession forwards to its process...
+SESSION_CALLS = ("codegen", "codegen_affine", "run")
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.strip())
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _omega_lib() -> Any:
+    try:
+        from omega import OmegaLib
+    except ImportError:  # Fall back on a build in the source tree...
+        sys.path.append("./src/omega")
+        from omega import OmegaLib
+
+    return OmegaLib()
+
+
+@dataclass
+class OmegaBackend:
+    """
+    Wraps ``OmegaLib.codegen`` and ``OmegaLib.run`` with an in-process LRU memo,
+    keyed on the whitespace-normalized relations, schedules and givens.
+
+    The backend may be shared between threads: the native calls release the GIL
+    and serialize on the Omega parser, while the memo is guarded by a lock that
+    is not held during those calls. Passing a ``CalculatorSession`` as ``lib``
+    runs the native calls in a separate process instead.
+    """
+
+    capacity: int = DEFAULT_CAPACITY
+    stats: CacheStats = None
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, lib: Any = None):
+        assert capacity >= 0
+        self.capacity = capacity
+        self.stats = CacheStats()
+        self._lib = lib
+        self._memo: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def lib(self) -> Any:
+        with self._lock:
+            if self._lib is None:
+                self._lib = _omega_lib()
+            return self._lib
+
+    def __len__(self) -> int:
+        return len(self._memo)
+
+    def __bool__(self) -> bool:
+        # A backend with an empty memo is still a backend, not a missing one...
+        return True
+
+    def codegen(
+        self,
+        relmap: Dict[str, str],
+        schedmap: Dict[str, List[str]],
+        names: List[str] = (),
+        givens: List[str] = (),
+    ) -> str:
+        key = (
+            "codegen",
+            tuple((name, _normalize(rel)) for name, rel in sorted(relmap.items())),
+            tuple(
+                (name, tuple(_normalize(sched) for sched in scheds))
+                for name, scheds in sorted(schedmap.items())
+            ),
+            tuple(names),
+            tuple(sorted(_normalize(given) for given in givens)),
+        )
+        return self._lookup(
+            key, lambda: self.lib.codegen(relmap, schedmap, list(names), list(givens))
+        )
+
+    def codegen_affine(
+        self,
+        iterators: List[List[str]],
+        domains: List[List[Tuple]],
+        outputs: List[List[str]],
+        xforms: List[List[Tuple]],
+        known: List[Tuple] = (),
+        functions: Dict[str, int] = None,
+    ) -> str:
+        functions = functions or {}
+        args = (iterators, domains, outputs, xforms, list(known), functions)
+        key = ("codegen_affine",) + _freeze(args)
+        return self._lookup(key, lambda: self.lib.codegen_affine(*args))
+
+    def run(self, code: str, nstatements: int = 1) -> str:
+        key = ("run", _normalize(code), nstatements)
+        return self._lookup(key, lambda: self.lib.run(code, nstatements))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memo.clear()
+
+    def _lookup(self, key: Tuple, compute) -> str:
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.stats.hits += 1
+                return self._memo[key]
+            self.stats.misses += 1
+
+        result = compute()
+        with self._lock:
+            if self.capacity > 0 and key not in self._memo:
+                self._memo[key] = result
+                self.stats.stores += 1
+                while len(self._memo) > self.capacity:
+                    self._memo.popitem(last=False)
+                    self.stats.evictions += 1
+        return result
+
+
+def _session_main() -> None:
+    """
+    Answer the pickled ``(id, method, args)`` calls read from stdin with pickled
+    ``(id, ok, result)`` replies until stdin closes. The replies are written to
+    the original stdout, which is pointed at stderr so output from the Omega
+    library cannot corrupt them.
+    """
+    replies = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    calls = sys.stdin.buffer
+    lib = _omega_lib()
+    while True:
+        try:
+            ident, method, args = pickle.load(calls)
+        except EOFError:
+            break
+        try:
+            if method not in SESSION_CALLS:
+                raise ValueError(f"Unknown OmegaLib method '{method}'")
+            reply = (ident, True, getattr(lib, method)(*args))
+        except Exception as error:
+            reply = (ident, False, f"{type(error).__name__}: {error}")
+        pickle.dump(reply, replies)
+        replies.flush()
+
+
+class CalculatorSession:
+    """
+    An OmegaLib in a long-lived worker process, fed calls over a pipe, with the
+    ``codegen``, ``codegen_affine`` and ``run`` methods of OmegaLib so it can be
+    the ``lib`` of an ``OmegaBackend``.
+
+    Calls from any number of threads are multiplexed over the pipe, each tagged
+    with an id its result is routed back by. If the process dies, e.g. when the
+    Omega library aborts on bad input, the calls in flight raise RuntimeError
+    and the next call starts a new process. A call taking longer than
+    ``timeout`` seconds kills the process and raises RuntimeError.
+    """
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout
+        self.restarts = 0
+        self._process: subprocess.Popen = None
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count(1)
+        self._started = False
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+    def _start(self) -> None:
+        # The session imports pyomega from wherever this process does...
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+        process = subprocess.Popen(
+            [sys.executable, "-m", "pyomega.backend"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+        if self._started:
+            self.restarts += 1
+        self._started = True
+        self._process, self._pending = process, {}
+        receiver = threading.Thread(target=self._receive, args=(process, self._pending))
+        receiver.daemon = True
+        receiver.start()
+
+    def _receive(self, process: subprocess.Popen, pending: Dict[int, Future]) -> None:
+        try:
+            while True:
+                ident, ok, result = pickle.load(process.stdout)
+                with self._lock:
+                    future = pending.pop(ident, None)
+                if future is None:
+                    continue
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RuntimeError(result))
+        except (EOFError, OSError, pickle.UnpicklingError):
+            pass
+
+        code = process.wait()
+        with self._lock:
+            if self._process is process:
+                self._process = None
+            failed = list(pending.values())
+            pending.clear()
+        process.stdout.close()
+        for future in failed:
+            future.set_exception(RuntimeError(f"Calculator process exited with code {code}"))
+
+    def call(self, method: str, *args: Any) -> Any:
+        """Call OmegaLib ``method`` with ``args`` in the session's process."""
+        future: Future = Future()
+        with self._lock:
+            if self._process is None:
+                self._start()
+            process = self._process
+            ident = next(self._ids)
+            self._pending[ident] = future
+        try:
+            with self._send_lock:
+                pickle.dump((ident, method, args), process.stdin)
+                process.stdin.flush()
+        except (OSError, ValueError):
+            pass  # The process died: the receiver fails the call...
+
+        try:
+            return future.result(self.timeout)
+        except futures.TimeoutError:
+            with self._lock:
+                if self._process is process:
+                    self._process = None
+            process.kill()
+            raise RuntimeError(f"Calculator call '{method}' timed out after {self.timeout} s")
+
+    def codegen(
+        self,
+        relmap: Dict[str, str],
+        schedmap: Dict[str, List[str]],
+        names: List[str] = (),
+        givens: List[str] = (),
+    ) -> str:
+        return self.call("codegen", relmap, schedmap, list(names), list(givens))
+
+    def codegen_affine(self, *args: Any) -> str:
+        return self.call("codegen_affine", *args)
+
+    def run(self, code: str, nstatements: int = 1) -> str:
+        return self.call("run", code, nstatements)
+
+    @property
+    def pid(self) -> int:
+        """The id of the session's process, or 0 if none is running."""
+        process = self._process
+        return process.pid if process is not None else 0
+
+    def close(self) -> None:
+        with self._lock:
+            process, self._process = self._process, None
+        if process is not None:
+            with self._send_lock:
+                process.stdin.close()  # The process exits at the end of its input...
+            try:
+                process.wait(5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def __enter__(self) -> "CalculatorSession":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+_default_backend: OmegaBackend = None
+_default_lock = threading.Lock()
+
+
+def default_backend() -> OmegaBackend:
+    """Return the process-wide backend shared by code generators."""
+    global _default_backend
+    with _default_lock:
+        if _default_backend is None:
+            _default_backend = OmegaBackend()
+        return _default_backend
+
+
+if __name__ == "__main__":
+    _session_main()
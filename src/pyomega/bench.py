@@ -0,0 +1,386 @@
+# src/pyomega/bench.py
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import click
+
+from pyomega import __version__
+from pyomega.parser import IRParser
+from pyomega.tune import machine_fingerprint
+
+
+"""
+Benchmarks of the generated reference kernels over a sweep of problem sizes.
+"""
+
+
+DEFAULT_SIZES = (64, 256, 1024)
+
+# A command line call that only parses, and the time in seconds it may take to
+# start, parse and exit...
+STARTUP_ARGS = ("parse", "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}")
+STARTUP_BUDGET = 0.1
+
+# Modules a parse-only call must not load...
+HEAVY_MODULES = ("omega", "pycparser", "numpy", "pyomega.visit", "pyomega.backend")
+
+
+@dataclass
+class Problem:
+    """
+    The arguments of a kernel for one problem size, with the points it visits and
+    the floating-point operations and bytes of memory traffic this implies.
+    """
+
+    args: Tuple[Any, ...] = ()
+    points: int = 0
+    flops: int = 0
+    nbytes: int = 0
+
+
+@dataclass
+class Benchmark:
+    """A reference kernel and the ``setup(size, rng)`` of its synthetic inputs."""
+
+    name: str = ""
+    expr: str = ""
+    setup: Callable[[int, Any], Problem] = None
+
+
+@dataclass
+class Result:
+    """
+    Timings of a kernel at one size: statistics over ``repeat`` runs after
+    ``warmup`` runs, in seconds, with throughputs derived from the median.
+    """
+
+    kernel: str = ""
+    size: int = 0
+    points: int = 0
+    warmup: int = 0
+    repeat: int = 0
+    min: float = 0.0
+    median: float = 0.0
+    mean: float = 0.0
+    stdev: float = 0.0
+    gflops: float = 0.0
+    bandwidth: float = 0.0
+    per_point: float = 0.0
+
+
+def _csr(rows: int, cols: int, rng: Any, density: int = 8) -> Tuple[Any, Any]:
+    """Return the row pointers and column indices of a random sparse matrix."""
+    import numpy as np
+
+    counts = rng.integers(0, 2 * density + 1, rows)
+    rp = np.concatenate(([0], np.cumsum(counts))).astype(np.int32)
+    col = rng.integers(0, cols, int(rp[-1])).astype(np.int32)
+    return rp, col
+
+
+def _dense(rng: Any, *shape: int) -> Any:
+    import numpy as np
+
+    return rng.random(shape, dtype=np.float32)
+
+
+def _zeros(*shape: int) -> Any:
+    import numpy as np
+
+    return np.zeros(shape, dtype=np.float32)
+
+
+def _dmv(size: int, rng: Any) -> Problem:
+    A, x, y = _dense(rng, size, size), _dense(rng, size), _zeros(size)
+    points = size * size
+    return Problem((size, size, y, A, x), points, 2 * points, 4 * (points + 3 * size))
+
+
+def _matmul(size: int, rng: Any) -> Problem:
+    A, B, C = _dense(rng, size, size), _dense(rng, size, size), _zeros(size, size)
+    points = size ** 3
+    return Problem((size, size, size, C, A, B), points, 2 * points, 4 * 4 * size * size)
+
+
+def _spmv(size: int, rng: Any) -> Problem:
+    rp, col = _csr(size, size, rng)
+    nnz = len(col)
+    A, x, y = _dense(rng, nnz), _dense(rng, size), _zeros(size)
+    nbytes = 4 * (2 * nnz + (size + 1) + 3 * size)
+    return Problem((size, y, A, x, rp, col), nnz, 2 * nnz, nbytes)
+
+
+def _spmv_coo(size: int, rng: Any) -> Problem:
+    import numpy as np
+
+    rp, col = _csr(size, size, rng)
+    nnz = len(col)
+    row = np.repeat(np.arange(size, dtype=np.int32), np.diff(rp))
+    A, x, y = _dense(rng, nnz), _dense(rng, size), _zeros(size)
+    nbytes = 4 * (3 * nnz + 3 * size)
+    return Problem((nnz, y, A, x, row, col), nnz, 2 * nnz, nbytes)
+
+
+def _krp(size: int, rng: Any, rank: int = 16) -> Problem:
+    nnz = 8 * size
+    ind0, ind1, ind2 = (rng.integers(0, size, nnz).astype("int32") for _ in range(3))
+    X = _dense(rng, nnz)
+    A, B, C = _zeros(size, rank), _dense(rng, size, rank), _dense(rng, size, rank)
+    points = nnz * rank
+    nbytes = 4 * (4 * nnz + 3 * points)
+    return Problem((nnz, rank, A, X, C, B, ind0, ind1, ind2), points, 3 * points, nbytes)
+
+
+def _lap(size: int, rng: Any, depth: int = 8) -> Problem:
+    inp, out = _dense(rng, size, size, depth), _zeros(size, size, depth)
+    points = (size - 2) * (size - 2) * depth
+    return Problem((size, size, depth, out, inp), points, 5 * points, 4 * 2 * size * size * depth)
+
+
+BENCHMARKS = {
+    "dmv": Benchmark(
+        "dmv", "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[i] += A[i, j] * x[j]", _dmv
+    ),
+    "matmul": Benchmark(
+        "matmul",
+        "matmul = {[i, j, k]: 0 <= i < N ^ 0 <= j < M ^ 0 <= k < K}\nC[i, j] += A[i, k] * B[k, j]",
+        _matmul,
+    ),
+    "spmv": Benchmark(
+        "spmv",
+        "spmv = {[i, n, j]: 0 <= i < N ^ rp(i) <= n < rp(i + 1) ^ j == col(n)}\n"
+        "y[i] += A[n] * x[j]",
+        _spmv,
+    ),
+    "spmv_coo": Benchmark(
+        "spmv_coo",
+        "spmv_coo = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]",
+        _spmv_coo,
+    ),
+    "krp": Benchmark(
+        "krp",
+        "krp = {[n, i, j, k, r]: 0 <= n < M ^ i == ind0(n) ^ j == ind1(n) ^ k == ind2(n) "
+        "^ 0 <= r < R}\n"
+        "A[i, r] += X[n] * C[k, r] * B[j, r]",
+        _krp,
+    ),
+    "lap": Benchmark(
+        "lap",
+        "lap = {[i, j, k]: 1 <= i < I - 1 ^ 1 <= j < J - 1 ^ 0 <= k < K}\n"
+        "out[i, j, k] = -4.0 * inp[i, j, k] + inp[i + 1, j, k] + inp[i - 1, j, k] "
+        "+ inp[i, j - 1, k] + inp[i, j + 1, k]",
+        _lap,
+    ),
+}
+
+
+def measure(
+    kernel: Any, problem: Problem, warmup: int = 1, repeat: int = 5
+) -> Tuple[float, float, float, float]:
+    """Return the min, median, mean and standard deviation of ``repeat`` timed runs."""
+    for _ in range(warmup):
+        kernel(*problem.args)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        kernel(*problem.args)
+        times.append(time.perf_counter() - start)
+    stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+    return min(times), statistics.median(times), statistics.mean(times), stdev
+
+
+def run(
+    names: Sequence[str] = (),
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    warmup: int = 1,
+    repeat: int = 5,
+    compiler: Any = None,
+    seed: int = 0,
+) -> List[Result]:
+    """Compile each benchmark in ``names`` (by default, all) and time it at each size."""
+    import numpy as np
+
+    from pyomega.jit import JITCompiler, jit
+
+    compiler = compiler or JITCompiler()
+    results = []
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark '{name}', expected one of {list(BENCHMARKS)}")
+        benchmark = BENCHMARKS[name]
+        kernel = jit(*IRParser(benchmark.expr).parse(), compiler=compiler)
+        for size in sizes:
+            problem = benchmark.setup(size, np.random.default_rng(seed))
+            best, median, mean, stdev = measure(kernel, problem, warmup, repeat)
+            results.append(
+                Result(
+                    name,
+                    size,
+                    problem.points,
+                    warmup,
+                    repeat,
+                    best,
+                    median,
+                    mean,
+                    stdev,
+                    problem.flops / median / 1e9 if median > 0 else 0.0,
+                    problem.nbytes / median / 1e9 if median > 0 else 0.0,
+                    median / max(problem.points, 1),
+                )
+            )
+    return results
+
+
+def _python(code: str) -> List[str]:
+    return [sys.executable, "-c", code]
+
+
+def _environment() -> Dict[str, str]:
+    # Children find pyomega where this process did...
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+
+
+def startup(args: Sequence[str] = STARTUP_ARGS, repeat: int = 5) -> float:
+    """
+    Return the best wall-clock time, in seconds, of ``repeat`` runs of the
+    ``pyomega`` command line with ``args``, each in a fresh interpreter.
+    """
+    command = _python("from pyomega.console import main; main()") + list(args)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=_environment()
+        )
+        best = min(best, time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"pyomega {' '.join(args)} failed:\n{result.stderr.decode()}")
+    return best
+
+
+def startup_modules(args: Sequence[str] = STARTUP_ARGS) -> List[str]:
+    """Return the ``HEAVY_MODULES`` loaded by the ``pyomega`` command line with ``args``."""
+    code = (
+        "import sys\n"
+        "from pyomega.console import main\n"
+        f"main({list(args)!r}, standalone_mode=False)\n"
+        f"print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    result = subprocess.run(
+        _python(code), stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=_environment()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"pyomega {' '.join(args)} failed:\n{result.stderr.decode()}")
+    return result.stdout.decode().split("\n")[-2].split()
+
+
+def _commit() -> str:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+    except OSError:
+        return ""
+    return result.stdout.decode().strip() if result.returncode == 0 else ""
+
+
+def report(results: List[Result], compiler: Any = None) -> Dict[str, Any]:
+    """Return ``results`` with the version, commit, machine and compiler that produced them."""
+    return dict(
+        version=__version__,
+        commit=_commit(),
+        machine=machine_fingerprint(),
+        platform=platform.platform(),
+        timestamp=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        cc=getattr(compiler, "cc", ""),
+        flags=list(getattr(compiler, "flags", ())),
+        results=[asdict(result) for result in results],
+    )
+
+
+def save(results: List[Result], path: str, compiler: Any = None) -> None:
+    with open(path, "w") as file:
+        json.dump(report(results, compiler), file, indent=2)
+
+
+def load(path: str) -> List[Result]:
+    with open(path, "r") as file:
+        return [Result(**result) for result in json.load(file)["results"]]
+
+
+def compare(
+    baseline: List[Result], current: List[Result], tolerance: float = 0.1
+) -> List[Tuple[str, int, float]]:
+    """
+    Return the ``(kernel, size, slowdown)`` of each result whose median time is
+    more than ``tolerance`` slower than the baseline at the same size.
+    """
+    previous = {(result.kernel, result.size): result for result in baseline}
+    regressions = []
+    for result in current:
+        old = previous.get((result.kernel, result.size))
+        if old is None or old.median <= 0:
+            continue
+        slowdown = result.median / old.median - 1.0
+        if slowdown > tolerance:
+            regressions.append((result.kernel, result.size, slowdown))
+    return regressions
+
+
+@click.command()
+@click.option("-k", "--kernel", "kernels", multiple=True, help="Benchmark to run (default: all).")
+@click.option("-s", "--size", "sizes", multiple=True, type=int, help="Problem size to sweep.")
+@click.option("--warmup", default=1, show_default=True, help="Untimed runs per size.")
+@click.option("--repeat", default=5, show_default=True, help="Timed runs per size.")
+@click.option("-o", "--output", type=click.Path(), help="Save the results as JSON.")
+@click.option("--baseline", type=click.Path(exists=True), help="JSON results to compare with.")
+@click.option("--tolerance", default=0.1, show_default=True, help="Allowed slowdown.")
+@click.option(
+    "--startup", "check_startup", is_flag=True, help="Time a parse-only call against its budget."
+)
+def main(kernels, sizes, warmup, repeat, output, baseline, tolerance, check_startup):
+    """Benchmark the generated reference kernels."""
+    from pyomega.jit import JITCompiler
+
+    if check_startup:
+        seconds = startup(STARTUP_ARGS, repeat)
+        modules = startup_modules()
+        budget = STARTUP_BUDGET * 1e3
+        click.echo(f"pyomega {STARTUP_ARGS[0]}: {seconds * 1e3:.1f} ms (budget {budget:.0f} ms)")
+        if modules:
+            click.echo(f"Loaded: {', '.join(modules)}")
+        if seconds > STARTUP_BUDGET or modules:
+            raise SystemExit(1)
+        return
+
+    compiler = JITCompiler()
+    results = run(kernels, sizes or DEFAULT_SIZES, warmup, repeat, compiler)
+    click.echo(
+        f"{'kernel':<10} {'size':>6} {'median (s)':>12} {'GFLOP/s':>9} {'GB/s':>9} {'ns/pt':>8}"
+    )
+    for result in results:
+        click.echo(
+            f"{result.kernel:<10} {result.size:>6} {result.median:>12.6f} {result.gflops:>9.3f} "
+            f"{result.bandwidth:>9.3f} {result.per_point * 1e9:>8.3f}"
+        )
+    if output:
+        save(results, output, compiler)
+
+    if baseline:
+        regressions = compare(load(baseline), results, tolerance)
+        for kernel, size, slowdown in regressions:
+            click.echo(f"Regression: {kernel} at size {size} is {slowdown:.1%} slower")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# src/pyomega/build.py
+import glob
+import json
+import os
+import re
+import time
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+import click
+
+from pyomega.cache import DEFAULT_CACHE_DIR, content_hash
+
+
+"""
+Batch compilation of kernel spec files into C translation units.
+"""
+
+
+SPEC_SUFFIX = ".omega"
+MANIFEST = ".pyomega-manifest.json"
+
+
+@dataclass
+class Spec:
+    """
+    A kernel spec file: a space on its first line followed by its statements,
+    with blank and ``#`` comment lines dropped. ``name`` is the file's stem and
+    ``key`` the hash of its text and the code generator options.
+    """
+
+    path: str = ""
+    name: str = ""
+    text: str = ""
+    key: str = ""
+
+
+@dataclass
+class Outcome:
+    """The status of a spec, ``compiled``, ``skipped`` or ``failed``, and its time."""
+
+    spec: Spec = None
+    status: str = ""
+    seconds: float = 0.0
+    error: str = ""
+
+
+def discover(inputs: Sequence[str]) -> List[str]:
+    """
+    Return the spec files named by ``inputs``, each a file, a directory searched
+    recursively for ``*.omega`` files, or a glob pattern, in order and without
+    duplicates.
+    """
+    paths: List[str] = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found = sorted(glob.glob(os.path.join(item, "**", "*" + SPEC_SUFFIX), recursive=True))
+        elif os.path.isfile(item):
+            found = [item]
+        else:
+            found = sorted(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+            if not found:
+                raise ValueError(f"No spec files match '{item}'")
+        paths.extend(os.path.normpath(path) for path in found)
+    return list(dict.fromkeys(paths))
+
+
+def read_spec(path: str, options: Dict[str, Any] = None) -> Spec:
+    with open(path) as file:
+        lines = [line.rstrip() for line in file]
+    text = "\n".join(line for line in lines if line.strip() and not line.lstrip().startswith("#"))
+    if not text:
+        raise ValueError(f"Spec file '{path}' is empty")
+    name = os.path.splitext(os.path.basename(path))[0]
+    return Spec(path, name, text, content_hash(text, sorted((options or {}).items())))
+
+
+def combine(sources: Sequence[str]) -> str:
+    """
+    Return ``sources`` as one translation unit, undefining the macros of each
+    kernel after it so the statement macros of the next do not clash.
+    """
+    units = []
+    for source in sources:
+        names = re.findall(r"^\s*#\s*define\s+(\w+)", source, re.MULTILINE)
+        undefs = "".join(f"#undef {name}\n" for name in dict.fromkeys(names))
+        units.append(source.rstrip("\n") + "\n\n" + undefs)
+    return "\n".join(units)
+
+
+def load_manifest(path: str) -> Dict[str, str]:
+    """Return the key each spec path had when it was last built, from ``path``."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path: str, manifest: Dict[str, str]) -> None:
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(temp, path)
+
+
+def _write(path: str, source: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as file:
+        file.write(source)
+
+
+def build(
+    specs: Sequence[Spec],
+    output: str,
+    jobs: int = 0,
+    cache_path: str = "",
+    options: Dict[str, Any] = None,
+    incremental: bool = False,
+) -> List[Outcome]:
+    """
+    Compile ``specs`` into ``output``: one translation unit if it ends in
+    ``.c``, otherwise a directory with a ``<name>.c`` file per spec. Specs are
+    compiled across ``jobs`` processes sharing the code cache at ``cache_path``.
+
+    A manifest beside the output records the key of each spec built. In
+    ``incremental`` mode specs whose key is unchanged, and whose output exists,
+    are skipped. A single translation unit is rewritten if any spec changed or
+    the set of specs did, with unchanged specs served by the code cache.
+    """
+    from pyomega.engine import CompileEngine
+
+    single = output.endswith(".c")
+    if single:
+        directory, base = os.path.split(output)
+        manifest_path = os.path.join(directory, f".{base}{MANIFEST}")
+    else:
+        manifest_path = os.path.join(output, MANIFEST)
+        names: Dict[str, str] = {}
+        for spec in specs:
+            if names.setdefault(spec.name, spec.path) != spec.path:
+                raise ValueError(
+                    f"Specs '{names[spec.name]}' and '{spec.path}' both write {spec.name}.c"
+                )
+
+    manifest = load_manifest(manifest_path)
+    targets = {
+        spec.path: output if single else os.path.join(output, spec.name + ".c") for spec in specs
+    }
+    unchanged = {
+        spec.path
+        for spec in specs
+        if incremental
+        and manifest.get(spec.path) == spec.key
+        and os.path.exists(targets[spec.path])
+    }
+    if single and (len(unchanged) < len(specs) or set(manifest) != set(targets)):
+        unchanged = set()
+
+    outcomes: List[Outcome] = []
+    sources: List[str] = []
+    with CompileEngine(jobs, cache_path=cache_path, options=options) as engine:
+        futures = {
+            spec.path: engine.submit(spec.text, timed=True)
+            for spec in specs
+            if spec.path not in unchanged
+        }
+        for spec in specs:
+            if spec.path in unchanged:
+                outcomes.append(Outcome(spec, "skipped"))
+                continue
+            try:
+                source, seconds = futures[spec.path].result()
+            except Exception as error:
+                manifest.pop(spec.path, None)
+                outcomes.append(Outcome(spec, "failed", error=f"{type(error).__name__}: {error}"))
+                continue
+            if single:
+                sources.append(source)
+            else:
+                _write(targets[spec.path], source)
+            manifest[spec.path] = spec.key
+            outcomes.append(Outcome(spec, "compiled", seconds))
+
+    if sources:
+        _write(output, combine(sources))
+    if len(unchanged) < len(specs):
+        if not single:
+            os.makedirs(output, exist_ok=True)
+        save_manifest(manifest_path, manifest)
+    return outcomes
+
+
+@click.command()
+@click.argument("inputs", nargs=-1, required=True)
+@click.option(
+    "-o",
+    "--output",
+    default="build",
+    show_default=True,
+    help="Directory for one file per kernel, or a .c file for one translation unit.",
+)
+@click.option("-j", "--jobs", default=0, help="Worker processes, 0 for one per CPU.")
+@click.option(
+    "--cache-dir",
+    default=lambda: os.environ.get("PYOMEGA_CACHE_DIR", DEFAULT_CACHE_DIR),
+    help="Directory of the code cache shared by the workers.",
+)
+@click.option("--no-cache", is_flag=True, help="Do not use the code cache.")
+@click.option(
+    "-i", "--incremental", is_flag=True, help="Skip specs unchanged since the last build."
+)
+@click.option("--standalone", is_flag=True, help="Generate standalone C functions.")
+@click.option("--parallel", is_flag=True, help="Parallelize the outer loops with OpenMP.")
+def main(inputs, output, jobs, cache_dir, no_cache, incremental, standalone, parallel):
+    """Compile kernel spec files, directories of *.omega files or globs to C."""
+    options = dict(standalone=standalone, parallel=parallel)
+    start = time.perf_counter()
+    try:
+        specs = [read_spec(path, options) for path in discover(inputs)]
+        outcomes = build(specs, output, jobs, "" if no_cache else cache_dir, options, incremental)
+    except (OSError, ValueError) as error:
+        raise click.ClickException(str(error))
+    elapsed = time.perf_counter() - start
+
+    width = max([len(outcome.spec.name) for outcome in outcomes] + [6])
+    click.echo(f"{'kernel':<{width}} {'status':>10} {'time (ms)':>12}")
+    for outcome in sorted(outcomes, key=lambda outcome: -outcome.seconds):
+        time_ms = f"{outcome.seconds * 1e3:.3f}" if outcome.status == "compiled" else "-"
+        click.echo(f"{outcome.spec.name:<{width}} {outcome.status:>10} {time_ms:>12}")
+
+    counts = {status: 0 for status in ("compiled", "skipped", "failed")}
+    for outcome in outcomes:
+        counts[outcome.status] += 1
+    summary = ", ".join(f"{count} {status}" for status, count in counts.items())
+    click.echo(f"{summary} in {elapsed:.3f} s")
+
+    failed = [outcome for outcome in outcomes if outcome.status == "failed"]
+    for outcome in failed:
+        click.echo(f"{outcome.spec.path}: {outcome.error}", err=True)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
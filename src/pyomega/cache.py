@@ -0,0 +1,210 @@
+# src/pyomega/cache.py
+import ast
+import hashlib
+import os
+import tempfile
+
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Any, Dict, List, Optional
+
+from pyomega import __version__
+
+
+"""
+Implementation of a persistent, content-addressed cache for generated code.
+"""
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pyomega")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Fraction of max_bytes an eviction frees the cache down to, so scans are rare...
+LOW_WATER = 0.75
+
+
+def canonical(node: Any) -> str:
+    """
+    Return a canonical string for an IR node, Python AST, or container of them,
+    independent of object identity.
+    """
+    if isinstance(node, ast.AST):
+        return ast.dump(node)
+    if is_dataclass(node):
+        items = [f"{f.name}={canonical(getattr(node, f.name))}" for f in fields(node)]
+        return f"{type(node).__name__}({', '.join(items)})"
+    if isinstance(node, dict):
+        items = [f"{canonical(key)}: {canonical(value)}" for key, value in node.items()]
+        return "{" + ", ".join(items) + "}"
+    if isinstance(node, (list, tuple)):
+        return "[" + ", ".join(canonical(item) for item in node) + "]"
+    return repr(node)
+
+
+def content_hash(*items: Any) -> str:
+    """Return the SHA-256 hex digest of the canonical form of ``items``."""
+    hasher = hashlib.sha256(__version__.encode())
+    for item in items:
+        hasher.update(b"\0")
+        hasher.update(canonical(item).encode())
+    return hasher.hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            stores=self.stores,
+            evictions=self.evictions,
+            hit_rate=self.hit_rate,
+        )
+
+
+@dataclass
+class CodeCache:
+    """
+    On-disk cache of generated sources keyed by content hash.
+
+    Entries are written to a temporary file and renamed into place, so several
+    processes may share a cache directory. When the total size exceeds
+    ``max_bytes``, the least recently used entries are evicted down to
+    ``LOW_WATER`` of it. The total is tracked across stores and only rescanned
+    on eviction, so it does not count entries stored by other processes since.
+    """
+
+    path: str = ""
+    max_bytes: int = DEFAULT_MAX_BYTES
+    suffix: str = ".c"
+    stats: CacheStats = None
+
+    def __init__(
+        self, path: str = "", max_bytes: int = DEFAULT_MAX_BYTES, suffix: str = ".c"
+    ):
+        self.path = path or os.environ.get("PYOMEGA_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.stats = CacheStats()
+        self._size: Optional[int] = None
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, *items: Any) -> str:
+        return content_hash(*items)
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + self.suffix)
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.entry_path(key)
+        try:
+            with open(path, "r") as file:
+                source = file.read()
+        except OSError:
+            self.stats.misses += 1
+            return None
+
+        try:
+            os.utime(path)  # Mark as recently used...
+        except OSError:
+            pass
+        self.stats.hits += 1
+        return source
+
+    def put(self, key: str, source: str) -> None:
+        path = self.entry_path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        if self._size is None:
+            self._size = self.size()
+        try:
+            replaced = os.stat(path).st_size
+        except OSError:
+            replaced = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=self.suffix)
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(source)
+            size = os.stat(tmp_path).st_size
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._size += size - replaced
+        self.stats.stores += 1
+        if self._size > self.max_bytes:
+            self.evict(int(self.max_bytes * LOW_WATER))
+
+    def entries(self) -> List[os.DirEntry]:
+        entries = []
+        for subdir in os.scandir(self.path):
+            if subdir.is_dir():
+                for entry in os.scandir(subdir.path):
+                    if entry.name.endswith(self.suffix) and not entry.name.startswith("."):
+                        entries.append(entry)
+        return entries
+
+    def size(self) -> int:
+        total = 0
+        for entry in self.entries():
+            try:
+                total += entry.stat().st_size
+            except OSError:  # Removed by another process...
+                pass
+        return total
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Remove least recently used entries until the cache fits in ``max_bytes``,
+        by default the limit of the cache.
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        stamped = []
+        total = 0
+        for entry in self.entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            stamped.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        n_evicted = 0
+        for _, size, path in sorted(stamped):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                n_evicted += 1
+            except OSError:
+                pass
+            total -= size
+
+        self._size = total
+        self.stats.evictions += n_evicted
+        return n_evicted
+
+    def clear(self) -> None:
+        for entry in self.entries():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+        self._size = 0
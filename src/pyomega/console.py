@@ -1,11 +1,83 @@
 # src/pyomega/console.py
+import importlib
+import json
+
 import click
 
 from . import __version__
 
 
-@click.command()
+"""
+The ``pyomega`` command line. Each subcommand imports what it needs when run,
+so commands that only parse do not load the backend or code generators.
+"""
+
+
+# Subcommands defined in other modules, imported when invoked...
+LAZY_COMMANDS = {
+    "bench": "pyomega.bench:main",
+    "compile": "pyomega.build:main",
+    "serve": "pyomega.server:main",
+    "stress": "pyomega.stress:main",
+}
+
+
+class LazyGroup(click.Group):
+    """A command group that also provides the ``LAZY_COMMANDS``."""
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(LAZY_COMMANDS))
+
+    def get_command(self, ctx, name):
+        if name in LAZY_COMMANDS:
+            module, attribute = LAZY_COMMANDS[name].split(":")
+            return getattr(importlib.import_module(module), attribute)
+        return super().get_command(ctx, name)
+
+
+@click.group(cls=LazyGroup, invoke_without_command=True)
 @click.version_option(version=__version__)
-def main():
+@click.pass_context
+def main(ctx):
     """The PyOmega project."""
-    click.echo("PyOmega")
\ No newline at end of file
+    if ctx.invoked_subcommand is None:
+        click.echo("PyOmega")
+
+
+@main.command()
+@click.argument("expression", required=False)
+@click.option("-f", "--file", type=click.File("r"), help="Read the kernel from a file.")
+def parse(expression, file):
+    """Parse a space, optionally followed by statements, and print it as JSON."""
+    from pyomega.affine import space_constraints
+    from pyomega.parser import CompParser, RelParser
+
+    text = file.read() if file else expression
+    lines = [line for line in (text or "").split("\n") if line.strip()]
+    if not lines:
+        raise click.UsageError("Expected an EXPRESSION or --file")
+
+    try:
+        space = RelParser(expression=lines[0]).parse()
+        constraints = [
+            f"{constraint.expr} {'==' if constraint.is_eq else '>='} 0"
+            for constraint in space_constraints(space)
+        ]
+        data = dict(name=space.name, iterators=list(space.iterators), constraints=constraints)
+        if len(lines) > 1:
+            fields, _ = CompParser(space, expression="\n".join(lines[1:])).parse()
+            data["fields"] = {
+                field.name: dict(
+                    reads=sum(not access.is_write for access in field.accesses),
+                    writes=sum(access.is_write for access in field.accesses),
+                )
+                for field in fields.values()
+            }
+    except (SyntaxError, ValueError) as error:
+        raise click.ClickException(str(error))
+
+    click.echo(json.dumps(data, indent=2))
+
+
+if __name__ == "__main__":
+    main()
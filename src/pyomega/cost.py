@@ -0,0 +1,314 @@
+# src/pyomega/cost.py
+import functools
+import math
+import operator
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from pyomega.affine import AffineExpr, Variable, space_constraints
+from pyomega.deps import DependenceAnalysis
+from pyomega.ir import Access, Space
+from pyomega.schedule import Loop, Schedule
+from pyomega.tune import DEFAULT_TILE_SIZES, candidates
+
+
+"""
+A static model of the memory traffic of scheduled loop nests, for ranking
+schedules without compiling or running them.
+"""
+
+
+# Sizes in bytes of the element types of fields...
+ITEMSIZES = {
+    "float": 4,
+    "double": 8,
+    "int": 4,
+    "long": 8,
+}
+
+
+def _product(values: Sequence[float]) -> float:
+    return functools.reduce(operator.mul, values, 1.0)
+
+
+def _names(analysis: DependenceAnalysis, var: Variable) -> List[str]:
+    """Return the iterators that subscript variable ``var`` depends on."""
+    if isinstance(var, str):
+        return [var]
+    return analysis.iterators_of(AffineExpr({var: 1}))
+
+
+@dataclass
+class Cache:
+    """A level of the cache hierarchy, with the cost of a miss relative to an iteration."""
+
+    name: str = ""
+    size: int = 0
+    penalty: float = 1.0
+
+
+DEFAULT_CACHES = (
+    Cache("L1", 32 * 1024, 4.0),
+    Cache("L2", 1024 * 1024, 12.0),
+    Cache("L3", 32 * 1024 * 1024, 60.0),
+)
+
+
+@dataclass
+class Level:
+    """
+    The estimates for one loop of a schedule: its trip count, the fraction of
+    accesses that are unit-stride (or invariant) and invariant along it, the
+    bytes touched by all its iterations, and the reuse distance of the invariant
+    accesses, i.e. the bytes touched by one iteration.
+    """
+
+    loop: Loop = None
+    trips: float = 1.0
+    stride1: float = 1.0
+    reuse: float = 0.0
+    working_set: float = 0.0
+    reuse_distance: float = 0.0
+
+
+@dataclass
+class Estimate:
+    """The modeled behaviour of a schedule: its loops, cache misses and total cost."""
+
+    schedule: Schedule = None
+    levels: List[Level] = ()
+    iterations: float = 0.0
+    misses: Dict[str, float] = None
+    cost: float = 0.0
+
+
+@dataclass
+class CostModel:
+    """
+    Ranks the schedules of a kernel by an estimate of their cost, from the affine
+    subscripts of its field accesses and the sizes of its loops.
+
+    A cache holds the working set of the loops inside the outermost level whose
+    footprint fits in it, so each execution of those loops misses once per line
+    they touch. The cost of a schedule is one unit per iteration, plus one per
+    iteration if its innermost loop is not unit-stride, plus each cache's misses
+    times its ``penalty``.
+
+    All caches have lines of ``line`` bytes. Constants take their value from
+    ``params``, or ``default_size``, and loops
+    bounded through index arrays, like ``rp(i) <= n < rp(i + 1)``, are assumed
+    to run ``default_trips`` times.
+    """
+
+    caches: Sequence[Cache] = DEFAULT_CACHES
+    line: int = 64
+    params: Dict[str, int] = None
+    default_size: int = 1024
+    default_trips: int = 16
+    tile_sizes: Sequence[int] = DEFAULT_TILE_SIZES
+
+    def trips(self, space: Space) -> Dict[str, float]:
+        """Return the estimated trip count of the loop over each iterator of ``space``."""
+        iterators = list(space.iterators)
+        params = self.params or {}
+        lowers: Dict[str, List[AffineExpr]] = {name: [] for name in iterators}
+        uppers: Dict[str, List[AffineExpr]] = {name: [] for name in iterators}
+        defined: Set[str] = set()
+        for constraint in space_constraints(space):
+            expr = constraint.expr
+            for name in iterators:
+                coeff = expr.coeff(name)
+                if abs(coeff) != 1:
+                    continue
+                bound = (expr - AffineExpr({name: coeff})).scale(-coeff)
+                if constraint.is_eq:
+                    defined.add(name)
+                elif coeff > 0:
+                    lowers[name].append(bound)
+                else:
+                    uppers[name].append(bound)
+
+        # Bounds on other iterators take their midpoints, from the outermost in...
+        values: Dict[str, float] = {}
+        trips: Dict[str, float] = {}
+        for name in iterators:
+            if name in defined:
+                trips[name] = 1.0
+                continue
+            lower = [self._evaluate(bound, values, params) for bound in lowers[name]]
+            upper = [self._evaluate(bound, values, params) for bound in uppers[name]]
+            if None in lower or None in upper or not lower or not upper:
+                trips[name] = float(self.default_trips)
+                values[name] = trips[name] / 2
+            else:
+                trips[name] = max(1.0, min(upper) - max(lower) + 1)
+                values[name] = (min(upper) + max(lower)) / 2
+        return trips
+
+    def _evaluate(
+        self, expr: AffineExpr, values: Dict[str, float], params: Dict[str, int]
+    ) -> Optional[float]:
+        total = float(expr.const)
+        for var, coeff in expr.coeffs.items():
+            if not isinstance(var, str):
+                return None
+            total += coeff * values.get(var, params.get(var, self.default_size))
+        return total
+
+    def estimate(self, space: Space, fields: Dict[str, Any], schedule: Schedule) -> Estimate:
+        """Model ``schedule`` of the kernel over ``space`` that accesses ``fields``."""
+        trips = self.trips(space)
+        analysis = DependenceAnalysis(space, fields)
+        loops = schedule.loops
+
+        # Trip counts of tile loops and of the point loops inside them...
+        loop_trips: List[float] = []
+        for n, loop in enumerate(loops):
+            tiles = [tile for tile in loops[:n] if tile.is_tile and tile.iterator == loop.iterator]
+            extent = min([trips[loop.iterator]] + [tile.size for tile in tiles])
+            loop_trips.append(math.ceil(extent / loop.size) if loop.is_tile else extent)
+
+        accesses = [(field, access) for field in fields.values() for access in field.accesses]
+        levels: List[Level] = []
+        footprints = [
+            self.footprint(space, analysis, accesses, loops, trips, n)
+            for n in range(len(loops) + 1)
+        ]
+        for n, loop in enumerate(loops):
+            stride1, reuse = self.strides(analysis, accesses, loop.iterator)
+            levels.append(
+                Level(loop, loop_trips[n], stride1, reuse, footprints[n][0], footprints[n + 1][0])
+            )
+
+        iterations = _product(loop_trips)
+        misses: Dict[str, float] = {}
+        cost = iterations
+        if levels:
+            cost += iterations * (1.0 - levels[-1].stride1)
+        for cache in self.caches:
+            fits = [n for n, (size, _) in enumerate(footprints) if size <= cache.size]
+            level = fits[0] if fits else len(loops)
+            blocks = _product(loop_trips[:level])
+            misses[cache.name] = blocks * footprints[level][1]
+            cost += misses[cache.name] * cache.penalty
+
+        return Estimate(schedule, levels, iterations, misses, cost)
+
+    def footprint(
+        self,
+        space: Space,
+        analysis: DependenceAnalysis,
+        accesses: List[Tuple[Any, Access]],
+        loops: List[Loop],
+        trips: Dict[str, float],
+        level: int,
+    ) -> Tuple[float, float]:
+        """
+        Return the bytes and cache lines touched by all iterations of the loops
+        from ``level`` in. Accesses to a field that differ only by constant
+        offsets, like the points of a stencil, share their footprint.
+        """
+        spans: Dict[str, float] = {}
+        for name in space.iterators:
+            if not any(loop.iterator == name and not loop.is_tile for loop in loops[level:]):
+                spans[name] = 1.0
+                continue
+            outer = [loop.size for loop in loops[:level] if loop.is_tile and loop.iterator == name]
+            spans[name] = min([trips[name]] + outer)
+        for name, depends in analysis.definitions.items():
+            spans[name] = _product(spans.get(other, 1.0) for other in depends)
+
+        groups: Dict[Tuple, Tuple[int, List[AffineExpr]]] = {}
+        for field, access in accesses:
+            itemsize = ITEMSIZES.get(field.dtype, 4)
+            subscripts = analysis.subscripts(access)
+            if not subscripts:
+                key = (field.name, id(access))
+            else:
+                coeffs = [tuple(sorted(map(str, expr.coeffs.items()))) for expr in subscripts]
+                key = (field.name,) + tuple(coeffs)
+            groups.setdefault(key, (itemsize, []))[1].append(subscripts)
+
+        total_bytes = 0.0
+        total_lines = 0.0
+        for (itemsize, members) in groups.values():
+            if not members[0]:
+                # Unknown subscripts touch a new element every iteration...
+                elements = _product(spans.values())
+                total_bytes += elements * itemsize
+                total_lines += elements
+                continue
+            extents: List[float] = []
+            strides: List[float] = []
+            for dim in range(len(members[0])):
+                exprs = [subscripts[dim] for subscripts in members]
+                offsets = [expr.const for expr in exprs]
+                extent = 1.0 + max(offsets) - min(offsets)
+                stride = 1.0
+                for var, coeff in exprs[0].coeffs.items():
+                    span = _product(spans.get(name, 1.0) for name in _names(analysis, var))
+                    if span <= 1:
+                        continue
+                    if isinstance(var, str) and var not in analysis.definitions:
+                        extent += abs(coeff) * (span - 1)
+                        stride = max(stride, abs(coeff))
+                    else:
+                        extent *= span
+                        stride = self.line / itemsize
+                extents.append(extent)
+                strides.append(stride)
+            elements = _product(extents)
+            lines = min(extents[-1], math.ceil(extents[-1] * strides[-1] * itemsize / self.line))
+            total_bytes += elements * itemsize
+            total_lines += lines * _product(extents[:-1])
+        return total_bytes, total_lines
+
+    def strides(
+        self, analysis: DependenceAnalysis, accesses: List[Tuple[Any, Access]], iterator: str
+    ) -> Tuple[float, float]:
+        """
+        Return the fractions of ``accesses`` that are unit-stride or invariant, and
+        that are invariant, along the loop over ``iterator``.
+        """
+        if not accesses:
+            return 1.0, 0.0
+        varying = {
+            name for name, depends in analysis.definitions.items() if iterator in depends
+        } | {iterator}
+        unit = invariant = 0
+        for _, access in accesses:
+            subscripts = analysis.subscripts(access)
+            if not subscripts:
+                continue
+            uses = []
+            for dim, expr in enumerate(subscripts):
+                for var, coeff in expr.coeffs.items():
+                    if any(name in varying for name in _names(analysis, var)):
+                        uses.append((dim, var, abs(coeff)))
+            if not uses:
+                invariant += 1
+            elif uses == [(len(subscripts) - 1, iterator, 1)]:
+                unit += 1
+        return (unit + invariant) / len(accesses), invariant / len(accesses)
+
+    def rank(
+        self, space: Space, fields: Dict[str, Any], schedules: List[Schedule] = None
+    ) -> List[Tuple[Schedule, Estimate]]:
+        """
+        Return ``schedules`` (by default, the legal ``tune.candidates`` of the
+        kernel) with their estimates, from the cheapest.
+        """
+        if schedules is None:
+            schedules = candidates(space, fields, self.tile_sizes)
+        estimates = [(schedule, self.estimate(space, fields, schedule)) for schedule in schedules]
+        return sorted(estimates, key=lambda item: item[1].cost)
+
+    def best(
+        self, space: Space, fields: Dict[str, Any], schedules: List[Schedule] = None
+    ) -> Schedule:
+        """Return the schedule the model ranks cheapest."""
+        ranked = self.rank(space, fields, schedules)
+        if not ranked:
+            raise ValueError(f"No legal schedule of '{space.name}' to rank")
+        return ranked[0][0]
@@ -0,0 +1,214 @@
+# src/pyomega/deps.py
+import re
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pyomega.affine import AffineExpr, Variable, linearize, space_constraints
+from pyomega.ir import Access, Field, Space
+
+
+"""
+Loop-carried dependence tests over the field accesses of a kernel.
+"""
+
+
+@dataclass
+class DependenceAnalysis:
+    """
+    Decides which loops of a nest carry no dependence, from the affine subscripts
+    of the accesses collected by ``CompParser``.
+
+    A loop over ``v`` is parallel if, for each write to a field and each other
+    access to it, two iterations that agree on the enclosing loops but differ in
+    ``v`` cannot touch the same element. The test is conservative: it succeeds
+    only if some dimension forces ``v == v'``, or can never be equal, and any
+    access it cannot analyze is assumed to conflict.
+
+    Conflicts between updates like ``y[i] += ...`` that share the same operator
+    are reductions: the loop is still parallel if they are combined safely.
+    """
+
+    space: Space = None
+    fields: Dict[str, Field] = None
+
+    def __init__(self, space: Space, fields: Dict[str, Any]):
+        self.space = space
+        self.fields = fields
+        self.iterators: List[str] = list(space.iterators)
+
+        # Iterators fixed by an equality, e.g. i == row(n), with what they depend on.
+        self.definitions: Dict[str, Set[str]] = {}
+        self.indirect: Set[str] = set()
+        for constraint in space_constraints(space):
+            defined = [var for var in constraint.expr.variables() if var in self.iterators]
+            if constraint.is_eq and defined:
+                for iterator in defined:
+                    if abs(constraint.expr.coeff(iterator)) == 1:
+                        depends = set(self.iterators_of(constraint.expr)) - {iterator}
+                        self.definitions.setdefault(iterator, depends)
+                        if constraint.expr.calls():
+                            self.indirect.add(iterator)
+
+    def iterators_of(self, expr: AffineExpr) -> List[str]:
+        """Return the iterators ``expr`` uses, including those in its call arguments."""
+        names = []
+        for var in expr.variables():
+            if isinstance(var, str):
+                names.append(var)
+            else:
+                names.extend(word for arg in var[1] for word in re.findall(r"\w+", arg))
+        return [name for name in names if name in self.iterators]
+
+    def invariants(self, fixed: Set[str]) -> Set[str]:
+        """Close ``fixed`` over the iterators defined by equalities on fixed iterators."""
+        fixed = set(fixed)
+        changed = True
+        while changed:
+            changed = False
+            for iterator, depends in self.definitions.items():
+                if iterator not in fixed and depends <= fixed:
+                    fixed.add(iterator)
+                    changed = True
+        return fixed
+
+    def subscripts(self, access: Access) -> List[AffineExpr]:
+        """Return the affine subscripts of ``access``, or [] if any is not affine."""
+        if not access.indices or any(index is None for index in access.indices):
+            return []
+        try:
+            return [linearize(index) for index in access.indices]
+        except ValueError:
+            return []
+
+    def _shared(self, var: Variable, fixed: Set[str]) -> bool:
+        if isinstance(var, str):
+            return var not in self.iterators or var in fixed
+        return set(self.iterators_of(AffineExpr({var: 1}))) <= fixed
+
+    def _separates(
+        self, source: AffineExpr, sink: AffineExpr, iterator: str, fixed: Set[str]
+    ) -> bool:
+        # True if source(I) == sink(I') implies iterator == iterator', or is impossible.
+        for expr in (source, sink):
+            for var in expr.variables():
+                if var != iterator and not self._shared(var, fixed):
+                    return False
+        shared = set(source.variables()) | set(sink.variables())
+        shared.discard(iterator)
+        if any(source.coeff(var) != sink.coeff(var) for var in shared):
+            return False
+
+        coeff = source.coeff(iterator)
+        if coeff != sink.coeff(iterator):
+            return False
+        if coeff == 0:
+            return source.const != sink.const
+        return (sink.const - source.const) % coeff != 0 or source.const == sink.const
+
+    def independent(self, write: Access, access: Access, iterator: str, fixed: Set[str]) -> bool:
+        source = self.subscripts(write)
+        sink = self.subscripts(access)
+        if not source or len(source) != len(sink):
+            return False
+        return any(
+            self._separates(left, right, iterator, fixed) for left, right in zip(source, sink)
+        )
+
+    def conflicts(self, iterator: str, enclosing: List[str] = ()) -> Optional[Dict[str, str]]:
+        """
+        Return the fields updated by reductions that conflict across iterations of
+        the loop over ``iterator``, mapped to their reduction operator, or None if
+        any other dependence is carried by the loop.
+        """
+        fixed = self.invariants(set(enclosing))
+        if iterator in fixed:
+            return None
+        reductions: Dict[str, str] = {}
+        for field in self.fields.values():
+            writes = [access for access in field.accesses if access.is_write]
+            for write in writes:
+                for access in field.accesses:
+                    if self.independent(write, access, iterator, fixed):
+                        continue
+                    if not write.reduction or access.reduction != write.reduction:
+                        return None
+                    if reductions.setdefault(field.name, write.reduction) != write.reduction:
+                        return None
+        return reductions
+
+    def is_parallel(self, iterator: str, enclosing: List[str] = ()) -> bool:
+        """
+        Return True if the loop over ``iterator`` carries no dependence when the
+        ``enclosing`` iterators are held fixed.
+        """
+        return self.conflicts(iterator, enclosing) == {}
+
+    def pattern(self, field: str, iterator: str, enclosing: List[str] = ()) -> str:
+        """
+        Classify the reduction updates to ``field`` across the loop over ``iterator``:
+        'invariant' if every iteration updates the same elements, 'indirect' if they
+        are scattered through an index array, and 'direct' otherwise.
+        """
+        fixed = self.invariants(set(enclosing))
+        pattern = "invariant"
+        for access in self.fields[field].accesses:
+            if not access.reduction:
+                continue
+            subscripts = self.subscripts(access)
+            if not subscripts:
+                return "indirect"
+            for expr in subscripts:
+                for var in expr.variables():
+                    if self._shared(var, fixed):
+                        continue
+                    if not isinstance(var, str) or var in self.indirect:
+                        return "indirect"
+                    pattern = "direct"
+        return pattern
+
+    def plan(self, loops: List[Tuple[str, bool]]) -> List[Optional[Dict[str, str]]]:
+        """
+        For scheduled ``loops`` given as ``(iterator, is_point)`` from outermost in,
+        return the ``conflicts`` of each loop.
+        """
+        result: List[Optional[Dict[str, str]]] = []
+        enclosing: List[str] = []
+        for iterator, is_point in loops:
+            result.append(self.conflicts(iterator, enclosing))
+            if is_point:
+                enclosing.append(iterator)
+        return result
+
+    def parallel_loops(self, loops: List[Tuple[str, bool]]) -> List[bool]:
+        """
+        For scheduled ``loops`` given as ``(iterator, is_point)`` from outermost in,
+        return whether each can run in parallel without combining reductions.
+        """
+        return [conflicts == {} for conflicts in self.plan(loops)]
+
+    def is_legal(self, loops: List[Tuple[str, bool]]) -> bool:
+        """
+        Return True if scanning the space with the scheduled ``loops``, given as
+        ``(iterator, is_point)`` from outermost in, preserves every dependence.
+
+        Loops matching the original order keep carrying their dependences, and
+        each loop from the first that moves must carry none but reductions. The
+        test is conservative, e.g. it rejects interchanging the loops of
+        ``u[i, j] = u[i - 1, j]``, and reassociates reductions.
+        """
+        prefix = 0
+        for (iterator, is_point), original in zip(loops, self.iterators):
+            if not is_point or iterator != original:
+                break
+            prefix += 1
+
+        enclosing: List[str] = []
+        for n, (iterator, is_point) in enumerate(loops):
+            # Iterators fixed by enclosing loops, like j == col(n), do not iterate...
+            if n >= prefix and iterator not in self.invariants(set(enclosing)):
+                if self.conflicts(iterator, enclosing) is None:
+                    return False
+            if is_point:
+                enclosing.append(iterator)
+        return True
@@ -0,0 +1,100 @@
+# src/pyomega/dispatch.py
+import dataclasses
+import inspect
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+"""
+The visitor core shared by the IR visitors, parsers and passes: method dispatch
+through tables built once per class, and an explicit-stack traversal for
+visitors written as generators.
+"""
+
+
+# Per visitor class and node class, the visit method and whether it is a generator...
+_TABLES: Dict[Tuple[type, bool], Dict[type, Tuple[Optional[Callable], bool]]] = {}
+
+# Field names of each dataclass node type...
+_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def lookup(
+    visitor_class: type, node_class: type, inherit: bool = True
+) -> Tuple[Optional[Callable], bool]:
+    """
+    Return the ``visit_<name>`` function of ``visitor_class`` for nodes of
+    ``node_class``, or None, and whether it is a generator function. With
+    ``inherit`` set, a node without its own method is visited by the method of
+    its nearest first base class.
+    """
+    table = _TABLES.setdefault((visitor_class, inherit), {})
+    entry = table.get(node_class)
+    if entry is None:
+        method = None
+        klass = node_class
+        while klass is not None:
+            method = getattr(visitor_class, "visit_" + klass.__name__, None)
+            if method is not None or not inherit or not klass.__bases__:
+                break
+            klass = klass.__bases__[0]
+        entry = table[node_class] = (method, inspect.isgeneratorfunction(method))
+    return entry
+
+
+def iter_fields(node: Any) -> Iterator[Tuple[str, Any]]:
+    """Yield the ``(name, value)`` of each field of dataclass ``node``, without copying."""
+    names = _FIELDS.get(node.__class__)
+    if names is None:
+        names = _FIELDS[node.__class__] = tuple(field.name for field in dataclasses.fields(node))
+    for name in names:
+        yield name, getattr(node, name)
+
+
+class Dispatcher:
+    """
+    Dispatches ``visit(node)`` to the ``visit_<name>`` method for the class of
+    ``node``, falling back to ``generic_visit``. Methods are looked up by the
+    exact class name unless ``inherit_visitors`` is set, in which case the base
+    classes of nodes are tried in turn.
+
+    Visit methods written as generators run on an explicit stack, so visiting
+    deep trees does not recurse: each ``yield child`` visits a child and
+    evaluates to its result, e.g.
+
+        def visit_BinOp(self, node):
+            left = yield node.left
+            right = yield node.right
+            return f"{left} {node.op} {right}"
+    """
+
+    inherit_visitors = False
+
+    def visit(self, node: Any, **kwargs) -> Any:
+        """Visit a node."""
+        method, is_generator = lookup(self.__class__, node.__class__, self.inherit_visitors)
+        if method is None:
+            return self.generic_visit(node, **kwargs)
+        if not is_generator:
+            return method(self, node, **kwargs)
+        return self._run(method(self, node, **kwargs), kwargs)
+
+    def _run(self, generator: Any, kwargs: Dict[str, Any]) -> Any:
+        stack: List[Any] = [generator]
+        value = None
+        while stack:
+            try:
+                child = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+                continue
+            method, is_generator = lookup(self.__class__, child.__class__, self.inherit_visitors)
+            if method is None:
+                value = self.generic_visit(child, **kwargs)
+            elif is_generator:
+                stack.append(method(self, child, **kwargs))
+                value = None
+            else:
+                value = method(self, child, **kwargs)
+        return value
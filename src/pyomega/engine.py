@@ -0,0 +1,150 @@
+# src/pyomega/engine.py
+import os
+import time
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple, Union
+
+from pyomega.backend import DEFAULT_CAPACITY, OmegaBackend
+from pyomega.cache import CodeCache
+from pyomega.ir import Space
+
+
+"""
+Implementation of a process-pool engine for compiling many kernels in parallel.
+"""
+
+
+KernelSpec = Union[str, Tuple[Space, Any, Dict[str, Any]]]
+
+# Per-process state, created once by _init_worker and reused for every spec.
+_backend: OmegaBackend = None
+_cache: CodeCache = None
+_options: Dict[str, Any] = None
+
+
+def _init_worker(
+    capacity: int = DEFAULT_CAPACITY, cache_path: str = "", options: Dict[str, Any] = None
+) -> None:
+    global _backend, _cache, _options
+    _backend = OmegaBackend(capacity)
+    _backend.lib  # Load the native library before the first spec arrives...
+    _cache = CodeCache(cache_path) if cache_path else None
+    _options = options
+
+
+def _compile(spec: KernelSpec) -> str:
+    if _backend is None:
+        _init_worker()
+    return compile_spec(spec, _backend, _cache, _options)
+
+
+def _compile_timed(spec: KernelSpec) -> Tuple[str, float]:
+    start = time.perf_counter()
+    source = _compile(spec)
+    return source, time.perf_counter() - start
+
+
+def compile_spec(
+    spec: KernelSpec,
+    backend: OmegaBackend = None,
+    cache: CodeCache = None,
+    options: Dict[str, Any] = None,
+) -> str:
+    """
+    Compile ``spec`` to C, passing ``options`` like ``standalone`` or ``parallel``
+    to the code generator.
+    """
+    from pyomega.parser import IRParser
+    from pyomega.visit import CodeGenerator
+
+    if isinstance(spec, str):
+        spec = IRParser(spec).parse()
+    return CodeGenerator(cache=cache, backend=backend, **(options or {}))(*spec)
+
+
+@dataclass
+class CompileEngine:
+    """
+    Compiles kernel specs, either IR source strings or parsed ``(space, ast, fields)``
+    tuples, across ``jobs`` worker processes. The Omega parser is not reentrant,
+    so processes rather than threads provide the parallelism. With ``jobs=1``
+    specs are compiled in the calling process. Every spec is generated with the
+    code generator ``options``.
+    """
+
+    jobs: int = 0
+    capacity: int = DEFAULT_CAPACITY
+    cache_path: str = ""
+    options: Dict[str, Any] = None
+
+    def __init__(
+        self,
+        jobs: int = 0,
+        capacity: int = DEFAULT_CAPACITY,
+        cache_path: str = "",
+        options: Dict[str, Any] = None,
+    ):
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.capacity = capacity
+        self.cache_path = cache_path
+        self.options = dict(options or {})
+        self._executor: ProcessPoolExecutor = None
+        self._backend: OmegaBackend = None
+        self._cache: CodeCache = None
+
+    def __enter__(self) -> "CompileEngine":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.jobs,
+                initializer=_init_worker,
+                initargs=(self.capacity, self.cache_path, self.options),
+            )
+        return self._executor
+
+    def submit(self, spec: KernelSpec, timed: bool = False) -> Future:
+        """
+        Compile ``spec`` and return a future of its source or, if ``timed`` is
+        set, of its source and the seconds spent compiling it.
+        """
+        if self.jobs == 1:
+            future = Future()
+            try:
+                start = time.perf_counter()
+                source = self._compile_local(spec)
+                future.set_result((source, time.perf_counter() - start) if timed else source)
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+        return self.executor.submit(_compile_timed if timed else _compile, spec)
+
+    def compile(self, specs: List[KernelSpec]) -> List[str]:
+        """
+        Compile ``specs`` and return the sources in submission order. The first
+        exception raised by a worker is re-raised here.
+        """
+        specs = list(specs)
+        if self.jobs == 1:
+            return [self._compile_local(spec) for spec in specs]
+        chunksize = max(1, len(specs) // (self.jobs * 4))
+        return list(self.executor.map(_compile, specs, chunksize=chunksize))
+
+    def _compile_local(self, spec: KernelSpec) -> str:
+        if self._backend is None:
+            self._backend = OmegaBackend(self.capacity)
+            self._cache = CodeCache(self.cache_path) if self.cache_path else None
+        return compile_spec(spec, self._backend, self._cache, self.options)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
@@ -0,0 +1,191 @@
+# src/pyomega/instrument.py
+import contextlib
+import os
+import threading
+import time
+
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, List
+
+
+"""
+Timers and counters for the phases of the compile pipeline.
+"""
+
+
+@dataclass
+class Event:
+    """
+    A completed phase: its ``kernel``, duration in seconds and ``counters``, like
+    the size of the Omega input and output.
+    """
+
+    phase: str = ""
+    kernel: str = ""
+    seconds: float = 0.0
+    counters: Dict[str, int] = None
+
+
+@dataclass
+class PhaseStats:
+    """The calls, time and summed counters of a phase, with its time per kernel."""
+
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    counters: Dict[str, int] = None
+    kernels: Dict[str, float] = None
+
+    def add(self, event: Event) -> None:
+        self.calls += 1
+        self.seconds += event.seconds
+        self.max_seconds = max(self.max_seconds, event.seconds)
+        for name, value in event.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        if event.kernel:
+            self.kernels[event.kernel] = self.kernels.get(event.kernel, 0.0) + event.seconds
+
+
+class Span:
+    """A running phase, which accepts counters until it completes."""
+
+    __slots__ = ("instrument", "phase", "kernel", "counters", "start")
+
+    def __init__(self, instrument: "Instrument", phase: str, kernel: str):
+        self.instrument = instrument
+        self.phase = phase
+        self.kernel = kernel
+        self.counters: Dict[str, int] = {}
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        seconds = time.perf_counter() - self.start
+        self.instrument.record(Event(self.phase, self.kernel, seconds, self.counters))
+
+
+class _NullSpan:
+    """The span of every phase while instrumentation is disabled: it does nothing."""
+
+    __slots__ = ()
+
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+@dataclass
+class Instrument:
+    """
+    Collects the events of each phase into ``stats``, passes them to each of
+    ``callbacks`` and, if ``log`` is set, logs them to the ``pyomega`` logger at
+    DEBUG level with the event fields in ``extra``.
+    """
+
+    stats: Dict[str, PhaseStats] = None
+    callbacks: List[Callable[[Event], None]] = ()
+    log: bool = False
+
+    def __init__(self, callbacks: List[Callable[[Event], None]] = (), log: bool = False):
+        self.stats = {}
+        self.callbacks = list(callbacks)
+        self.log = log
+        self._lock = threading.Lock()
+
+    def phase(self, name: str, kernel: str = "") -> Span:
+        return Span(self, name, kernel)
+
+    def record(self, event: Event) -> None:
+        with self._lock:
+            stats = self.stats.get(event.phase)
+            if stats is None:
+                stats = self.stats[event.phase] = PhaseStats(0, 0.0, 0.0, {}, {})
+            stats.add(event)
+        for callback in self.callbacks:
+            callback(event)
+        if self.log:
+            import logging
+
+            logging.getLogger("pyomega").debug(
+                "%s %s %.6fs %s",
+                event.phase,
+                event.kernel,
+                event.seconds,
+                event.counters,
+                extra={"event": asdict(event)},
+            )
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {phase: asdict(stats) for phase, stats in self.stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats.clear()
+
+
+_active: Instrument = None
+
+
+def phase(name: str, kernel: str = "") -> Any:
+    """
+    Return a context manager timing phase ``name`` of ``kernel``, whose ``count``
+    method adds to its counters. While instrumentation is disabled this returns
+    a shared object that does nothing.
+    """
+    if _active is None:
+        return _NULL_SPAN
+    return _active.phase(name, kernel)
+
+
+def enable(instrument: Instrument = None) -> Instrument:
+    """Record the phases of the pipeline into ``instrument``, or a new one, and return it."""
+    global _active
+    _active = instrument or Instrument()
+    return _active
+
+
+def disable() -> Instrument:
+    """Stop recording phases and return the instrument that recorded them, if any."""
+    global _active
+    instrument, _active = _active, None
+    return instrument
+
+
+def active() -> Instrument:
+    return _active
+
+
+@contextlib.contextmanager
+def profiling(instrument: Instrument = None) -> Iterator[Instrument]:
+    """
+    Enable instrumentation within a ``with`` block, restoring the previous state
+    on exit, e.g.
+
+        with profiling() as instrument:
+            CodeGenerator()(*IRParser(expr).parse())
+        print(instrument.stats["omega"].seconds)
+    """
+    global _active
+    previous = _active
+    try:
+        yield enable(instrument)
+    finally:
+        _active = previous
+
+
+if os.environ.get("PYOMEGA_PROFILE"):
+    enable(Instrument(log=True))
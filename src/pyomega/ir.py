@@ -1,9 +1,10 @@
 # src/pyomega/ir.py
 import ast
+import sys
 
 from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
 
 
 """
@@ -68,36 +69,151 @@ class Space(Node):
     def __init__(self):
         self.iterators = OrderedDict()
         self.relations = list()
+        self._added: Dict[int, Relation] = {}
 
     def add_iterator(self, iterator: Iterator):
         assert isinstance(iterator, Iterator)
         self.iterators[iterator.name] = iterator
 
     def add_relation(self, relation: Relation):
+        """
+        Append ``relation`` unless this very object was already added, in constant
+        time. Relations from a ``NodeTable`` are shared, so equal ones are added once.
+        """
         assert isinstance(relation, Relation)
-        exists = False
-        for n in range(len(self.relations) - 1, -1, -1):
-            exists = exists or relation.id == self.relations[n].id
-            if exists:
-                return
+        if len(self._added) != len(self.relations):
+            self._added = {rel.id: rel for rel in self.relations}
+        if self._added.get(relation.id) is relation:
+            return
+        self._added[relation.id] = relation
         self.relations.append(relation)
 
 
+@dataclass
+class NodeTable:
+    """
+    Hash-consed IR nodes: each factory method returns the one node shared by all
+    structurally equal calls, so repeated subexpressions are stored once and
+    can be compared and deduplicated by identity in O(1). Names are interned.
+    Children must come from the same table, or be passed through ``intern``,
+    and shared nodes must not be mutated.
+    """
+
+    nodes: Dict[Tuple, Node] = None
+
+    def __init__(self):
+        self.nodes = {}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _get(self, key: Tuple, make: Callable[[], Node]) -> Node:
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = make()
+        return node
+
+    def iterator(self, name: str) -> Iterator:
+        name = sys.intern(name)
+        return self._get(("Iterator", name), lambda: Iterator(name))
+
+    def constant(self, name: str) -> Constant:
+        name = sys.intern(name)
+        return self._get(("Constant", name), lambda: Constant(name))
+
+    def literal(self, value: str) -> Literal:
+        value = sys.intern(value)
+        return self._get(("Literal", value), lambda: Literal(value))
+
+    def binop(self, left: Node, op: str, right: Node) -> BinOp:
+        key = ("BinOp", id(left), op, id(right))
+        return self._get(key, lambda: BinOp(left, op, right))
+
+    def function(self, name: str, args: List[Node]) -> Function:
+        name = sys.intern(name)
+        key = ("Function", name) + tuple(map(id, args))
+        return self._get(key, lambda: Function(name, list(args)))
+
+    def relation(
+        self, left: Node, left_op: str, mid: Node = None, right_op: str = "", right: Node = None
+    ) -> Relation:
+        key = ("Relation", id(left), left_op, id(mid), right_op, id(right))
+        return self._get(key, lambda: Relation("", left, left_op, mid, right_op, right))
+
+    def intern(self, node: Node) -> Node:
+        """Return the shared node equal to the expression or relation tree ``node``."""
+        shared: Dict[int, Node] = {id(None): None}
+        stack = [(node, False)]
+        while stack:
+            item, expanded = stack.pop()
+            if id(item) in shared:
+                continue
+            if isinstance(item, Relation):
+                children = [item.left, item.mid, item.right]
+            elif isinstance(item, BinOp):
+                children = [item.left, item.right]
+            elif isinstance(item, Function):
+                children = list(item.args)
+            else:
+                children = []
+            if children and not expanded:
+                stack.append((item, True))
+                stack.extend((child, False) for child in children)
+                continue
+
+            args = [shared[id(child)] for child in children]
+            if isinstance(item, Relation):
+                result = self.relation(args[0], item.left_op, args[1], item.right_op, args[2])
+            elif isinstance(item, BinOp):
+                result = self.binop(args[0], item.op, args[1])
+            elif isinstance(item, Function):
+                result = self.function(item.name, args)
+            elif isinstance(item, Iterator):
+                result = self.iterator(item.name)
+            elif isinstance(item, Constant):
+                result = self.constant(item.name)
+            elif isinstance(item, Literal):
+                result = self.literal(item.value)
+            else:
+                result = item
+            shared[id(item)] = result
+        return shared[id(node)]
+
+
+@dataclass
 class Statement(Node):
+    """
+    The statements ``root`` executed at each point of ``space``. The ``schedule``
+    holds the constants between its loops, ``[c0, c1, ...]``, and ``shifts`` the
+    offset of each loop.
+    """
+
     number: int = 0
-    schedule: Tuple[int]
+    space: Space = None
+    root: ast.Module = None
+    fields: Dict[str, "Field"] = None
+    schedule: Tuple[int, ...] = ()
+    shifts: Tuple[int, ...] = ()
+
+    @property
+    def iterators(self) -> List[str]:
+        return list(self.space.iterators.keys())
 
 
+@dataclass
 class Computation(Node):
     name: str = ""
     space: Space = None
     statements: List[Statement] = ()
+    fields: Dict[str, "Field"] = None
 
 
 @dataclass
 class Access(Node):
     node: Node
     is_write: bool
+    indices: List[Node] = ()
+    reduction: str = ""
 
 
 @dataclass
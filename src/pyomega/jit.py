@@ -0,0 +1,386 @@
+# src/pyomega/jit.py
+import ctypes
+import hashlib
+import os
+import re
+import shlex
+import subprocess
+import tempfile
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from pyomega import __version__
+from pyomega.cache import DEFAULT_CACHE_DIR
+from pyomega.instrument import phase
+
+
+"""
+Compiles generated C kernels into shared libraries and calls them through ctypes.
+"""
+
+
+DEFAULT_FLAGS = ("-O3", "-std=c99", "-shared", "-fPIC")
+
+# C element types of kernel fields and the NumPy dtypes they accept...
+DTYPES = {
+    "float": "float32",
+    "double": "float64",
+    "int": "int32",
+    "long": "int64",
+}
+
+
+# The comparison seen from its right-hand side...
+_FLIPPED = {"<=": ">=", "<": ">", ">=": "<=", ">": "<", "==": "=="}
+
+Interval = Optional[Tuple[int, int]]
+
+
+def _interval(node: Any, bounds: Dict[str, Tuple[int, int]], values: Dict[str, Any]) -> Interval:
+    """
+    Return the least and greatest values IR expression ``node`` can take, with
+    iterators in ``bounds`` and constants and index arrays given by ``values``,
+    or None if they are not known.
+    """
+    from pyomega import ir
+
+    if isinstance(node, ir.Iterator):
+        return bounds.get(node.name)
+    if isinstance(node, ir.Constant):
+        value = values.get(node.name)
+        return None if value is None else (int(value), int(value))
+    if isinstance(node, ir.Literal):
+        value = float(node.value)
+        return (int(value), int(value)) if value.is_integer() else None
+    if isinstance(node, ir.Function):
+        array = values.get(node.name)
+        if array is None or len(node.args) != 1:
+            return None
+        arg = _interval(node.args[0], bounds, values)
+        if arg is None or arg[0] > arg[1]:
+            return None
+        if arg[0] < 0 or arg[1] >= len(array):
+            raise ValueError(
+                f"Argument '{node.name}' has {len(array)} element(s), "
+                f"but the kernel reads entries {arg[0]} to {arg[1]}"
+            )
+        return int(array.min()), int(array.max())
+    if isinstance(node, ir.BinOp) and node.op in ("+", "-", "*"):
+        left = _interval(node.left, bounds, values)
+        right = _interval(node.right, bounds, values)
+        if left is None or right is None:
+            return None
+        if node.op == "+":
+            return left[0] + right[0], left[1] + right[1]
+        if node.op == "-":
+            return left[0] - right[1], left[1] - right[0]
+        products = [a * b for a in left for b in right]
+        return min(products), max(products)
+    return None
+
+
+def iterator_bounds(space: Any, values: Dict[str, Any]) -> Dict[str, Tuple[int, int]]:
+    """
+    Return the least and greatest value of each iterator of ``space`` that its
+    constraints on the bare iterator allow, given the ``values`` of constants
+    and index arrays, e.g. ``j`` in ``j == col(n)`` lies within the values of
+    ``col``. Iterators without both bounds are left out.
+    """
+    from pyomega import ir
+
+    lower: Dict[str, int] = {}
+    upper: Dict[str, int] = {}
+    for _ in range(len(space.iterators) + 1):
+        known = {name: (lower[name], upper[name]) for name in lower if name in upper}
+        changed = False
+        for rel in space.relations:
+            pairs = [(rel.left, rel.left_op, rel.mid if rel.mid is not None else rel.right)]
+            if rel.mid is not None:
+                pairs.append((rel.mid, rel.right_op, rel.right))
+            for left, op, right in pairs:
+                for node, node_op, other in ((left, op, right), (right, _FLIPPED[op], left)):
+                    if not isinstance(node, ir.Iterator) or node.name not in space.iterators:
+                        continue
+                    interval = _interval(other, known, values)
+                    if interval is None:
+                        continue
+                    low, high = interval
+                    if node_op in (">=", ">", "=="):
+                        low += node_op == ">"
+                        if node.name not in lower or low > lower[node.name]:
+                            lower[node.name] = low
+                            changed = True
+                    if node_op in ("<=", "<", "=="):
+                        high -= node_op == "<"
+                        if node.name not in upper or high < upper[node.name]:
+                            upper[node.name] = high
+                            changed = True
+        if not changed:
+            break
+    return {name: (lower[name], upper[name]) for name in lower if name in upper}
+
+
+def _default_cc() -> str:
+    return os.environ.get("CC", "cc")
+
+
+def _jit_dir() -> str:
+    return os.path.join(os.environ.get("PYOMEGA_CACHE_DIR", DEFAULT_CACHE_DIR), "jit")
+
+
+@dataclass
+class Counters:
+    """
+    The runtime counters of a kernel generated with ``counters=True``: the time
+    spent in its loop nest, the iterations of each loop level, the executions of
+    each statement, the bytes of each field its statements read and write, and
+    the least and most statements run by an iteration of its outermost loop.
+    """
+
+    seconds: float = 0.0
+    iterations: Dict[str, int] = None
+    executions: Dict[str, int] = None
+    bytes_read: Dict[str, int] = None
+    bytes_written: Dict[str, int] = None
+    min_work: int = 0
+    max_work: int = 0
+
+    @property
+    def imbalance(self) -> float:
+        """The most statements run by an outermost iteration over the mean, or 1.0."""
+        outer = next(iter(self.iterations.values()), 0)
+        if not outer or not self.max_work:
+            return 1.0
+        return self.max_work * outer / sum(self.executions.values())
+
+    @classmethod
+    def decode(cls, values: List[int], layout: Dict[str, Any]) -> "Counters":
+        """Return the counters stored in ``values`` by a kernel with ``layout``."""
+        levels, statements = layout["levels"], layout["statements"]
+        iterations = dict(zip(levels, values[1:]))
+        executions = dict(zip(statements, values[1 + len(levels) :]))
+        bytes_read: Dict[str, int] = {}
+        bytes_written: Dict[str, int] = {}
+        for statement, fields in layout["traffic"].items():
+            for field, (reads, writes) in fields.items():
+                if reads:
+                    bytes_read[field] = bytes_read.get(field, 0) + reads * executions[statement]
+                if writes:
+                    written = writes * executions[statement]
+                    bytes_written[field] = bytes_written.get(field, 0) + written
+        least, most = values[-2], values[-1]
+        return cls(
+            values[0] / 1e9,
+            iterations,
+            executions,
+            bytes_read,
+            bytes_written,
+            least if most else 0,
+            most,
+        )
+
+
+@dataclass
+class Kernel:
+    """
+    A compiled kernel callable as ``kernel(*constants, *fields, *index_arrays)``.
+    Fields and index arrays are C-contiguous NumPy arrays, passed without copying;
+    row strides of multi-dimensional fields are taken from the arrays themselves.
+    Kernels generated with counters return the ``Counters`` of each call.
+
+    Given the kernel's ``space`` and ``fields``, each call checks that the arrays
+    hold every element the iterator bounds allow the kernel to access, using
+    the constants and index arrays passed. Subscripts whose range is not known,
+    like those of iterators bounded only through other affine terms, are left to
+    the caller, as is every access of a kernel built without its space.
+    """
+
+    name: str = ""
+    parameters: List[Tuple[str, str, str]] = ()
+    ndims: Dict[str, int] = None
+    func: Any = None
+    layout: Dict[str, Any] = None
+    space: Any = None
+    fields: Dict[str, Any] = None
+
+    @property
+    def arguments(self) -> List[str]:
+        return [name for kind, _, name in self.parameters if kind not in ("stride", "counters")]
+
+    def __call__(self, *args: Any) -> Optional[Counters]:
+        arguments = self.arguments
+        if len(args) != len(arguments):
+            raise TypeError(
+                f"{self.name}() takes {len(arguments)} arguments ({', '.join(arguments)}), "
+                f"got {len(args)}"
+            )
+
+        values = dict(zip(arguments, args))
+        if self.space is not None:
+            self.check_extents(values)
+        c_args = []
+        buffer = None
+        for kind, ctype, name in self.parameters:
+            if kind == "counters":
+                size = 3 + len(self.layout["levels"]) + len(self.layout["statements"])
+                buffer = (ctypes.c_longlong * size)()
+                c_args.append(buffer)
+            elif kind == "constant":
+                c_args.append(ctypes.c_int(int(values[name])))
+            elif kind == "stride":
+                field, dim = re.match(r"(\w+)_stride(\d+)$", name).groups()
+                array = values[field]
+                c_args.append(ctypes.c_int(array.strides[int(dim)] // array.itemsize))
+            else:
+                dtype = "int" if kind == "index" else ctype.split()[-2]
+                ndim = self.ndims.get(name, 1) if kind == "field" else 1
+                writable = not ctype.startswith("const")
+                c_args.append(self._pointer(name, values[name], dtype, ndim, writable))
+
+        self.func(*c_args)
+        if buffer is not None:
+            return Counters.decode(list(buffer), self.layout)
+        return None
+
+    def check_extents(self, values: Dict[str, Any]) -> None:
+        """Raise ValueError if an access of the kernel may fall outside its array."""
+        import numpy as np
+
+        arrays = {name: value for name, value in values.items() if isinstance(value, np.ndarray)}
+        constants = {name: value for name, value in values.items() if name not in arrays}
+        index_arrays = {
+            name: arrays[name] for kind, _, name in self.parameters if kind == "index"
+        }
+        bounds = iterator_bounds(self.space, dict(constants, **index_arrays))
+        if any(low > high for low, high in bounds.values()):
+            return  # The space is empty, so nothing is accessed...
+
+        for field in (self.fields or {}).values():
+            array = arrays.get(field.name)
+            if array is None:
+                continue
+            for access in field.accesses:
+                if len(access.indices) != array.ndim:
+                    continue
+                for dim, index in enumerate(access.indices):
+                    interval = _interval(index, bounds, dict(constants, **index_arrays))
+                    if interval is None:
+                        continue
+                    if interval[0] < 0 or interval[1] >= array.shape[dim]:
+                        raise ValueError(
+                            f"Argument '{field.name}' has {array.shape[dim]} element(s) in "
+                            f"dimension {dim}, but the kernel accesses indices "
+                            f"{interval[0]} to {interval[1]}"
+                        )
+
+    def _pointer(self, name: str, array: Any, dtype: str, ndim: int, writable: bool) -> Any:
+        import numpy as np
+
+        if not isinstance(array, np.ndarray):
+            raise TypeError(f"Argument '{name}' must be a numpy.ndarray")
+        if array.dtype != np.dtype(DTYPES[dtype]):
+            raise TypeError(f"Argument '{name}' must have dtype {DTYPES[dtype]}, not {array.dtype}")
+        if array.ndim != ndim:
+            raise ValueError(f"Argument '{name}' must have {ndim} dimension(s), not {array.ndim}")
+        if not array.flags.c_contiguous:
+            raise ValueError(f"Argument '{name}' must be C-contiguous")
+        if writable and not array.flags.writeable:
+            raise ValueError(f"Argument '{name}' is written by the kernel but is read-only")
+        return array.ctypes.data_as(ctypes.c_void_p)
+
+
+@dataclass
+class JITCompiler:
+    """
+    Builds C sources with the system compiler (``$CC``, or ``cc``) into shared
+    libraries cached on disk by the hash of the source, compiler and flags.
+    """
+
+    cc: str = ""
+    flags: Tuple[str, ...] = DEFAULT_FLAGS
+    path: str = ""
+
+    def __init__(self, cc: str = "", flags: Tuple[str, ...] = DEFAULT_FLAGS, path: str = ""):
+        self.cc = cc or _default_cc()
+        self.flags = tuple(flags)
+        self.path = path or _jit_dir()
+        self._libs: Dict[str, ctypes.CDLL] = {}
+
+    def key(self, source: str) -> str:
+        hasher = hashlib.sha256(__version__.encode())
+        for item in (source, self.cc) + self.flags:
+            hasher.update(b"\0" + item.encode())
+        return hasher.hexdigest()
+
+    def build(self, source: str) -> str:
+        """Compile ``source`` and return the path of the shared library."""
+        key = self.key(source)
+        lib_path = os.path.join(self.path, key[:2], key + ".so")
+        if os.path.exists(lib_path):
+            return lib_path
+
+        os.makedirs(os.path.dirname(lib_path), exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(lib_path)) as tmp_dir:
+            src_path = os.path.join(tmp_dir, "kernel.c")
+            with open(src_path, "w") as file:
+                file.write(source)
+            tmp_path = os.path.join(tmp_dir, "kernel.so")
+            command = shlex.split(self.cc) + list(self.flags) + [src_path, "-o", tmp_path, "-lm"]
+            with phase("cc") as span:
+                result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                span.count("input_size", len(source))
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"Compilation failed ({' '.join(command)}):\n{result.stderr.decode()}"
+                )
+            os.replace(tmp_path, lib_path)
+
+        return lib_path
+
+    def load(self, source: str) -> ctypes.CDLL:
+        key = self.key(source)
+        if key not in self._libs:
+            self._libs[key] = ctypes.CDLL(self.build(source))
+        return self._libs[key]
+
+    def compile(self, generator: Any, source: str) -> Kernel:
+        """
+        Return the callable kernel for the ``source`` produced by a ``CodeGenerator``
+        run in standalone mode.
+        """
+        if not generator.standalone:
+            raise ValueError("The code generator must be run with standalone=True")
+        lib = self.load(source)
+        func = getattr(lib, generator.name)
+        func.restype = None
+        layout = generator.counter_layout() if generator.counters else None
+        return Kernel(
+            generator.name,
+            generator.parameters(),
+            dict(generator.ndims),
+            func,
+            layout,
+            generator.space,
+            generator.fields,
+        )
+
+
+def jit(
+    space: Any,
+    py_ast: Any,
+    fields: Dict[str, Any],
+    compiler: JITCompiler = None,
+    tuning: Any = None,
+    counters: bool = False,
+) -> Kernel:
+    """
+    Generate standalone C for a parsed kernel and compile it to a callable, using
+    its schedule from the ``tuning`` database if it was tuned on this machine.
+    With ``counters`` set, the kernel returns the ``Counters`` of each call.
+    """
+    from pyomega.visit import CodeGenerator
+
+    generator = CodeGenerator(standalone=True, tuning=tuning, counters=counters)
+    source = generator(space, py_ast, fields)
+    return (compiler or JITCompiler()).compile(generator, source)
@@ -2,9 +2,11 @@
 import ast
 
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from pyomega import ir
+from pyomega.dispatch import Dispatcher
+from pyomega.instrument import phase
 
 
 """
@@ -13,7 +15,7 @@ Implementation of a polyhedral expression parser in PyOmega.
 
 
 @dataclass
-class Parser(ast.NodeVisitor):
+class Parser(Dispatcher, ast.NodeVisitor):
     expression: str = ""
     root: ast.Module = None
 
@@ -23,12 +25,6 @@ class Parser(ast.NodeVisitor):
         assert isinstance(node, ast.Module)
         self.root = node
 
-    def visit(self, node, **kwargs):
-        """Visit a node."""
-        method = "visit_" + node.__class__.__name__
-        visitor = getattr(self, method, self.generic_visit)
-        return visitor(node, **kwargs)
-
     def visit_Module(self, node: ast.Module):
         assert len(node.body) > 0
         for child in node.body:
@@ -41,10 +37,13 @@ class RelParser(Parser):
     space: ir.Space = ir.Space()
     ufuncs: Dict[str, ir.Function] = ()
 
-    def __init__(self, node: ast.Module = None, expression: str = ""):
+    def __init__(
+        self, node: ast.Module = None, expression: str = "", nodes: ir.NodeTable = None
+    ):
         super().__init__(node, expression)
         self.space = ir.Space()
         self.ufuncs = {}
+        self.nodes = nodes if nodes is not None else ir.NodeTable()
 
     def parse(self) -> ir.Space:
         self.visit(self.root)
@@ -59,12 +58,12 @@ class RelParser(Parser):
         name = node.id
         if name in self.space.iterators:
             return self.space.iterators[name]
-        return ir.Constant(name=name)
+        return self.nodes.constant(name)
 
     def visit_Dict(self, node: ast.Dict) -> None:
         for key in node.keys:
             for elt in key.elts:
-                self.space.add_iterator(ir.Iterator(name=elt.id))
+                self.space.add_iterator(self.nodes.iterator(elt.id))
         for value in node.values:
             self.visit(value)
 
@@ -99,19 +98,16 @@ class RelParser(Parser):
         raise TypeError("Unrecognized operator: " + str(node))
 
     def visit_Call(self, node: ast.Call) -> ir.Function:
-        func: ir.Function = ir.Function(node.func.id, list())
-        for arg in node.args:
-            func.add(self.visit(arg))
-        return func
+        return self.nodes.function(node.func.id, [self.visit(arg) for arg in node.args])
 
     def visit_BinOp(self, node: ast.BinOp) -> ir.BinOp:
-        bin_op = ir.BinOp()
-        bin_op.left = self.visit(node.left)
-        bin_op.op = self.visit_Op(node.op)
-        bin_op.right = self.visit(node.right)
-        return bin_op
+        left = self.visit(node.left)
+        op = self.visit_Op(node.op)
+        return self.nodes.binop(left, op, self.visit(node.right))
 
     def visit_Compare(self, node: ast.Compare) -> None:
+        # Relations are completed in place, then shared through the node table...
+        pending: List[ir.Relation] = []
         relation = ir.Relation()
         relation.left = self.visit(node.left)
 
@@ -127,9 +123,9 @@ class RelParser(Parser):
             next_op = node.ops[n + 1]
 
             relation.left_op = self.visit_Op(op)
-            if isinstance(comp, ast.BinOp):
+            if isinstance(comp, ast.BinOp) and isinstance(comp.op, ast.BitXor):
                 relation.right = self.visit(comp.left)
-                self.space.add_relation(relation)
+                pending.append(relation)
                 # Begin next relation...
                 relation = ir.Relation()
                 relation.left = self.visit(comp.right)
@@ -138,15 +134,15 @@ class RelParser(Parser):
                 relation.mid = self.visit(comp)
                 relation.right_op = self.visit_Op(next_op)
 
-            if isinstance(next_comp, ast.BinOp):
+            if isinstance(next_comp, ast.BinOp) and isinstance(next_comp.op, ast.BitXor):
                 relation.right = self.visit(next_comp.left)
-                self.space.add_relation(relation)
+                pending.append(relation)
                 # Begin next relation...
                 relation = ir.Relation()
                 relation.left = self.visit(next_comp.right)
             else:
                 relation.right = self.visit(next_comp)
-                self.space.add_relation(relation)
+                pending.append(relation)
 
         if has_remaining:
             if relation.right:
@@ -155,16 +151,35 @@ class RelParser(Parser):
             else:
                 relation.left_op = self.visit_Op(node.ops[-1])
             relation.right = self.visit(node.comparators[-1])
-            self.space.add_relation(relation)
+            pending.append(relation)
+
+        for relation in pending:
+            self.space.add_relation(
+                self.nodes.relation(
+                    relation.left, relation.left_op, relation.mid, relation.right_op, relation.right
+                )
+            )
 
     def visit_Constant(self, node: ast.Constant) -> ir.Literal:
-        return ir.Literal(value=str(node.n))
+        return self.nodes.literal(str(node.n))
+
+
+# Augmented assignments that are associative and commutative updates...
+REDUCTIONS = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.BitAnd: "&",
+    ast.BitOr: "|",
+    ast.BitXor: "^",
+}
 
 
 @dataclass
 class CompParser(Parser):
     fields: Dict[str, Any] = ()
     in_write: bool = False
+    reduction: str = ""
 
     def __init__(self, space: ir.Space, node: ast.Module = None, expression: str = ""):
         super().__init__(node, expression)
@@ -184,15 +199,44 @@ class CompParser(Parser):
 
     def visit_AugAssign(self, node: ast.AugAssign) -> None:
         self.in_write = True
+        self.reduction = REDUCTIONS.get(type(node.op), "")
         self.visit(node.target)
         self.in_write = False
+        self.reduction = ""
         self.visit(node.value)
 
     def visit_Subscript(self, node: ast.Subscript) -> None:
         field = self.visit(node.value)
-        access = ir.Access(self.visit(node.slice.value), self.in_write)
+        index = node.slice.value if isinstance(node.slice, ast.Index) else node.slice
+        elts = index.elts if isinstance(index, ast.Tuple) else [index]
+        indices = [self.index(elt) for elt in elts]
+        reduction = self.reduction if self.in_write else ""
+        access = ir.Access(self.visit(index), self.in_write, indices, reduction)
         field.accesses.append(access)
 
+    def index(self, node: ast.AST) -> ir.Node:
+        """Return the IR of subscript expression ``node``, or None if unsupported."""
+        if isinstance(node, ast.Name):
+            if node.id in self.space.iterators:
+                return self.space.iterators[node.id]
+            return ir.Constant(name=node.id)
+        if isinstance(node, ast.Constant):
+            return ir.Literal(value=str(node.value))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            operand = self.index(node.operand)
+            return ir.BinOp(ir.Literal("-1"), "*", operand) if operand else None
+        if isinstance(node, ast.BinOp):
+            ops = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.FloorDiv: "/", ast.Mod: "%"}
+            left = self.index(node.left)
+            right = self.index(node.right)
+            if type(node.op) in ops and left and right:
+                return ir.BinOp(left, ops[type(node.op)], right)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            args = [self.index(arg) for arg in node.args]
+            if all(args):
+                return ir.Function(node.func.id, args)
+        return None
+
     def visit_Name(self, node: ast.Name) -> ir.Node:
         name = node.id
         if name in self.space.iterators:
@@ -215,11 +259,54 @@ class IRParser(Parser):
         # Assume 1st statement is relation, remaining are computations (for now)
         statements = self.code.split("\n")
         rel_expr = statements[0]
-        space = RelParser(expression=rel_expr).parse()
+        with phase("rel_parse") as span:
+            space = RelParser(expression=rel_expr).parse()
+            span.count("chars", len(rel_expr))
 
         body = "\n".join(statements[1:])
-        fields, py_ast = CompParser(space, expression=body).parse()
+        with phase("comp_parse", space.name) as span:
+            fields, py_ast = CompParser(space, expression=body).parse()
+            span.count("chars", len(body))
         assert fields
         assert py_ast is not None
 
         return space, py_ast, fields
+
+    def computation(self, name: str = "") -> ir.Computation:
+        """
+        Parse a program of one or more spaces, each followed by the statements
+        executed over it, into a computation named ``name`` (by default, after its
+        first space). Statements are distributed in program order.
+        """
+        groups: List[List[str]] = []
+        for line in self.code.split("\n"):
+            if not line.strip():
+                continue
+            node = ast.parse(line.strip()).body[0]
+            if isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict):
+                groups.append([line])
+            elif groups:
+                groups[-1].append(line)
+            else:
+                raise SyntaxError(f"Statement before the first space: {line}")
+
+        computation = ir.Computation(name, None, [], {})
+        for number, group in enumerate(groups):
+            space = RelParser(expression=group[0]).parse()
+            if len(group) < 2:
+                raise SyntaxError(f"Space '{space.name}' has no statements")
+            fields, py_ast = CompParser(space, expression="\n".join(group[1:])).parse()
+            statement = ir.Statement(number, space, py_ast, fields, (number,), ())
+            computation.statements.append(statement)
+            for field in fields.values():
+                if field.name not in computation.fields:
+                    merged = ir.Field(field.name)
+                    merged.dtype = field.dtype
+                    computation.fields[field.name] = merged
+                computation.fields[field.name].accesses.extend(field.accesses)
+
+        if not computation.statements:
+            raise SyntaxError("Empty computation")
+        computation.name = name or computation.statements[0].space.name
+        computation.space = computation.statements[0].space
+        return computation
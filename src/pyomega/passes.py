@@ -6,6 +6,8 @@ import inspect
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, List, Set, Tuple, Union
 
+from pyomega.dispatch import Dispatcher
+
 
 """
 Implementation of compiler pass infrastructure.
@@ -13,7 +15,7 @@ Implementation of compiler pass infrastructure.
 
 
 @dataclass
-class Pass(ast.NodeTransformer):
+class Pass(Dispatcher, ast.NodeTransformer):
     root_node: ast.Module = None
     pass_name: str = ""
     context: Dict[str, Any] = ()
@@ -22,12 +24,6 @@ class Pass(ast.NodeTransformer):
         self.pass_name = pass_name
         self.context = context
 
-    def visit(self, node, **kwargs):
-        """Visit a node."""
-        method = "visit_" + node.__class__.__name__
-        visitor = getattr(self, method, self.generic_visit)
-        return visitor(node, **kwargs)
-
 
 @dataclass
 class FunctionCallInliner(Pass):
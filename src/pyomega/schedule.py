@@ -0,0 +1,250 @@
+# src/pyomega/schedule.py
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple, Union
+
+from pyomega.affine import AffineExpr, Constraint, linearize
+from pyomega.ir import Access, Computation, Statement
+
+
+"""
+Loop schedules: permutation and multi-level tiling of an iteration space.
+"""
+
+
+# The leading constant of a schedule tuple, or the constants between its loops.
+Position = Union[int, Sequence[int]]
+
+
+@dataclass
+class Loop:
+    """
+    A loop of the scheduled nest. Point loops scan an iterator of the space, and
+    tile loops of ``size`` > 0 scan the tiles of their iterator.
+    """
+
+    name: str = ""
+    iterator: str = ""
+    size: int = 0
+
+    @property
+    def is_tile(self) -> bool:
+        return self.size > 0
+
+
+@dataclass
+class Schedule:
+    """
+    The loop order of a kernel, starting from the identity ``[i, j, ...]``. Each call
+    to ``tile`` adds a level of tile loops, named by repeating the iterator's last
+    letter (``ii``, then ``iii``), and ``permute`` reorders loops by name, e.g.
+
+        Schedule(["i", "j", "k"]).tile({"i": 64, "j": 64}).tile({"i": 8, "j": 8})
+
+    scans ``[ii, jj, iii, jjj, i, j, k]``.
+    """
+
+    iterators: List[str] = ()
+    loops: List[Loop] = ()
+    shifts: Dict[str, int] = None
+
+    def __init__(self, iterators: List[str], shifts: Dict[str, int] = None):
+        self.iterators = list(iterators)
+        self.loops = [Loop(iterator, iterator) for iterator in self.iterators]
+        self.shifts = dict(shifts or {})
+        self.levels = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self.loops)
+
+    @property
+    def names(self) -> List[str]:
+        return [loop.name for loop in self.loops]
+
+    @property
+    def is_identity(self) -> bool:
+        return self.names == self.iterators and not any(self.shifts.values())
+
+    def tile(self, sizes: Dict[str, int]) -> "Schedule":
+        """
+        Add a level of tiles of the given ``sizes`` per iterator, placing the tile
+        loops just outside the outermost point loop they cover.
+        """
+        for iterator, size in sizes.items():
+            if iterator not in self.iterators:
+                raise ValueError(f"Unknown iterator '{iterator}'")
+            if size < 1:
+                raise ValueError(f"Tile size of '{iterator}' must be positive, not {size}")
+        if not sizes:
+            return self
+
+        self.levels += 1
+        points = [loop for loop in self.loops if not loop.is_tile and loop.iterator in sizes]
+        tiles = []
+        for point in points:
+            name = point.iterator + point.iterator[-1] * self.levels
+            if name in self.names or name in self.iterators:
+                raise ValueError(f"Tile loop '{name}' clashes with an existing name")
+            tiles.append(Loop(name, point.iterator, sizes[point.iterator]))
+
+        position = self.loops.index(points[0])
+        self.loops[position:position] = tiles
+        return self
+
+    def permute(self, order: List[str]) -> "Schedule":
+        """Reorder the loops named in ``order`` among the positions they occupy."""
+        names = self.names
+        if len(set(order)) < len(order) or any(name not in names for name in order):
+            raise ValueError(f"Invalid loop order {order} for loops {names}")
+        positions = sorted(names.index(name) for name in order)
+        loops = [self.loops[names.index(name)] for name in order]
+        for position, loop in zip(positions, loops):
+            self.loops[position] = loop
+
+        for iterator in self.iterators:
+            sizes = [loop.size for loop in self.loops if loop.iterator == iterator]
+            if sizes[-1] != 0 or sizes[:-1] != sorted(sizes[:-1], reverse=True):
+                raise ValueError(f"Loops over '{iterator}' must nest from largest to point")
+        return self
+
+    def items(self, position: Position = 0, depth: int = 0) -> List[AffineExpr]:
+        """
+        Return the schedule tuple ``[c0, l1, c1, l2, c2, ...]`` padded to ``depth``
+        loops, where ``position`` gives the constants ``c0, c1, ...`` (missing ones
+        are 0) and point loops are offset by their ``shifts``.
+        """
+        constants = [position] if isinstance(position, int) else list(position)
+        n_loops = max(depth, self.depth)
+        constants += [0] * (n_loops + 1 - len(constants))
+        if len(constants) > n_loops + 1:
+            raise ValueError(f"Position {position} is deeper than {n_loops} loops")
+
+        items = [AffineExpr(const=constants[0])]
+        for n in range(n_loops):
+            if n < self.depth:
+                loop = self.loops[n]
+                shift = 0 if loop.is_tile else self.shifts.get(loop.name, 0)
+                items.append(AffineExpr({loop.name: 1}, shift))
+            else:
+                items.append(AffineExpr())
+            items.append(AffineExpr(const=constants[n + 1]))
+        return items
+
+    def outputs(self, position: Position = 0, depth: int = 0) -> List[str]:
+        """Return the schedule tuple ``[position, l1, 0, l2, 0, ...]``, padded to ``depth``."""
+        return [str(item) for item in self.items(position, depth)]
+
+    def bounds(self) -> List[Tuple[Loop, Constraint, Constraint]]:
+        """Return the ``size*ii <= i`` and ``i <= size*ii + size - 1`` pair of each tile loop."""
+        bounds = []
+        for loop in self.loops:
+            if loop.is_tile:
+                shift = self.shifts.get(loop.iterator, 0)
+                offset = AffineExpr({loop.iterator: 1}, shift) - AffineExpr({loop.name: loop.size})
+                lower = Constraint(offset)
+                upper = Constraint(offset.scale(-1) + AffineExpr(const=loop.size - 1))
+                bounds.append((loop, lower, upper))
+        return bounds
+
+    def relation(self, name: str, position: Position = 0, depth: int = 0) -> str:
+        """Return the Omega calculator text of the schedule for relation ``name``."""
+        iter_str = ", ".join(self.iterators)
+        tuple_str = ", ".join(self.outputs(position, depth))
+        conditions = []
+        for loop, _, _ in self.bounds():
+            point = str(AffineExpr({loop.iterator: 1}, self.shifts.get(loop.iterator, 0)))
+            tile = f"{loop.size}*{loop.name}"
+            conditions.append(f"{tile} <= {point} <= {tile} + {loop.size - 1}")
+        where = f": {' && '.join(conditions)}" if conditions else ""
+        return f"r0{name} := {{[{iter_str}] -> [{tuple_str}]{where}}}"
+
+    def affine(self, position: Position = 0, depth: int = 0) -> Tuple[List[str], List[Constraint]]:
+        """
+        Return the output variables ``c1, c2, ...`` of the schedule and its
+        constraints, as accepted by ``OmegaLib.codegen_affine``.
+        """
+        items = self.items(position, depth)
+        outputs = [f"c{n}" for n in range(1, len(items) + 1)]
+        renames = {
+            loop.name: outputs[2 * n + 1] for n, loop in enumerate(self.loops) if loop.is_tile
+        }
+
+        constraints: List[Constraint] = []
+        for output, item in zip(outputs, items):
+            if not any(var in renames for var in item.variables()):
+                constraints.append(Constraint(AffineExpr({output: 1}) - item, True))
+        for loop, lower, upper in self.bounds():
+            for constraint in (lower, upper):
+                coeffs = {renames.get(var, var): coeff for var, coeff in constraint.expr.coeffs.items()}
+                constraints.append(Constraint(AffineExpr(coeffs, constraint.expr.const)))
+
+        return outputs, constraints
+
+
+def distribute(computation: Computation) -> Computation:
+    """Schedule each statement of ``computation`` in its own loop nest, in order."""
+    for number, statement in enumerate(computation.statements):
+        statement.schedule = (number,)
+        statement.shifts = ()
+    return computation
+
+
+def fuse(computation: Computation, depth: int = None) -> Computation:
+    """
+    Schedule the statements of ``computation`` in shared loops to ``depth`` (by
+    default, as deep as all their nests go), shifting later statements as far as
+    their dependences on earlier ones require, e.g. by one iteration for a
+    consumer reading ``tmp[i + 1]`` from its producer.
+    """
+    statements = computation.statements
+    common = min(len(statement.iterators) for statement in statements)
+    depth = common if depth is None else depth
+    if not 0 <= depth <= common:
+        raise ValueError(f"Cannot fuse to depth {depth}, statements share {common} loops")
+
+    shifts = [[0] * depth for _ in statements]
+    for later, statement in enumerate(statements):
+        for earlier in range(later):
+            for level, distance in _distances(statements[earlier], statement, depth):
+                shifts[later][level] = max(shifts[later][level], shifts[earlier][level] + distance)
+
+    for number, statement in enumerate(statements):
+        statement.schedule = (0,) * depth + (number,)
+        statement.shifts = tuple(shifts[number])
+    return computation
+
+
+def _subscripts(access: Access, field: str) -> List[AffineExpr]:
+    if not access.indices or any(index is None for index in access.indices):
+        raise ValueError(f"Cannot fuse over the non-affine accesses to '{field}'")
+    return [linearize(index) for index in access.indices]
+
+
+def _distances(
+    source: Statement, sink: Statement, depth: int
+) -> List[Tuple[int, int]]:
+    """
+    Return ``(level, distance)`` for each dependence from ``source`` to ``sink``,
+    where iteration ``i`` of ``sink`` touches the element that ``source`` touches
+    in iteration ``i + distance`` of the loop at ``level``.
+    """
+    distances = []
+    for name in source.fields.keys() & sink.fields.keys():
+        for first in source.fields[name].accesses:
+            for second in sink.fields[name].accesses:
+                if not (first.is_write or second.is_write):
+                    continue
+                left = _subscripts(first, name)
+                right = _subscripts(second, name)
+                for level in range(depth):
+                    outer = source.iterators[level]
+                    inner = sink.iterators[level]
+                    for lhs, rhs in zip(left, right):
+                        if lhs.coeffs == {outer: 1} and rhs.coeffs == {inner: 1}:
+                            distances.append((level, rhs.const - lhs.const))
+                            break
+                    else:
+                        raise ValueError(
+                            f"Cannot fuse loop {level}: accesses to '{name}' are not uniform"
+                        )
+    return distances
@@ -0,0 +1,395 @@
+# src/pyomega/server.py
+import asyncio
+import collections
+import json
+import os
+import stat
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Tuple
+
+import click
+
+from pyomega.backend import DEFAULT_CAPACITY
+from pyomega.cache import DEFAULT_CACHE_DIR, content_hash
+
+
+"""
+A long-lived compile server that keeps the Omega backend and code cache warm,
+answering JSON-lines requests over a Unix socket, and its asyncio client.
+
+Each request is a JSON object on one line, with an ``id`` echoed in its
+response. Compile requests carry a ``spec`` in IR syntax:
+
+    {"id": 1, "op": "compile", "spec": "dmv = {[i, j]: ...}\\ny[i] += ..."}
+    {"id": 1, "ok": true, "source": "...", "seconds": 0.002}
+
+Failures are answered with ``"ok": false`` and an ``error``. The ``ping``,
+``stats`` and ``shutdown`` operations take no arguments. Clients may pipeline
+any number of requests, whose responses arrive as they complete.
+"""
+
+
+DEFAULT_QUEUE_SIZE = 256
+LINE_LIMIT = 64 * 1024 * 1024
+
+# Compiled at startup to load OmegaLib and warm the parsers...
+WARMUP_SPEC = "warmup = {[i]: 0 <= i < N}\nx[i] = 0"
+
+
+def default_socket() -> str:
+    return os.environ.get(
+        "PYOMEGA_SOCKET", os.path.join(tempfile.gettempdir(), f"pyomega-{os.getuid()}.sock")
+    )
+
+
+@dataclass
+class ServerStats:
+    """
+    Compile requests served, those answered from the memo or by a compile in
+    flight for another request, and the total compile time.
+    """
+
+    requests: int = 0
+    compiled: int = 0
+    failed: int = 0
+    memo_hits: int = 0
+    coalesced: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class CompileServer:
+    """
+    Serves compile requests on the Unix socket at ``path``. Specs are compiled
+    by a warm ``CompileEngine``, in one thread or across ``jobs`` processes,
+    with the code generator ``options`` and the code cache at ``cache_path``.
+
+    At most ``queue_size`` requests are pending at once: beyond that the server
+    stops reading from clients until one is answered, so a client sending faster
+    than the server compiles is slowed by its socket. The sources of the last
+    ``memo_size`` distinct specs are kept in memory, and a spec already being
+    compiled for one client is not compiled again for another.
+    """
+
+    path: str = ""
+    jobs: int = 1
+    queue_size: int = DEFAULT_QUEUE_SIZE
+    capacity: int = DEFAULT_CAPACITY
+    cache_path: str = ""
+    options: Dict[str, Any] = None
+    memo_size: int = 1024
+
+    def __init__(
+        self,
+        path: str = "",
+        jobs: int = 1,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        capacity: int = DEFAULT_CAPACITY,
+        cache_path: str = "",
+        options: Dict[str, Any] = None,
+        memo_size: int = 1024,
+    ):
+        from pyomega.engine import CompileEngine
+
+        self.path = path or default_socket()
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.queue_size = queue_size
+        self.capacity = capacity
+        self.cache_path = cache_path
+        self.options = dict(options or {})
+        self.memo_size = memo_size
+        self.stats = ServerStats()
+        self.engine = CompileEngine(self.jobs, capacity, cache_path, self.options)
+        self.memo: Dict[str, str] = collections.OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._thread: ThreadPoolExecutor = None
+        self._queue: asyncio.Queue = None
+        self._slots: asyncio.Semaphore = None
+        self._workers: List[asyncio.Future] = []
+        self._server: Any = None
+        self._stopped: asyncio.Event = None
+
+    async def start(self) -> None:
+        """
+        Warm the engine, then listen on ``path``, replacing a stale socket file.
+        Raises RuntimeError if another server is listening there.
+        """
+        await self._claim()
+        self._queue = asyncio.Queue(self.queue_size)
+        self._slots = asyncio.Semaphore(self.queue_size)
+        self._stopped = asyncio.Event()
+        if self.jobs == 1:
+            # CompileEngine compiles in the calling thread when jobs=1: keep that
+            # thread, and with it the backend, off the event loop...
+            self._thread = ThreadPoolExecutor(1, thread_name_prefix="pyomega-compile")
+        await asyncio.gather(*(self._compile(WARMUP_SPEC) for _ in range(self.jobs)))
+
+        self._server = await asyncio.start_unix_server(
+            self._serve, path=self.path, limit=LINE_LIMIT
+        )
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.jobs)]
+
+    async def _claim(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+            raise RuntimeError(f"{self.path} exists and is not a socket")
+        try:
+            _, writer = await asyncio.open_unix_connection(self.path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(self.path)  # Left behind by a server that did not shut down...
+            return
+        writer.close()
+        raise RuntimeError(f"A compile server is already listening on {self.path}")
+
+    async def _compile(self, spec: str) -> Tuple[str, float]:
+        if self._thread is not None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._thread, lambda: self.engine.submit(spec, timed=True).result()
+            )
+        return await asyncio.wrap_future(self.engine.submit(spec, timed=True))
+
+    async def _work(self) -> None:
+        while True:
+            spec, future = await self._queue.get()
+            try:
+                future.set_result(await self._compile(spec))
+            except Exception as error:
+                future.set_exception(error)
+            finally:
+                self._queue.task_done()
+
+    async def compile(self, spec: str) -> Tuple[str, float]:
+        """Return the source of ``spec`` and the seconds spent compiling it."""
+        key = content_hash(spec)
+        source = self.memo.get(key)
+        if source is not None:
+            self.memo.move_to_end(key)
+            self.stats.memo_hits += 1
+            return source, 0.0
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            await self._queue.put((spec, future))
+            source, seconds = await asyncio.shield(future)
+        finally:
+            del self._inflight[key]
+        self.memo[key] = source
+        while len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+        return source, seconds
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the response to ``request``."""
+        op = request.get("op", "compile")
+        response: Dict[str, Any] = dict(id=request.get("id"), ok=True)
+        if op == "compile":
+            self.stats.requests += 1
+            try:
+                response["source"], response["seconds"] = await self.compile(request["spec"])
+            except Exception as error:
+                self.stats.failed += 1
+                return dict(response, ok=False, error=f"{type(error).__name__}: {error}")
+            self.stats.compiled += 1
+            self.stats.seconds += response["seconds"]
+        elif op == "ping":
+            pass
+        elif op == "stats":
+            response["stats"] = dict(asdict(self.stats), queued=self._queue.qsize())
+        elif op == "shutdown":
+            self._stopped.set()
+        else:
+            return dict(response, ok=False, error=f"Unknown operation '{op}'")
+        return response
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object")
+        except ValueError as error:
+            response = dict(id=None, ok=False, error=f"Invalid request: {error}")
+        else:
+            response = await self.handle(request)
+        finally:
+            self._slots.release()
+        if not writer.is_closing():
+            try:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks = set()
+        try:
+            while not reader.at_eof():
+                line = await reader.readline()
+                if not line.strip():
+                    continue
+                # Take a slot before reading on, so a server with queue_size
+                # requests pending pushes back on its clients...
+                await self._slots.acquire()
+                task = asyncio.ensure_future(self._respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self) -> None:
+        """Serve until a client requests a shutdown."""
+        if self._server is None:
+            await self.start()
+        await self._stopped.wait()
+        await self.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            for worker in self._workers:
+                worker.cancel()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        self.engine.close()
+        if self._thread is not None:
+            self._thread.shutdown()
+            self._thread = None
+
+
+class CompileClient:
+    """
+    An asyncio client of a ``CompileServer``. Requests may be issued
+    concurrently over one connection, e.g.
+
+        async with await CompileClient.connect() as client:
+            sources = await asyncio.gather(*(client.compile(spec) for spec in specs))
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls, path: str = "") -> "CompileClient":
+        reader, writer = await asyncio.open_unix_connection(
+            path or default_socket(), limit=LINE_LIMIT
+        )
+        return cls(reader, writer)
+
+    async def _listen(self) -> None:
+        error: Exception = ConnectionError("Connection to the compile server closed")
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._pending.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except Exception as exc:
+            error = exc
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    async def request(self, op: str, **fields: Any) -> Dict[str, Any]:
+        """Send an ``op`` request and return the server's response."""
+        if self._listener.done():
+            raise ConnectionError("Connection to the compile server closed")
+        self._next_id += 1
+        future = self._pending[self._next_id] = asyncio.get_running_loop().create_future()
+        self.writer.write(json.dumps(dict(fields, id=self._next_id, op=op)).encode() + b"\n")
+        await self.writer.drain()
+        response = await future
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response
+
+    async def compile(self, spec: str) -> str:
+        """Return the C source of ``spec``, raising RuntimeError if it fails to compile."""
+        return (await self.request("compile", spec=spec))["source"]
+
+    async def ping(self) -> float:
+        """Return the round trip time to the server in seconds."""
+        start = time.perf_counter()
+        await self.request("ping")
+        return time.perf_counter() - start
+
+    async def stats(self) -> Dict[str, Any]:
+        return (await self.request("stats"))["stats"]
+
+    async def shutdown(self) -> None:
+        await self.request("shutdown")
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self._listener
+
+    async def __aenter__(self) -> "CompileClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+
+@click.command()
+@click.option("-s", "--socket", "path", default=default_socket, help="Unix socket path.")
+@click.option("-j", "--jobs", default=1, help="Worker processes, 0 for one per CPU.")
+@click.option(
+    "--queue-size", default=DEFAULT_QUEUE_SIZE, show_default=True, help="Requests queued at most."
+)
+@click.option(
+    "--cache-dir",
+    default=lambda: os.environ.get("PYOMEGA_CACHE_DIR", DEFAULT_CACHE_DIR),
+    help="Directory of the code cache.",
+)
+@click.option("--no-cache", is_flag=True, help="Do not use the code cache.")
+@click.option("--standalone", is_flag=True, help="Generate standalone C functions.")
+@click.option("--parallel", is_flag=True, help="Parallelize the outer loops with OpenMP.")
+def main(path, jobs, queue_size, cache_dir, no_cache, standalone, parallel):
+    """Serve compile requests over a Unix socket until asked to shut down."""
+    server = CompileServer(
+        path,
+        jobs,
+        queue_size,
+        cache_path="" if no_cache else cache_dir,
+        options=dict(standalone=standalone, parallel=parallel),
+    )
+
+    async def serve():
+        try:
+            await server.start()
+            click.echo(f"Serving on {server.path}")
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# src/pyomega/stress.py
+import json
+import math
+import time
+import tracemalloc
+
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import click
+
+from pyomega.parser import CompParser, RelParser
+
+
+"""
+Scalability stress tests of the compilation pipeline on synthetic spaces.
+"""
+
+
+PHASES = ("rel_parse", "comp_parse", "visit_space", "omega", "assemble")
+
+# Sweeps run by default, as values of one parameter of the base spec...
+DEFAULT_SWEEPS = {
+    "iterators": (2, 4, 6, 8),
+    "constraints": (0, 32, 64, 128),
+    "ufuncs": (0, 1, 2, 4),
+    "terms": (1, 16, 64, 256),
+}
+
+# Growth exponents above this mark a phase as superlinear...
+SUPERLINEAR = 1.5
+
+
+@dataclass
+class Spec:
+    """
+    The shape of a synthetic kernel: ``iterators`` loops with constant bounds,
+    ``constraints`` extra affine constraints coupling pairs of iterators,
+    ``ufuncs`` index-array bounds like ``f0(i0) <= i1 < f0(i0 + 1)``, and one
+    statement summing ``terms`` products of field accesses.
+    """
+
+    iterators: int = 4
+    constraints: int = 0
+    ufuncs: int = 0
+    terms: int = 2
+
+    def source(self) -> Tuple[str, str]:
+        """Return the space and statement text of the kernel."""
+        names = [f"i{n}" for n in range(self.iterators)]
+        relations = [f"0 <= {name} < N" for name in names]
+        if self.ufuncs and self.iterators < 2:
+            raise ValueError("Index-array bounds need at least two iterators")
+        for n in range(self.ufuncs):
+            outer, inner = names[n % (len(names) - 1)], names[n % (len(names) - 1) + 1]
+            relations.append(f"f{n}({outer}) <= {inner} < f{n}({outer} + 1)")
+        for n in range(self.constraints):
+            first = names[n % len(names)]
+            second = names[(n + 1) % len(names)]
+            if first == second:
+                relations.append(f"{first} <= N + {n}")
+            elif n % 2:
+                relations.append(f"{first} - {second} <= N + {n}")
+            else:
+                relations.append(f"{first} + {second} <= 2 * N + {n}")
+        space = f"kernel = {{[{', '.join(names)}]: {' ^ '.join(relations)}}}"
+
+        terms = [
+            f"a{n}[{names[n % len(names)]}] * b{n}[{names[-1]}]" for n in range(self.terms)
+        ]
+        body = f"out[{names[0]}, {names[-1]}] += {' + '.join(terms)}"
+        return space, body
+
+
+@dataclass
+class Profile:
+    """The time in seconds and peak traced memory in bytes of each phase, for a spec."""
+
+    spec: Spec = None
+    times: Dict[str, float] = None
+    peaks: Dict[str, int] = None
+
+    @property
+    def total(self) -> float:
+        return sum(self.times.values())
+
+
+def phases(spec: Spec, backend: Any) -> List[Tuple[str, Callable[[], Any]]]:
+    """Return the pipeline of ``spec`` as ``(phase, step)`` pairs to run in order."""
+    from pyomega.visit import CodeGenerator
+
+    space_text, body = spec.source()
+    state: Dict[str, Any] = {}
+    generator = CodeGenerator(backend=backend)
+
+    def rel_parse():
+        state["space"] = RelParser(expression=space_text).parse()
+
+    def comp_parse():
+        state["fields"], state["ast"] = CompParser(state["space"], expression=body).parse()
+
+    def visit_space():
+        generator.prepare(state["space"], state["ast"], state["fields"])
+
+    def omega():
+        state["code"] = generator.scan()
+
+    def assemble():
+        state["source"] = generator.assemble(state["code"])
+
+    return list(zip(PHASES, (rel_parse, comp_parse, visit_space, omega, assemble)))
+
+
+def profile(spec: Spec, repeat: int = 3, memory: bool = True) -> Profile:
+    """
+    Run the pipeline of ``spec`` ``repeat`` times and keep the best time of each
+    phase. If ``memory`` is set, run it once more under tracemalloc, restarted
+    per phase, to record its peak. Only Python allocations are traced, not those
+    made inside OmegaLib.
+    """
+    from pyomega.backend import OmegaBackend
+
+    times = {phase: float("inf") for phase in PHASES}
+    for _ in range(repeat):
+        for phase, step in phases(spec, OmegaBackend(capacity=0)):
+            start = time.perf_counter()
+            step()
+            times[phase] = min(times[phase], time.perf_counter() - start)
+
+    peaks = {}
+    if memory:
+        tracing = tracemalloc.is_tracing()
+        for phase, step in phases(spec, OmegaBackend(capacity=0)):
+            tracemalloc.stop()
+            tracemalloc.start()
+            step()
+            peaks[phase] = tracemalloc.get_traced_memory()[1]
+        if not tracing:
+            tracemalloc.stop()
+
+    return Profile(spec, times, peaks)
+
+
+def sweep(
+    parameter: str, values: Sequence[int], base: Spec = None, repeat: int = 3, memory: bool = True
+) -> List[Profile]:
+    """Profile ``base`` with ``parameter`` set to each of ``values``."""
+    base = base or Spec()
+    if parameter not in asdict(base):
+        raise ValueError(f"Unknown parameter '{parameter}', expected one of {list(asdict(base))}")
+    return [profile(replace(base, **{parameter: value}), repeat, memory) for value in values]
+
+
+def growth(parameter: str, profiles: List[Profile]) -> Dict[str, float]:
+    """
+    Return the exponent ``k`` of ``time ~ parameter ** k`` of each phase, fitted
+    by least squares over the ``profiles`` of a sweep with positive values.
+    """
+    points = [profile for profile in profiles if getattr(profile.spec, parameter) > 0]
+    exponents: Dict[str, float] = {}
+    if len(points) < 2:
+        return exponents
+    xs = [math.log(getattr(profile.spec, parameter)) for profile in points]
+    for phase in PHASES + ("total",):
+        times = [profile.total if phase == "total" else profile.times[phase] for profile in points]
+        ys = [math.log(max(seconds, 1e-9)) for seconds in times]
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+        exponents[phase] = cov / var_x if var_x > 0 else 0.0
+    return exponents
+
+
+def report(sweeps: Dict[str, List[Profile]]) -> Dict[str, Any]:
+    """Return the profiles and fitted growth exponents of each sweep, as JSON data."""
+    data = {}
+    for parameter, profiles in sweeps.items():
+        data[parameter] = dict(
+            profiles=[
+                dict(asdict(profile.spec), times=profile.times, peaks=profile.peaks)
+                for profile in profiles
+            ],
+            growth=growth(parameter, profiles),
+        )
+    return data
+
+
+def _parse_sweep(option: str) -> Tuple[str, List[int]]:
+    parameter, _, values = option.partition("=")
+    try:
+        return parameter, [int(value) for value in values.split(",")]
+    except ValueError:
+        raise click.BadParameter(f"Expected PARAMETER=N,N,..., not '{option}'")
+
+
+@click.command()
+@click.option(
+    "-s", "--sweep", "sweeps", multiple=True, help="Sweep as PARAMETER=N,N,... (default: all)."
+)
+@click.option("--repeat", default=3, show_default=True, help="Runs per point, keeping the best.")
+@click.option("--no-memory", is_flag=True, help="Skip tracing peak memory.")
+@click.option("-o", "--output", type=click.Path(), help="Save the results as JSON.")
+def main(sweeps, repeat, no_memory, output):
+    """Time each phase of the compiler on synthetic spaces of growing size."""
+    options = dict(_parse_sweep(option) for option in sweeps) if sweeps else DEFAULT_SWEEPS
+    results = {}
+    for parameter, values in options.items():
+        results[parameter] = sweep(parameter, values, repeat=repeat, memory=not no_memory)
+
+        click.echo(f"{parameter:>12} " + " ".join(f"{phase:>12}" for phase in PHASES) + " (ms)")
+        for profile in results[parameter]:
+            times = " ".join(f"{profile.times[phase] * 1e3:>12.3f}" for phase in PHASES)
+            click.echo(f"{getattr(profile.spec, parameter):>12} {times}")
+        for phase, exponent in growth(parameter, results[parameter]).items():
+            if exponent > SUPERLINEAR:
+                click.echo(f"Superlinear: {phase} grows as {parameter}^{exponent:.2f}")
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(report(results), file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
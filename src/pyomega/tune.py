@@ -0,0 +1,355 @@
+# src/pyomega/tune.py
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import platform
+import tempfile
+import time
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from pyomega.affine import space_constraints
+from pyomega.cache import DEFAULT_CACHE_DIR, content_hash
+from pyomega.deps import DependenceAnalysis
+from pyomega.ir import Space
+from pyomega.schedule import Schedule
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: updates from separate processes are not serialized...
+    fcntl = None
+
+
+"""
+Autotuning of loop orders and tile sizes, with a persistent database of the winners.
+"""
+
+
+DEFAULT_TILE_SIZES = (0, 32, 64)
+
+
+def machine_fingerprint() -> str:
+    """Return a short hash identifying the processor and operating system."""
+    model = platform.processor()
+    try:
+        with open("/proc/cpuinfo", "r") as file:
+            for line in file:
+                if line.startswith("model name"):
+                    model = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    items = (platform.system(), platform.machine(), model, str(os.cpu_count()))
+    return hashlib.sha256("\0".join(items).encode()).hexdigest()[:16]
+
+
+def kernel_key(space: Space, ast: Any, fields: Dict[str, Any]) -> str:
+    """Return the hash of a kernel's space, statements and field types."""
+    dtypes = [(field.name, field.dtype) for field in fields.values()]
+    return content_hash(space, ast, dtypes)
+
+
+def rebuild(iterators: List[str], record: Dict[str, Any]) -> Schedule:
+    """Return the ``Schedule`` stored in a tuning ``record``."""
+    schedule = Schedule(iterators)
+    for sizes in record.get("tiles", []):
+        schedule.tile(sizes)
+    return schedule.permute(record["order"])
+
+
+@dataclass
+class TuningDatabase:
+    """
+    A JSON file of tuned schedules, keyed by machine fingerprint and then by
+    kernel hash, so a cache directory may be shared between machines. Writes
+    go through a temporary file renamed into place, and each read-modify-write
+    holds an exclusive lock on a sidecar ``.lock`` file, so tuners sharing the
+    database do not lose each other's records.
+    """
+
+    path: str = ""
+    fingerprint: str = ""
+
+    def __init__(self, path: str = "", fingerprint: str = ""):
+        cache_dir = os.environ.get("PYOMEGA_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.path = path or os.path.join(cache_dir, "tuning.json")
+        self.fingerprint = fingerprint or machine_fingerprint()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.load().get(self.fingerprint, {}).get(key)
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def put(self, key: str, record: Dict[str, Any]) -> None:
+        with self._locked():
+            data = self.load()
+            data.setdefault(self.fingerprint, {})[key] = record
+            self._write(data)
+
+    def _write(self, data: Dict[str, Dict[str, Any]]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(data, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def lookup(self, space: Space, ast: Any, fields: Dict[str, Any]) -> Optional[Schedule]:
+        """Return the stored schedule of a kernel on this machine, if it was tuned."""
+        record = self.get(kernel_key(space, ast, fields))
+        if record is None:
+            return None
+        return rebuild(list(space.iterators), record)
+
+
+def _order_constraints(space: Space) -> Tuple[Dict[str, Set[str]], Set[str]]:
+    """
+    Return the iterators each iterator must be nested inside, because its bounds
+    call a function of them (``rp(i) <= n``), and the iterators whose loops
+    cannot be tiled, since they are bounded by or passed to such calls.
+    """
+    iterators = list(space.iterators)
+    outer: Dict[str, Set[str]] = {iterator: set() for iterator in iterators}
+    fixed: Set[str] = set()
+    for constraint in space_constraints(space):
+        calls = constraint.expr.calls()
+        if not calls:
+            continue
+        called = {arg for _, args in calls for arg in args if arg in iterators}
+        for var in constraint.expr.variables():
+            if var in outer:
+                outer[var] |= called - {var}
+                fixed.add(var)
+        fixed |= called
+    return outer, fixed
+
+
+def legal_orders(space: Space, fields: Dict[str, Any]) -> List[List[str]]:
+    """Return the legal orders of the loops of ``space``, the original first."""
+    iterators = list(space.iterators)
+    analysis = DependenceAnalysis(space, fields)
+    outer, _ = _order_constraints(space)
+    defined = [iterator for iterator in iterators if iterator in analysis.definitions]
+
+    orders = []
+    free = [iterator for iterator in iterators if iterator not in defined]
+    for permutation in itertools.permutations(free):
+        # Iterators defined by equalities only assign values, so each follows
+        # the loops it depends on, in the original order...
+        order: List[str] = []
+        for iterator in (None,) + permutation:
+            if iterator is not None:
+                order.append(iterator)
+            for other in defined:
+                if other not in order and analysis.definitions[other] <= set(order):
+                    order.append(other)
+        if len(order) < len(iterators):
+            continue
+        position = {iterator: n for n, iterator in enumerate(order)}
+        if any(position[o] > position[i] for i in order for o in outer[i]):
+            continue
+        if analysis.is_legal([(iterator, True) for iterator in order]):
+            orders.append(order)
+    return orders
+
+
+def candidates(
+    space: Space, fields: Dict[str, Any], tile_sizes: Sequence[int] = DEFAULT_TILE_SIZES
+) -> List[Schedule]:
+    """
+    Return each legal loop order of ``space`` untiled and tiled by each of
+    ``tile_sizes`` (0 meaning untiled) over every tileable loop.
+    """
+    iterators = list(space.iterators)
+    analysis = DependenceAnalysis(space, fields)
+    _, fixed = _order_constraints(space)
+    tileable = [
+        iterator
+        for iterator in iterators
+        if iterator not in fixed and iterator not in analysis.definitions
+    ]
+
+    schedules = []
+    for order in legal_orders(space, fields):
+        for size in dict.fromkeys(tile_sizes):
+            schedule = Schedule(iterators).permute(order)
+            if size > 0:
+                if not tileable:
+                    continue
+                schedule.tile({iterator: size for iterator in order if iterator in tileable})
+            loops = [(loop.iterator, not loop.is_tile) for loop in schedule.loops]
+            if analysis.is_legal(loops):
+                schedules.append(schedule)
+    return schedules
+
+
+@dataclass
+class Autotuner:
+    """
+    Picks the fastest legal schedule of a kernel. Each of its ``candidates`` is
+    compiled with ``compiler`` and timed on the given inputs, and the winner is
+    stored in ``database`` for later builds. Given a ``CostModel``, only the
+    ``max_candidates`` it ranks best are timed.
+
+    The inputs are passed as to the compiled ``Kernel``, and the fields a kernel
+    writes are overwritten while timing. With ``check`` set, candidates whose
+    results differ from the original order are discarded.
+    """
+
+    compiler: Any = None
+    database: TuningDatabase = None
+    tile_sizes: Sequence[int] = DEFAULT_TILE_SIZES
+    repeat: int = 5
+    max_candidates: int = 64
+    check: bool = True
+    model: Any = None
+
+    def __init__(
+        self,
+        compiler: Any = None,
+        database: TuningDatabase = None,
+        tile_sizes: Sequence[int] = DEFAULT_TILE_SIZES,
+        repeat: int = 5,
+        max_candidates: int = 64,
+        check: bool = True,
+        model: Any = None,
+    ):
+        from pyomega.jit import JITCompiler
+
+        self.compiler = compiler or JITCompiler()
+        self.database = database or TuningDatabase()
+        self.tile_sizes = tuple(tile_sizes)
+        self.repeat = repeat
+        self.max_candidates = max_candidates
+        self.check = check
+        self.model = model
+        self.results: List[Tuple[Schedule, float]] = []
+
+    def candidates(self, space: Space, fields: Dict[str, Any]) -> List[Schedule]:
+        """
+        Return the schedules to time, at most ``max_candidates`` of them, ranked
+        by ``model`` if one is set.
+        """
+        schedules = candidates(space, fields, self.tile_sizes)
+        if self.model is not None:
+            schedules = [schedule for schedule, _ in self.model.rank(space, fields, schedules)]
+        return schedules[: self.max_candidates]
+
+    def measure(self, kernel: Any, inputs: Sequence[Any]) -> float:
+        """Return the best of ``repeat`` runs of ``kernel`` on ``inputs``, in seconds."""
+        kernel(*inputs)  # Warm up...
+        best = float("inf")
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            kernel(*inputs)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def outputs(self, kernel: Any, inputs: Sequence[Any]) -> List[Any]:
+        """Run ``kernel`` once on copies of ``inputs`` and return the fields it writes."""
+        copies = [value.copy() if hasattr(value, "copy") else value for value in inputs]
+        kernel(*copies)
+        written = [
+            name
+            for kind, ctype, name in kernel.parameters
+            if kind == "field" and not ctype.startswith("const")
+        ]
+        arguments = kernel.arguments
+        return [copies[arguments.index(name)] for name in written]
+
+    def compile(self, space: Space, ast: Any, fields: Dict[str, Any], schedule: Schedule) -> Any:
+        from pyomega.visit import CodeGenerator
+
+        generator = CodeGenerator(standalone=True, transform=schedule)
+        source = generator(space, ast, fields)
+        return self.compiler.compile(generator, source)
+
+    def tune(
+        self, space: Space, ast: Any, fields: Dict[str, Any], inputs: Sequence[Any]
+    ) -> Dict[str, Any]:
+        """
+        Time the original loop order, then every other candidate schedule, and
+        return the record of the fastest with the original time as its baseline.
+        """
+        import numpy as np
+
+        pristine = [value.copy() if hasattr(value, "copy") else value for value in inputs]
+        identity = Schedule(list(space.iterators))
+        kernel = self.compile(space, ast, fields, identity)
+        reference = self.outputs(kernel, pristine) if self.check else None
+        self.results = [(identity, self.measure(kernel, inputs))]
+        baseline = self.results[0][1]
+
+        for schedule in self.candidates(space, fields):
+            if schedule.is_identity:
+                continue
+            try:
+                kernel = self.compile(space, ast, fields, schedule)
+            except (RuntimeError, ValueError):
+                continue  # Not expressible by CodeGen+, or failed to compile...
+            if self.check:
+                outputs = self.outputs(kernel, pristine)
+                if not all(
+                    np.allclose(out, ref, rtol=1e-4, atol=1e-5) for out, ref in zip(outputs, reference)
+                ):
+                    continue
+            self.results.append((schedule, self.measure(kernel, inputs)))
+
+        best, seconds = min(self.results, key=lambda result: result[1])
+        levels: Dict[int, Dict[str, int]] = {}
+        for loop in best.loops:
+            if loop.is_tile:
+                level = len(loop.name) - len(loop.iterator)
+                levels.setdefault(level, {})[loop.iterator] = loop.size
+        return dict(
+            order=best.names,
+            tiles=[levels[level] for level in sorted(levels)],
+            seconds=seconds,
+            baseline=baseline,
+            candidates=len(self.results),
+        )
+
+    def __call__(
+        self,
+        space: Space,
+        ast: Any,
+        fields: Dict[str, Any],
+        inputs: Sequence[Any],
+        retune: bool = False,
+    ) -> Schedule:
+        """
+        Return the tuned schedule of a kernel, tuning it on ``inputs`` only if the
+        database has no record for it on this machine, or ``retune`` is set.
+        """
+        key = kernel_key(space, ast, fields)
+        record = None if retune else self.database.get(key)
+        if record is None:
+            record = self.tune(space, ast, fields, inputs)
+            self.database.put(key, record)
+        return rebuild(list(space.iterators), record)
@@ -0,0 +1,151 @@
+# src/pyomega/validate.py
+import collections
+import hashlib
+import re
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence, Tuple
+
+from pyomega.instrument import phase
+
+
+"""
+Validation of generated C sources with a warm, shared pycparser parser.
+"""
+
+
+_local = threading.local()
+
+
+def parser() -> Any:
+    """
+    Return this thread's ``CParser``, built once: building one sets up its lexer
+    and LALR tables, which costs far more than parsing a kernel.
+    """
+    c_parser = getattr(_local, "parser", None)
+    if c_parser is None:
+        from pycparser.c_parser import CParser
+
+        c_parser = _local.parser = CParser()
+    return c_parser
+
+
+def preprocess(source: str) -> str:
+    """
+    Return ``source`` as a translation unit pycparser accepts: ``#include``,
+    ``#ifndef`` and ``#pragma`` lines and ``_Pragma`` operators are dropped, and
+    each ``#define`` becomes a function whose body is the macro's, so macros
+    like the statements ``s<n>`` are checked too.
+    """
+    lines: List[str] = []
+    macros: List[str] = []
+    for line in source.splitlines():
+        line = re.sub(r'_Pragma\("[^"]*"\)', "", line)
+        define = re.match(r"^\s*#\s*define\s+(\w+)(\([^)]*\))?\s*(.*)$", line)
+        if define:
+            name, body = define.group(1), define.group(3).strip()
+            if not body.startswith("{"):
+                body = f"{{ (void)({body or 0}); }}"
+            macros.append(f"void pyomega_macro_{name}(void) {body}")
+        elif not line.lstrip().startswith("#"):
+            lines.append(line)
+    return "\n".join(macros + lines) + "\n"
+
+
+def check(source: str) -> Tuple[bool, str]:
+    """Parse ``source`` and return whether it is valid C, with the error if not."""
+    from pycparser.c_parser import ParseError
+
+    try:
+        parser().parse(preprocess(source), filename="<kernel>")
+    except ParseError as error:
+        return False, str(error)
+    return True, ""
+
+
+def source_hash(source: str) -> str:
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+@dataclass
+class Validation:
+    """Whether a source is valid C, the parse error if not, and the time to check it."""
+
+    key: str = ""
+    valid: bool = True
+    error: str = ""
+    seconds: float = 0.0
+
+
+def _validate(item: Tuple[str, str]) -> Validation:
+    key, source = item
+    start = time.perf_counter()
+    valid, error = check(source)
+    return Validation(key, valid, error, time.perf_counter() - start)
+
+
+@dataclass
+class Validator:
+    """
+    Validates generated C sources, caching up to ``capacity`` results by the
+    hash of each source. Batches of sources are checked in this process, or
+    across ``jobs`` worker processes that each keep a warm parser.
+    """
+
+    jobs: int = 1
+    capacity: int = 4096
+
+    def __init__(self, jobs: int = 1, capacity: int = 4096):
+        self.jobs = jobs
+        self.capacity = capacity
+        self.results: Dict[str, Validation] = collections.OrderedDict()
+        self._pool: Any = None
+        self._lock = threading.Lock()
+
+    def __call__(self, source: str) -> Validation:
+        return self.batch([source])[0]
+
+    def batch(self, sources: Sequence[str]) -> List[Validation]:
+        """Return the validation of each of ``sources``, checking each distinct one once."""
+        keys = [source_hash(source) for source in sources]
+        with self._lock:
+            known = {key: self.results[key] for key in keys if key in self.results}
+        missing = {key: source for key, source in zip(keys, sources) if key not in known}
+
+        with phase("validate") as span:
+            if self.jobs > 1 and len(missing) > 1:
+                if self._pool is None:
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    self._pool = ProcessPoolExecutor(self.jobs, initializer=parser)
+                chunksize = max(1, len(missing) // (4 * self.jobs))
+                validations = list(self._pool.map(_validate, missing.items(), chunksize=chunksize))
+            else:
+                validations = [_validate(item) for item in missing.items()]
+            span.count("sources", len(sources))
+            span.count("checked", len(missing))
+
+        # Other threads may have evicted the cached results since, so take them
+        # from this call rather than from self.results...
+        known.update((validation.key, validation) for validation in validations)
+        found = [known[key] for key in keys]
+        with self._lock:
+            for key in keys:
+                self.results[key] = known[key]
+                self.results.move_to_end(key)
+            while len(self.results) > self.capacity:
+                self.results.popitem(last=False)
+        return found
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> "Validator":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
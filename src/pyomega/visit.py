@@ -1,15 +1,30 @@
 # src/pyomega/visit.py
 import collections
 import re
-import sys
 
-from dataclasses import asdict, dataclass
-from pycparser import c_parser, c_ast
-from typing import Any, Dict, List
-
-sys.path.append("./src/omega")
-from omega import OmegaLib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from pyomega.affine import (
+    AffineExpr,
+    Constraint,
+    UFunc,
+    functions,
+    linearize,
+    space_constraints,
+    to_native,
+)
+from pyomega.backend import OmegaBackend, default_backend
+from pyomega.cache import CodeCache
+from pyomega.cost import ITEMSIZES, CostModel
+from pyomega.deps import DependenceAnalysis
+from pyomega.dispatch import Dispatcher, iter_fields, lookup
+from pyomega.instrument import phase
 from pyomega.ir import *
+from pyomega.parser import IRParser
+from pyomega.schedule import Position, Schedule
+from pyomega.tune import TuningDatabase
+from pyomega.validate import Validator, parser, preprocess
 
 
 """
@@ -17,119 +32,564 @@ Implement visitors for the PyOmega IR.
 """
 
 
+# C definitions of the functions CodeGen+ emits in loop bounds, for divisors > 0.
+_HELPERS = {
+    "max": "max(x, y) ((x) > (y) ? (x) : (y))",
+    "min": "min(x, y) ((x) < (y) ? (x) : (y))",
+    "intMod": "intMod(x, y) ((x) - (y) * intFloor((x), (y)))",
+    "intCeil": "intCeil(x, y) (-intFloor(-(x), (y)))",
+    "intFloor": "intFloor(x, y) ((x) >= 0 ? (x) / (y) : -((-(x) + (y) - 1) / (y)))",
+}
+
+# Parameter of the counters buffer of instrumented kernels...
+COUNTERS = "pyomega_counters"
+
+
+def split_statements(code: str) -> List[str]:
+    """
+    Split C ``code`` into its top-level statements, keeping any ``else`` branches
+    with the ``if`` they belong to.
+    """
+    statements: List[str] = []
+    depth: int = 0
+    parens: int = 0
+    start: int = 0
+    for pos, char in enumerate(code):
+        end = False
+        if char == "(":
+            parens += 1
+        elif char == ")":
+            parens -= 1
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            end = depth == 0 and not code[pos + 1 :].lstrip().startswith("else")
+        elif char == ";":
+            end = depth == 0 and parens == 0
+        if end:
+            statements.append(code[start : pos + 1].strip())
+            start = pos + 1
+
+    remainder = code[start:].strip()
+    if remainder:
+        statements.append(remainder)
+    return statements
+
+
 def iter_attributes(node: Node):
     """
-    Yield a tuple of ``(attrib_name, value)`` for each item in ``asdict(node)``
+    Yield a tuple of ``(attrib_name, value)`` for each field of ``node``
     """
-    attributes = asdict(node)
-    for attrib_name in attributes:
-        yield attrib_name, attributes[attrib_name]
+    return iter_fields(node)
 
 
 @dataclass
-class Visitor:
+class Visitor(Dispatcher):
     root: Node = None
 
+    inherit_visitors = True
+
     def generic_visit(self, node: Node, **kwargs):
-        items = []
+        """
+        Visit the values of mappings, the items of other iterables and the fields
+        of nodes in order, descending through those without a visit method on an
+        explicit stack.
+        """
         if isinstance(node, (str, bytes, bytearray)):
             return node
-        elif isinstance(node, collections.abc.Mapping):
-            items = node.items()
-        elif isinstance(node, collections.abc.Iterable):
-            items = enumerate(node)
-        elif isinstance(node, Node):
-            items = iter_attributes(node)
-        for value in items:
-            self.visit(value, **kwargs)
-
-    def visit(self, node: Node, **kwargs):
-        """Visit a node."""
-        node_class = node.__class__
-        method = "visit_" + node_class.__name__
-        visitor = getattr(self, method, None)
-
-        while not visitor and len(node_class.__bases__) > 0:  # Try parent class...
-            node_class = node_class.__bases__[0]
-            method = "visit_" + node_class.__name__
-            visitor = getattr(self, method, None)
-
-        if not visitor:
-            visitor = self.generic_visit
-        return visitor(node, **kwargs)
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if item is not node:
+                if isinstance(item, (str, bytes, bytearray)):
+                    continue
+                if lookup(self.__class__, item.__class__, self.inherit_visitors)[0]:
+                    self.visit(item, **kwargs)
+                    continue
+            if isinstance(item, collections.abc.Mapping):
+                children = list(item.values())
+            elif isinstance(item, collections.abc.Iterable):
+                children = list(item)
+            elif isinstance(item, Node):
+                children = [value for _, value in iter_fields(item)]
+            else:
+                continue
+            stack.extend(reversed(children))
 
 
 @dataclass
 class CodeGenerator(Visitor):
     source: str = ""
+    cache: CodeCache = None
+    backend: OmegaBackend = None
+    direct: bool = True
+    standalone: bool = False
+    transform: Schedule = None
+    parallel: bool = False
+    omp_schedule: str = "static"
+    omp_chunk: int = 0
+    reduction: str = "auto"
+    extents: Dict[str, str] = None
+    tuning: TuningDatabase = None
+    model: CostModel = None
+    counters: bool = False
 
     def __call__(self, space: Space, ast: ast.Module, fields: Dict[str, Any]) -> str:
+        self.prepare(space, ast, fields)
+        return self.codegen()
+
+    def prepare(self, space: Space, ast: ast.Module, fields: Dict[str, Any]) -> None:
         assert isinstance(space, Space)
         self.space = space
         self.ast = ast
         self.constants: List[str] = []
-        self.source: str = self.visit(space)
+        with phase("visit_space", space.name) as span:
+            self.source: str = self.visit(space)
+            span.count("relations", len(space.relations))
         self.fields = fields
+        self.ndims: Dict[str, int] = {}
+        self.atomics: Set[str] = set()
+        self.tuned: Schedule = None
+        if self.transform is None and self.tuning is not None:
+            self.tuned = self.tuning.lookup(space, ast, fields)
+        if self.transform is None and self.tuned is None and self.model is not None:
+            self.tuned = self.model.best(space, fields)
+
+    @property
+    def name(self) -> str:
+        return self.space.name
+
+    @property
+    def iterators(self) -> List[str]:
+        return list(self.space.iterators.keys())
+
+    @property
+    def loops(self) -> Schedule:
+        """
+        The schedule of the generated nest: ``transform`` if set, else the one
+        stored for this kernel in the ``tuning`` database, else the one that the
+        cost ``model`` ranks best, else the identity.
+        """
+        transform = self.transform or self.tuned
+        if transform is None:
+            return Schedule(self.iterators)
+        if transform.iterators != self.iterators:
+            raise ValueError(
+                f"Schedule iterators {transform.iterators} do not match {self.iterators}"
+            )
+        return transform
 
-        return self.codegen()
+    @property
+    def depth(self) -> int:
+        return self.loops.depth
 
     def codegen(self) -> str:
-        py_to_c = PyToCTranslator()
+        key: str = ""
+        if self.cache is not None:
+            with phase("cache", self.name) as span:
+                key = self.cache_key()
+                cached = self.cache.get(key)
+                span.count("hits" if cached is not None else "misses")
+            if cached is not None:
+                return cached
+
+        source = self.assemble(self.scan())
+        if key:
+            self.cache.put(key, source)
+
+        return source
+
+    def scan(self, backend: OmegaBackend = None) -> str:
+        """Return the loop nest that CodeGen+ generates to scan the scheduled space."""
+        rel_map: Dict[str, str] = self.relation_map()
+        sched_map: Dict[str, List[str]] = self.schedule_map()
+        constraints = self.givens()
+
+        if backend is None:
+            backend = self.backend if self.backend is not None else default_backend()
+        with phase("omega", self.name) as span:
+            code: str = ""
+            if self.direct:
+                code = self.codegen_direct(backend)
+            if not code:
+                code = backend.codegen(rel_map, sched_map, list(rel_map), constraints).rstrip()
+                span.count("calculator")
+            schedules = [schedule for items in sched_map.values() for schedule in items]
+            span.count("input_size", sum(map(len, list(rel_map.values()) + schedules)))
+            span.count("output_size", len(code))
+        if "error" in code.lower():
+            raise RuntimeError(code)
+        return code
+
+    def assemble(self, code: str) -> str:
+        """Wrap the scanned loop nest ``code`` into the C source of the kernel."""
+        with phase("assemble", self.name) as span:
+            # Strip outer 'if' statement if existent...
+            if code.startswith("if"):
+                code = code[code.find("{") + 1 :].lstrip()
+                code = code[0 : code.rfind("}") - 1].rstrip()
+
+            code = self.parallelize(code)
+            if self.counters:
+                code = self.count(code)
+            source = self.function(code)
+            span.count("output_size", len(source))
+        return source
+
+    def codegen_direct(self, backend: OmegaBackend) -> str:
+        """
+        Scan the space by passing its constraints straight to CodeGen+, skipping
+        the calculator text. Returns an empty string if the space cannot be
+        expressed that way, e.g. for function calls on non-iterator arguments.
+        """
+        try:
+            return backend.codegen_affine(*self.affine())
+        except ValueError:
+            return ""
+
+    def affine(self, position: Position = 0, depth: int = 0) -> Tuple:
+        """Return the arguments of ``OmegaLib.codegen_affine`` for this kernel."""
+        iterators: List[str] = self.iterators
+        domain = space_constraints(self.space)
+        ufuncs = functions(iterators, domain)
+        outputs, schedule = self.loops.affine(position, depth)
+
+        known: List[Constraint] = []
+        for constant in dict.fromkeys(self.constants):
+            known.append(Constraint(AffineExpr({constant: 1}, -1)))
+
+        return (
+            [iterators],
+            [to_native(domain, ufuncs)],
+            [outputs],
+            [to_native(schedule)],
+            to_native(known),
+            {ufunc.name: ufunc.arity for ufunc in ufuncs.values()},
+        )
+
+    def parallelize(self, code: str) -> str:
+        """
+        Mark the outermost loop that carries no dependence with an OpenMP
+        ``parallel for`` pragma, privatizing the loop variables inside it. Code
+        without such a loop is returned unchanged.
+
+        Unless ``reduction`` is 'none', loops whose only conflicts are reduction
+        updates like ``y[i] += ...`` are parallel too: each updated field is
+        combined with a ``reduction`` clause over its array section ('privatize',
+        given its size in ``extents``) or with atomic updates ('atomic'). The
+        'auto' default uses atomics for updates scattered through index arrays and
+        sections for the rest, when their extent is known.
+        """
+        self.atomics: Set[str] = set()
+        if not self.parallel:
+            return code
+        if self.reduction not in ("auto", "atomic", "privatize", "none"):
+            raise ValueError(f"Unknown reduction strategy '{self.reduction}'")
+
+        loops = self.loops.loops
+        analysis = DependenceAnalysis(self.space, self.fields)
+        plans = analysis.plan([(loop.iterator, not loop.is_tile) for loop in loops])
+        for n, plan in enumerate(plans):
+            var = f"t{2 * (n + 1)}"
+            pattern = f"^([ \\t]*)for\\({var} = "
+            if plan is None or (plan and self.reduction == "none"):
+                continue
+            if not re.search(pattern, code, re.MULTILINE):
+                continue
+
+            private = [f"t{2 * (m + 1)}" for m in range(n + 1, len(loops))]
+            clauses = [f"schedule({self.omp_schedule}{f', {self.omp_chunk}' if self.omp_chunk else ''})"]
+            if private:
+                clauses.append(f"private({', '.join(private)})")
+
+            enclosing = [loop.iterator for loop in loops[:n] if not loop.is_tile]
+            for field, op in plan.items():
+                access = analysis.pattern(field, loops[n].iterator, enclosing)
+                section = self.section(field, access)
+                if section:
+                    clauses.append(f"reduction({op}: {section})")
+                else:
+                    self.atomics.add(field)
+
+            pragma = f"#pragma omp parallel for {' '.join(clauses)}"
+            return re.sub(pattern, f"\\1{pragma}\n\\1for({var} = ", code, flags=re.MULTILINE)
+        return code
+
+    def section(self, field: str, pattern: str) -> str:
+        """Return the array section that a ``reduction`` clause combines for ``field``."""
+        extents = self.extents or {}
+        if self.reduction == "atomic":
+            return ""
+        if self.reduction == "privatize" and field not in extents:
+            raise ValueError(f"Privatizing '{field}' requires its extent")
+        if field in extents and (self.reduction == "privatize" or pattern != "indirect"):
+            return f"{field}[0:{extents[field]}]"
+        # A single element updated by every iteration...
+        indices = [access.indices for access in self.fields[field].accesses if access.reduction]
+        if pattern == "invariant" and all(len(index) == 1 for index in indices):
+            try:
+                offsets = {str(linearize(index[0])) for index in indices}
+            except ValueError:
+                return ""
+            if len(offsets) == 1 and all(
+                var not in self.iterators for index in indices for var in linearize(index[0]).variables()
+            ):
+                return f"{field}[{offsets.pop()}:1]"
+        return ""
+
+    def count(self, code: str) -> str:
+        """
+        Instrument the scanned loop nest ``code`` to fill the ``pyomega_counters``
+        buffer laid out by ``counter_layout``: the nanoseconds spent in the nest,
+        the iterations of each loop level (or assignments of each iterator defined
+        by an equality), the executions of each statement, and the least and most
+        statements executed by an iteration of an outermost loop, which expose
+        load imbalance. Updates are atomic in parallel code.
+        """
+        layout = self.counter_layout()
+        levels, statements = layout["levels"], layout["statements"]
+        size = 3 + len(levels) + len(statements)
+
+        lines: List[str] = []
+        depth = 0
+        outer = None
+        for line in code.splitlines():
+            loop = re.match(r"^\s*for\((t\d+) = ", line)
+            assign = re.match(r"^(\s*)(t\d+)=", line)
+            call = re.match(r"^(\s*)(s\d+)\(", line)
+            if assign:
+                # Iterators defined by equalities count their assignments...
+                level = int(assign.group(2)[1:]) // 2
+                line = f"{assign.group(1)}pyomega_count({level}); {line.lstrip()}"
+            elif loop:
+                if not line.rstrip().endswith("{"):
+                    raise ValueError(f"Cannot instrument a loop without braces: '{line.strip()}'")
+                level = int(loop.group(1)[1:]) // 2
+                line += f" pyomega_count({level});"
+                if outer is None:
+                    outer = depth
+                    line += " long long pyomega_work = 0;"
+            elif call:
+                slot = 1 + len(levels) + statements.index(call.group(2))
+                work = " pyomega_work++;" if outer is not None else ""
+                line = f"{call.group(1)}pyomega_count({slot});{work} {line.lstrip()}"
+            closes = line.count("}") - line.count("{")
+            if outer is not None and closes > 0 and depth - closes <= outer:
+                # Update the extrema before the brace that closes the outermost loop...
+                pos = [n for n, char in enumerate(line) if char == "}"][depth - outer - 1]
+                line = f"{line[:pos]}pyomega_extrema(pyomega_work); {line[pos:]}"
+                outer = None
+            depth -= closes
+            lines.append(line)
+
+        prologue = [
+            f"  struct timespec pyomega_start, pyomega_stop;",
+            f"  for (int slot = 0; slot < {size}; slot++) {COUNTERS}[slot] = 0;",
+            f"  {COUNTERS}[{size - 2}] = LLONG_MAX;",
+            f"  clock_gettime(CLOCK_MONOTONIC, &pyomega_start);",
+        ]
+        epilogue = [
+            f"  clock_gettime(CLOCK_MONOTONIC, &pyomega_stop);",
+            f"  {COUNTERS}[0] = (pyomega_stop.tv_sec - pyomega_start.tv_sec) * 1000000000LL"
+            f" + (pyomega_stop.tv_nsec - pyomega_start.tv_nsec);",
+        ]
+        return "\n".join(prologue + lines + epilogue)
+
+    def counter_macros(self) -> str:
+        """Return the includes and macros used by the code of ``count``."""
+        layout = self.counter_layout()
+        least = 1 + len(layout["levels"]) + len(layout["statements"])
+        atomic = '_Pragma("omp atomic") ' if self.parallel else ""
+        critical = '_Pragma("omp critical(pyomega)") ' if self.parallel else ""
+        return (
+            "#ifndef _POSIX_C_SOURCE\n#define _POSIX_C_SOURCE 199309L\n#endif\n"
+            "#include <limits.h>\n#include <time.h>\n"
+            f"#define pyomega_count(slot) {{ {atomic}{COUNTERS}[slot]++; }}\n"
+            f"#define pyomega_extrema(work) {critical}{{ "
+            f"if ((work) < {COUNTERS}[{least}]) {COUNTERS}[{least}] = (work); "
+            f"if ((work) > {COUNTERS}[{least + 1}]) {COUNTERS}[{least + 1}] = (work); }}\n"
+        )
+
+    def counter_layout(self) -> Dict[str, Any]:
+        """
+        Return the names of the loop ``levels`` and ``statements`` whose counters
+        follow the elapsed time in the counters buffer, and the ``traffic`` of
+        each statement.
+        """
+        traffic = self.traffic()
+        return dict(
+            levels=[loop.name for loop in self.loops.loops],
+            statements=list(traffic),
+            traffic=traffic,
+        )
+
+    def traffic(self, number: int = None) -> Dict[str, Dict[str, Tuple[int, int]]]:
+        """
+        Return the bytes of each field that the macro of each statement reads and
+        writes per execution, as in ``macros``. Updates like ``+=`` read and write.
+        """
+        statements: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        for index, statement in enumerate(self.ast.body):
+            counts = statements.setdefault(f"s{index if number is None else number}", {})
+            for node in ast.walk(statement):
+                if not isinstance(node, ast.Subscript) or not isinstance(node.value, ast.Name):
+                    continue
+                field = self.fields.get(node.value.id)
+                if field is None:
+                    continue
+                itemsize = ITEMSIZES.get(field.dtype, 4)
+                reads, writes = counts.get(field.name, (0, 0))
+                if isinstance(node.ctx, ast.Store):
+                    writes += itemsize
+                    if isinstance(statement, ast.AugAssign):
+                        reads += itemsize
+                else:
+                    reads += itemsize
+                counts[field.name] = (reads, writes)
+        return statements
+
+    def macros(self, number: int = None) -> str:
+        """
+        Define a macro ``s<n>`` per statement, or a single macro ``s<number>`` for
+        all of them if ``number`` is given.
+        """
+        py_to_c = PyToCTranslator(flatten=self.standalone)
         c_code = py_to_c(self.ast)
         c_statements = c_code.split("\n")
+        self.ndims = py_to_c.ndims
 
         # Define prototypes...
-        iterators: List[str] = list(self.space.iterators.keys())
+        iterators: List[str] = self.iterators
         iter_str: str = ", ".join(iterators)
 
         source: str = ""
-        # for index, statement in enumerate(c_statements):
-        #     source += f"auto void s{index}({iter_str});\n"
-
-        # source += "\n"
+        if self.standalone:
+            # Uninterpreted functions read from index arrays...
+            for ufunc in self.ufuncs():
+                if len(ufunc.args) != 1:
+                    raise ValueError(f"Index array '{ufunc.array}' must be one-dimensional")
+                index = ufunc.args[0]
+                for iterator in ufunc.params:
+                    index = re.sub(f"\\b{iterator}\\b", f"({iterator})", index)
+                params = ", ".join(ufunc.params)
+                source += f"#define {ufunc.name}({params}) {ufunc.array}[{index}]\n"
+
+        statements: List[str] = []
         for index, statement in enumerate(c_statements):
-            # source += f"inline void s{index}({iter_str}) {{ {statement} }}\n"
             for iterator in iterators:
                 statement = re.sub(f"\\b[{iterator}]\\b", f"({iterator})", statement)
-            source += f"#define s{index}({iter_str}) {{ {statement} }}\n"
+            node = self.ast.body[index]
+            if isinstance(node, ast.AugAssign) and node.target.value.id in self.atomics:
+                statement = f'_Pragma("omp atomic") {statement}'
+            statements.append(statement)
 
-        name: str = self.space.name
-        tuple_str = ", 0, ".join(iterators)
-        schedule: str = f"r0{name} := {{[{iter_str}] -> [0, {tuple_str}, 0]}}"
+        if number is not None:
+            source += f"#define s{number}({iter_str}) {{ {' '.join(statements)} }}\n"
+        else:
+            for index, statement in enumerate(statements):
+                source += f"#define s{index}({iter_str}) {{ {statement} }}\n"
 
-        relation = self.source[self.source.find(" = ") + 3 :]
-        rel_map: Dict[str, str] = {name: relation}
-        sched_map: Dict[str, List[str]] = {name: [schedule]}
+        return source
 
-        constraints = [f"{constant} >= 1" for constant in self.constants]
-        code = OmegaLib().codegen(rel_map, sched_map, [name], constraints).rstrip()
-        if "error" in code.lower():
-            raise RuntimeError(code)
+    def schedule(self, position: Position = 0, depth: int = 0) -> str:
+        """
+        Return the schedule relation, with ``position`` as the leading constant and
+        trailing zeros padding the output tuple to ``depth`` loops.
+        """
+        return self.loops.relation(self.name, position, depth)
+
+    def relation(self) -> str:
+        return self.source[self.source.find(" = ") + 3 :]
+
+    def relation_map(self) -> Dict[str, str]:
+        return {self.name: self.relation()}
+
+    def schedule_map(self) -> Dict[str, List[str]]:
+        return {self.name: [self.schedule()]}
+
+    def givens(self) -> List[str]:
+        return [f"{constant} >= 1" for constant in self.constants]
+
+    def cache_key(self) -> str:
+        dtypes = [(field.name, field.dtype) for field in self.fields.values()]
+        return self.cache.key(
+            self.space,
+            self.ast,
+            dtypes,
+            self.schedule_map(),
+            self.givens(),
+            self.standalone,
+            (self.parallel, self.omp_schedule, self.omp_chunk, self.reduction, self.extents),
+            self.counters,
+            self.direct,
+        )
 
-        # Strip outer 'if' statement if existent...
-        if code.startswith("if"):
-            code = code[code.find("{") + 1 :].lstrip()
-            code = code[0 : code.rfind("}") - 1].rstrip()
+    def ufuncs(self) -> List[UFunc]:
+        return list(functions(self.iterators, space_constraints(self.space)).values())
 
+    def parameters(self) -> List[Tuple[str, str, str]]:
+        """
+        Return the ``(kind, ctype, name)`` of each kernel parameter in order, where
+        kind is one of 'constant', 'field', 'index', 'stride' or 'counters'.
+        """
         # Constants first
-        params: List[str] = [f"const int {constant}" for constant in self.constants]
+        constants = dict.fromkeys(self.constants) if self.standalone else self.constants
+        params = [("constant", "const int", constant) for constant in constants]
 
         # Fields next
         for field in self.fields.values():
-            is_constant = any([not access.is_write for access in field.accesses])
-            params.append(
-                f"{'const ' if is_constant else ''}{field.dtype} *{field.name}"
-            )
-
-        header = f"void {name}({', '.join(params)}) {{\n  int"
-        omega_iters = [f"t{n * 2}" for n in range(1, len(iterators) + 1)]
+            is_constant = not any(access.is_write for access in field.accesses)
+            ctype = f"{'const ' if is_constant else ''}{field.dtype} *"
+            params.append(("field", ctype, field.name))
+
+        # Then index arrays and row strides of multi-dimensional fields
+        if self.standalone:
+            if not self.ndims:
+                self.macros()
+            for array in dict.fromkeys(ufunc.array for ufunc in self.ufuncs()):
+                params.append(("index", "const int *", array))
+            for field in self.fields.values():
+                for dim in range(self.ndims.get(field.name, 1) - 1):
+                    params.append(("stride", "const int", f"{field.name}_stride{dim}"))
+
+        # And last, the buffer of runtime counters
+        if self.counters:
+            params.append(("counters", "long long *", COUNTERS))
+
+        return params
+
+    def function(self, code: str) -> str:
+        """Wrap the scanned loop nest ``code`` in a C function definition."""
+        macros = self.macros()
+        params = [
+            ctype + name if ctype.endswith("*") else f"{ctype} {name}"
+            for _, ctype, name in self.parameters()
+        ]
+
+        header = f"void {self.name}({', '.join(params)}) {{\n  int"
+        omega_iters = [f"t{n * 2}" for n in range(1, self.depth + 1)]
 
         code = "{header} {iterators};\n{code}\n}}".format(
             header=header, iterators=", ".join(omega_iters), code=code
         )
-        source += "\n" + code
 
-        return source
+        # Helpers used in the bounds of tiled loops, and the helpers they use...
+        text = code
+        helpers: Set[str] = set()
+        while True:
+            used = {helper for helper in _HELPERS if re.search(f"\\b{helper}\\(", text)}
+            if used <= helpers:
+                break
+            helpers |= used
+            text = "\n".join([code] + [_HELPERS[helper] for helper in helpers])
+        for helper, definition in _HELPERS.items():
+            if helper in helpers:
+                macros = f"#ifndef {helper}\n#define {definition}\n#endif\n" + macros
+        if self.counters:
+            macros = self.counter_macros() + macros
+
+        return macros + "\n" + code
 
     def visit_Space(self, node: Space) -> str:
         source = f"{node.name} = {{"
@@ -154,36 +614,361 @@ class CodeGenerator(Visitor):
         return node.value
 
     def visit_BinOp(self, node: BinOp) -> str:
-        return "{left} {op} {right}".format(
-            left=self.visit(node.left), op=node.op, right=self.visit(node.right)
-        )
+        left = yield node.left
+        right = yield node.right
+        return "{left} {op} {right}".format(left=left, op=node.op, right=right)
 
     def visit_Relation(self, node: Relation) -> str:
-        code = "{left} {left_op}".format(
-            left=self.visit(node.left), left_op=node.left_op
-        )
+        left = yield node.left
+        code = "{left} {left_op}".format(left=left, left_op=node.left_op)
         if node.mid:
-            code += " {mid} {right_op}".format(
-                mid=self.visit(node.mid), right_op=node.right_op
-            )
-        code += " {right}".format(right=self.visit(node.right))
+            mid = yield node.mid
+            code += " {mid} {right_op}".format(mid=mid, right_op=node.right_op)
+        right = yield node.right
+        code += " {right}".format(right=right)
 
         return code
 
     def visit_Function(self, node: Function) -> str:
-        return "{name}({args})".format(
-            name=node.name, args=", ".join([self.visit(arg) for arg in node.args])
+        args = []
+        for arg in node.args:
+            args.append((yield arg))
+        return "{name}({args})".format(name=node.name, args=", ".join(args))
+
+
+@dataclass
+class ComputationGenerator(CodeGenerator):
+    """
+    Generate one C function for a multi-statement ``Computation``. Each statement
+    is scanned over its own space, as ``s<number>``, and placed by its schedule
+    vector, so statements sharing leading constants are fused into common loops
+    (see ``schedule.fuse`` and ``schedule.distribute``).
+    """
+
+    def __call__(self, computation: Computation) -> str:
+        self.prepare(computation)
+        return self.codegen()
+
+    def prepare(self, computation: Computation) -> None:
+        if self.transform is not None:
+            raise ValueError("Computations are scheduled by their statements' vectors")
+        self.computation = computation
+        self.generators: List[CodeGenerator] = []
+        for statement in computation.statements:
+            generator = CodeGenerator(standalone=self.standalone)
+            generator.prepare(statement.space, statement.root, statement.fields)
+            shifts = dict(zip(statement.iterators, statement.shifts))
+            generator.transform = Schedule(statement.iterators, shifts)
+            self.generators.append(generator)
+
+        names = [generator.name for generator in self.generators]
+        if len(set(names)) < len(names):
+            raise ValueError(f"Statement spaces must have unique names: {names}")
+
+        self.space = computation.space
+        self.ast = None
+        self.constants: List[str] = list(
+            dict.fromkeys(c for generator in self.generators for c in generator.constants)
+        )
+        self.fields = computation.fields
+        self.ndims: Dict[str, int] = {}
+        self.atomics: Set[str] = set()
+        self.tuned: Schedule = None
+
+    @property
+    def name(self) -> str:
+        return self.computation.name
+
+    @property
+    def depth(self) -> int:
+        return max(generator.depth for generator in self.generators)
+
+    def relation_map(self) -> Dict[str, str]:
+        return {generator.name: generator.relation() for generator in self.generators}
+
+    def schedule_map(self) -> Dict[str, List[str]]:
+        return {
+            generator.name: [generator.schedule(statement.schedule, self.depth)]
+            for generator, statement in zip(self.generators, self.computation.statements)
+        }
+
+    def givens(self) -> List[str]:
+        return [f"{constant} >= 1" for constant in self.constants]
+
+    def affine(self, position: Position = 0, depth: int = 0) -> Tuple:
+        args = [[], [], [], [], [], {}]
+        for generator, statement in zip(self.generators, self.computation.statements):
+            iterators, domains, outputs, xforms, known, funcs = generator.affine(
+                statement.schedule, self.depth
+            )
+            for items, new in zip(args[:4], (iterators, domains, outputs, xforms)):
+                items.extend(new)
+            args[4].extend(item for item in known if item not in args[4])
+            for name, arity in funcs.items():
+                if args[5].setdefault(name, arity) != arity:
+                    raise ValueError(f"Function '{name}' is used with different arities")
+        return tuple(args)
+
+    def ufuncs(self) -> List[UFunc]:
+        ufuncs: Dict[str, UFunc] = {}
+        for generator in self.generators:
+            for ufunc in generator.ufuncs():
+                ufuncs.setdefault(ufunc.name, ufunc)
+        return list(ufuncs.values())
+
+    def macros(self, number: int = None) -> str:
+        lines: List[str] = []
+        for index, generator in enumerate(self.generators):
+            generator.atomics = self.atomics
+            for line in generator.macros(index).splitlines():
+                if line not in lines:
+                    lines.append(line)
+            self.ndims.update(generator.ndims)
+        return "\n".join(lines) + "\n"
+
+    def counter_layout(self) -> Dict[str, Any]:
+        layout = super().counter_layout()
+        layout["levels"] = [f"t{2 * (n + 1)}" for n in range(self.depth)]
+        return layout
+
+    def traffic(self, number: int = None) -> Dict[str, Dict[str, Tuple[int, int]]]:
+        statements: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        for index, generator in enumerate(self.generators):
+            statements.update(generator.traffic(index))
+        return statements
+
+    def parallelize(self, code: str) -> str:
+        self.atomics = set()
+        if self.parallel:
+            raise ValueError("Parallel code generation is not supported for computations")
+        return code
+
+    def cache_key(self) -> str:
+        dtypes = [(field.name, field.dtype) for field in self.fields.values()]
+        return self.cache.key(
+            self.computation,
+            dtypes,
+            self.schedule_map(),
+            self.givens(),
+            self.standalone,
+            self.counters,
         )
 
 
+@dataclass
+class FunctionCollector(Visitor):
+    """Collect the names of the uninterpreted functions used by a space."""
+
+    names: Set[str] = ()
+
+    def __call__(self, space: Space) -> Set[str]:
+        self.names = set()
+        for relation in space.relations:
+            self.visit(relation)
+        return self.names
+
+    def visit_Relation(self, node: Relation) -> None:
+        for child in (node.left, node.mid, node.right):
+            if child:
+                yield child
+
+    def visit_BinOp(self, node: BinOp) -> None:
+        yield node.left
+        yield node.right
+
+    def visit_Function(self, node: Function) -> None:
+        self.names.add(node.name)
+        for arg in node.args:
+            yield arg
+
+    def visit_Node(self, node: Node) -> None:
+        pass
+
+
+KernelSpec = Union[str, Tuple[Space, ast.Module, Dict[str, Any]]]
+
+
+@dataclass
+class BatchCodeGenerator:
+    """
+    Generate many kernels at once, grouping compatible kernels into a single
+    Omega ``codegen`` invocation and splitting the scanned code back apart.
+
+    Each kernel in a group is scheduled behind its own leading constant, so
+    CodeGen+ emits the nests one after another and statement ``s<n>`` belongs to
+    the ``n``-th kernel of the group.
+
+    Given a ``Validator``, the sources are checked to parse as C in one batch.
+    """
+
+    cache: CodeCache = None
+    backend: OmegaBackend = None
+    group_size: int = 32
+    validator: Validator = None
+
+    def __call__(self, specs: List[KernelSpec]) -> List[str]:
+        generators = [self.prepare(spec) for spec in specs]
+        sources: List[str] = [""] * len(generators)
+
+        pending: List[int] = []
+        keys: Dict[int, str] = {}
+        for index, generator in enumerate(generators):
+            if self.cache is not None:
+                # Batched sources keep shared guards, so they are cached apart from
+                # those of a single CodeGenerator...
+                generator.cache = self.cache
+                keys[index] = self.cache.key(generator.cache_key(), "batch")
+                generator.cache = None
+                cached = self.cache.get(keys[index])
+                if cached is not None:
+                    sources[index] = cached
+                    continue
+            pending.append(index)
+
+        for group in self.group(generators, pending):
+            members = [generators[index] for index in group]
+            for index, source in zip(group, self.compile(members)):
+                sources[index] = source
+                if index in keys:
+                    self.cache.put(keys[index], source)
+
+        if self.validator is not None:
+            for generator, validation in zip(generators, self.validator.batch(sources)):
+                if not validation.valid:
+                    error = validation.error
+                    raise ValueError(f"Invalid C generated for '{generator.name}': {error}")
+
+        return sources
+
+    def prepare(self, spec: KernelSpec) -> CodeGenerator:
+        if isinstance(spec, str):
+            spec = IRParser(spec).parse()
+        generator = CodeGenerator(backend=self.backend)
+        generator.prepare(*spec)
+        return generator
+
+    def group(self, generators: List[CodeGenerator], indices: List[int]) -> List[List[int]]:
+        """Greedily assign kernels to groups that can share an Omega run."""
+        groups: List[List[int]] = []
+        functions = {index: FunctionCollector()(generators[index].space) for index in indices}
+        for index in indices:
+            generator = generators[index]
+            for group in groups:
+                if len(group) < self.group_size and all(
+                    self.compatible(generator, functions[index], generators[other], functions[other])
+                    for other in group
+                ):
+                    group.append(index)
+                    break
+            else:
+                groups.append([index])
+        return groups
+
+    def compatible(
+        self,
+        generator: CodeGenerator,
+        functions: Set[str],
+        other: CodeGenerator,
+        other_functions: Set[str],
+    ) -> bool:
+        # Relation names must be unique, and uninterpreted functions are renamed and
+        # re-declared per relation, so their names may not be shared.
+        if generator.name == other.name:
+            return False
+        if functions & (other_functions | set(other.constants)):
+            return False
+        return not other_functions & set(generator.constants)
+
+    def compile(self, generators: List[CodeGenerator]) -> List[str]:
+        if len(generators) == 1:
+            return [generators[0].codegen()]
+
+        depth = max(generator.loops.depth for generator in generators)
+        names = [generator.name for generator in generators]
+        rel_map = {generator.name: generator.relation() for generator in generators}
+        sched_map = {
+            generator.name: [generator.schedule(position, depth)]
+            for position, generator in enumerate(generators)
+        }
+        givens: List[str] = []
+        for generator in generators:
+            givens.extend(given for given in generator.givens() if given not in givens)
+
+        backend = self.backend if self.backend is not None else default_backend()
+        code = backend.codegen(rel_map, sched_map, names, givens).rstrip()
+        if "error" in code.lower():
+            # Compile separately so the error is reported against its kernel...
+            return [generator.codegen() for generator in generators]
+
+        bodies = self.split(code, len(generators))
+        if bodies is None:
+            # Code that cannot be attributed to its kernels is compiled separately...
+            return [generator.codegen() for generator in generators]
+
+        return [
+            generator.function(generator.parallelize("\n".join(body)))
+            for generator, body in zip(generators, bodies)
+        ]
+
+    def split(self, code: str, count: int) -> Optional[List[List[str]]]:
+        """
+        Split the batched ``code`` of ``count`` kernels into the statements of
+        each, renaming its statement macro to ``s0``. A guard shared by several
+        kernels is kept around each kernel's part of it. Returns None if the code
+        cannot be split that way: a shared statement other than an ``if`` without
+        ``else``, or a statement of no kernel.
+        """
+        bodies: List[List[str]] = [[] for _ in range(count)]
+        for statement in split_statements(code):
+            positions = set(int(n) for n in re.findall(r"\bs(\d+)\(", statement))
+            if not positions:
+                return None
+            if len(positions) == 1:
+                position = positions.pop()
+                bodies[position].append(re.sub(f"\\bs{position}\\(", "s0(", statement))
+                continue
+
+            guard = self.guard(statement)
+            if guard is None:
+                return None
+            header, inner = guard
+            parts = self.split(inner, count)
+            if parts is None:
+                return None
+            for body, part in zip(bodies, parts):
+                if part:
+                    body.append(header + "\n" + "\n".join(part) + "\n}")
+        return bodies
+
+    @staticmethod
+    def guard(statement: str) -> Optional[Tuple[str, str]]:
+        """
+        Return the ``if (...) {`` header and body of ``statement`` if it is an
+        ``if`` with a braced body and no ``else``, or None.
+        """
+        statement = statement.strip()
+        start = statement.find("{")
+        if not re.match(r"if\s*\(", statement) or start < 0:
+            return None
+        depth = 0
+        for pos in range(start, len(statement)):
+            depth += {"{": 1, "}": -1}.get(statement[pos], 0)
+            if depth == 0:
+                break
+        if depth != 0 or pos != len(statement) - 1:
+            return None
+        return statement[: start + 1], statement[start + 1 : pos]
+
+
 class ASTVisitor(Visitor):
     code: str = ""
-    root: c_ast.FuncDef = None
+    root: "c_ast.FileAST" = None
+
+    def __call__(self, code: str) -> "c_ast.FileAST":
+        from pycparser import c_ast
 
-    def __call__(self, code: str) -> c_ast.FuncDef:
         self.code = code
-        parser = c_parser.CParser()
-        self.root = parser.parse(self.code, filename="<none>")
+        self.root = parser().parse(preprocess(self.code), filename="<none>")
         assert isinstance(self.root, c_ast.FileAST)
         return self.root
 
@@ -194,11 +979,29 @@ class Transformer(Visitor):
     pass
 
 
+_PRECEDENCE = {
+    ast.BitOr: 1,
+    ast.BitXor: 2,
+    ast.BitAnd: 3,
+    ast.LShift: 4,
+    ast.RShift: 4,
+    ast.Add: 5,
+    ast.Sub: 5,
+    ast.Mult: 6,
+    ast.Div: 6,
+    ast.FloorDiv: 6,
+    ast.Mod: 6,
+}
+
+
 @dataclass
 class PyToCTranslator(Visitor):
     source: str = ""
+    flatten: bool = False
+    ndims: Dict[str, int] = ()
 
     def __call__(self, root: ast.Module) -> str:
+        self.ndims = {}
         stmt_sources = [self.visit(stmt) for stmt in root.body]
         self.source = ";\n".join(stmt_sources) + ";"
         return self.source
@@ -216,11 +1019,21 @@ class PyToCTranslator(Visitor):
         return f"{target} {op}= {value}"
 
     def visit_BinOp(self, node: ast.BinOp) -> str:
-        left = self.visit(node.left)
+        left = self._operand(node.left, node.op)
         op = self.visit(node.op)
-        right = self.visit(node.right)
+        right = self._operand(node.right, node.op, is_right=True)
         return f"{left} {op} {right}"
 
+    def _operand(self, node: ast.AST, op: ast.AST, is_right: bool = False) -> str:
+        # Parenthesize operands that bind less tightly than their parent operator.
+        source = self.visit(node)
+        if isinstance(node, ast.BinOp):
+            outer = _PRECEDENCE.get(type(op), 0)
+            inner = _PRECEDENCE.get(type(node.op), 0)
+            if inner < outer or (is_right and inner == outer):
+                source = f"({source})"
+        return source
+
     def visit_UnaryOp(self, node: ast.UnaryOp) -> str:
         operand = self.visit(node.operand)
         op = self.visit(node.op)
@@ -228,6 +1041,17 @@ class PyToCTranslator(Visitor):
 
     def visit_Subscript(self, node: ast.Subscript) -> str:
         c_value = self.visit(node.value)
+        index = node.slice.value if isinstance(node.slice, ast.Index) else node.slice
+        elts = index.elts if isinstance(index, ast.Tuple) else [index]
+        self.ndims[c_value] = len(elts)
+        if self.flatten and len(elts) > 1:
+            # Row-major offset using the row strides passed as parameters...
+            terms = [
+                f"({self.visit(elt)}) * {c_value}_stride{dim}"
+                for dim, elt in enumerate(elts[:-1])
+            ]
+            terms.append(self.visit(elts[-1]))
+            return f"{c_value}[{' + '.join(terms)}]"
         c_slice = self.visit(node.slice)
         return f"{c_value}[{c_slice}]"
 
@@ -287,3 +1111,306 @@ class PyToCTranslator(Visitor):
 
     def visit_MatMult(self, node: ast.MatMult) -> str:
         raise RuntimeError("Unsupported operator: MatMult ('@')")
+
+
+def _window(array: Any, *index: Union[str, Tuple[Any, int, int]]) -> Any:
+    """
+    Return a view of ``array`` where each index is a scalar or a
+    ``(start, size, step)`` window, raising IndexError outside its bounds.
+    """
+    slices = []
+    for dim, item in enumerate(index):
+        if isinstance(item, tuple):
+            start, size, step = item
+            if size > 0 and (start < 0 or start + (size - 1) * step >= array.shape[dim]):
+                raise IndexError(f"Window {item} out of bounds for axis {dim}")
+            item = slice(start, start + size * step, step)
+        slices.append(item)
+    return array[tuple(slices)]
+
+
+def _align(view: Any, axes: Tuple[int, ...], ndim: int) -> Any:
+    """Broadcast ``view``, whose dimensions run along ``axes``, over ``ndim`` loops."""
+    order = sorted(range(len(axes)), key=axes.__getitem__)
+    view = view.transpose(order)
+    shape = [1] * ndim
+    for axis, size in zip(sorted(axes), view.shape):
+        shape[axis] = size
+    return view.reshape(shape)
+
+
+def _collapse(value: Any, axes: Tuple[int, ...], shape: Tuple[int, ...], reduce: bool) -> Any:
+    """
+    Map ``value``, broadcast over the loops with extents ``shape``, onto the target
+    loops ``axes``, summing over the others if ``reduce`` is set.
+    """
+    import numpy as np
+
+    value = np.broadcast_to(value, shape)
+    others = tuple(axis for axis in range(len(shape)) if axis not in axes)
+    if reduce:
+        value = value.sum(axis=others)
+    else:
+        value = value[tuple(0 if axis in others else slice(None) for axis in range(len(shape)))]
+    order = sorted(axes)
+    return value.transpose([order.index(axis) for axis in axes])
+
+
+@dataclass
+class PyToNumPyTranslator(Visitor):
+    """
+    Lowers a rectangular space and its statements into a Python function of
+    whole-array NumPy operations. Affine subscripts become strided views,
+    ``+=`` reductions over products become ``einsum`` contractions, and other
+    expressions are broadcast over the iteration space. Non-rectangular spaces,
+    uninterpreted functions and loop-carried dependences raise ValueError.
+    """
+
+    source: str = ""
+
+    def __call__(self, space: Space, root: ast.Module, fields: Dict[str, Any]) -> str:
+        self.space = space
+        self.iterators: List[str] = list(space.iterators)
+        self.fields = fields
+        self.constants: List[str] = []
+        self.bounds: Dict[str, Tuple[str, str]] = {}
+        self.bind_space()
+
+        params = self.constants + [name for name in fields if name not in self.constants]
+        lines = [f"def {space.name}({', '.join(params)}):"]
+        for name in self.iterators:
+            lower, size = self.bounds[name]
+            lines.append(f"    {name}_lo = {lower}")
+            lines.append(f"    {name}_n = max({size}, 0)")
+        shape = ", ".join(f"{name}_n" for name in self.iterators)
+        lines.append(f"    shape = ({shape},)")
+        lines.append("    if 0 in shape:")
+        lines.append("        return")
+
+        self.check_dependences(root)
+        for stmt in root.body:
+            lines.append(f"    {self.visit(stmt)}")
+
+        self.source = "\n".join(lines) + "\n"
+        return self.source
+
+    def bind_space(self) -> None:
+        """Find the constant lower and upper bounds of each iterator."""
+        lowers: Dict[str, List[AffineExpr]] = {name: [] for name in self.iterators}
+        uppers: Dict[str, List[AffineExpr]] = {name: [] for name in self.iterators}
+        for constraint in space_constraints(self.space):
+            expr = constraint.expr
+            if expr.calls():
+                raise ValueError(f"Uninterpreted function in constraint: {expr}")
+            for var in expr.variables():
+                if var not in self.iterators and var not in self.constants:
+                    self.constants.append(var)
+            bound = [var for var in expr.variables() if var in self.iterators]
+            if len(bound) != 1 or abs(expr.coeff(bound[0])) != 1:
+                raise ValueError(f"Non-rectangular constraint: {expr}")
+            name = bound[0]
+            coeff = expr.coeff(name)
+            rest = expr - AffineExpr({name: coeff})
+            # coeff * name + rest >= 0 (or == 0)
+            if coeff > 0 or constraint.is_eq:
+                lowers[name].append(rest.scale(-coeff))
+            if coeff < 0 or constraint.is_eq:
+                uppers[name].append(rest.scale(-coeff))
+
+        for name in self.iterators:
+            if not lowers[name] or not uppers[name]:
+                raise ValueError(f"Iterator '{name}' is unbounded")
+            if len(lowers[name]) == 1 and len(uppers[name]) == 1:
+                size = str(uppers[name][0] - lowers[name][0] + AffineExpr(const=1))
+            else:
+                size = f"{self._bound(uppers[name], 'min')} - {name}_lo + 1"
+            self.bounds[name] = (self._bound(lowers[name], "max"), size)
+
+    def _bound(self, exprs: List[AffineExpr], func: str) -> str:
+        bounds = list(dict.fromkeys(str(expr) for expr in exprs))
+        if len(bounds) == 1:
+            return bounds[0]
+        return f"{func}({', '.join(bounds)})"
+
+    def check_dependences(self, root: ast.Module) -> None:
+        """
+        Reject statements whose results would depend on the loop order, since the
+        vectorized form evaluates every right-hand side before writing.
+        """
+        written: Dict[str, int] = {}
+        for number, stmt in enumerate(root.body):
+            target = self._target(stmt)
+            written[target.value.id] = number
+
+        for number, stmt in enumerate(root.body):
+            target = self._target(stmt)
+            for node in ast.walk(stmt):
+                if not isinstance(node, ast.Name) or node.id not in written:
+                    continue
+                if written[node.id] != number:
+                    raise ValueError(f"Field '{node.id}' is shared between statements")
+            for node in ast.walk(stmt.value):
+                if isinstance(node, ast.Subscript) and node.value.id == target.value.id:
+                    if isinstance(stmt, ast.AugAssign) or ast.dump(node) != ast.dump(target):
+                        raise ValueError(f"Loop-carried dependence on '{target.value.id}'")
+
+    def _target(self, stmt: ast.AST) -> ast.Subscript:
+        if isinstance(stmt, ast.Assign):
+            assert len(stmt.targets) == 1
+            target = stmt.targets[0]
+        elif isinstance(stmt, ast.AugAssign):
+            target = stmt.target
+        else:
+            raise ValueError(f"Unsupported statement: {ast.dump(stmt)}")
+        if not isinstance(target, ast.Subscript):
+            raise ValueError("Statement targets must be subscripted fields")
+        return target
+
+    def affine(self, node: ast.AST) -> AffineExpr:
+        if isinstance(node, ast.Name):
+            return AffineExpr({node.id: 1})
+        if isinstance(node, ast.Constant) and isinstance(node.value, int):
+            return AffineExpr(const=node.value)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return self.affine(node.operand).scale(-1)
+        if isinstance(node, ast.BinOp):
+            left = self.affine(node.left)
+            right = self.affine(node.right)
+            if isinstance(node.op, ast.Add):
+                return left + right
+            if isinstance(node.op, ast.Sub):
+                return left - right
+            if isinstance(node.op, ast.Mult) and (left.is_constant or right.is_constant):
+                return right.scale(left.const) if left.is_constant else left.scale(right.const)
+        if isinstance(node, ast.Call):
+            raise ValueError(f"Indirect subscript: {node.func.id}(...)")
+        raise ValueError(f"Non-affine subscript: {ast.dump(node)}")
+
+    def window(self, node: ast.Subscript) -> Tuple[str, Tuple[int, ...]]:
+        """Return the view of subscript ``node`` and the loop axes of its dimensions."""
+        index = node.slice.value if isinstance(node.slice, ast.Index) else node.slice
+        elts = index.elts if isinstance(index, ast.Tuple) else [index]
+        items: List[str] = []
+        axes: List[int] = []
+        for elt in elts:
+            expr = self.affine(elt)
+            loops = [var for var in expr.variables() if var in self.iterators]
+            if not loops:
+                items.append(str(expr))
+                continue
+            name = loops[0]
+            step = expr.coeff(name)
+            if len(loops) > 1 or step < 1:
+                raise ValueError(f"Subscript '{expr}' is not a strided window")
+            start = expr - AffineExpr({name: step}) + AffineExpr({f"{name}_lo": step})
+            items.append(f"({start}, {name}_n, {step})")
+            axes.append(self.iterators.index(name))
+        view = f"_window({node.value.id}, {', '.join(items)})"
+        return view, tuple(axes)
+
+    def visit_Assign(self, node: ast.Assign) -> str:
+        return self._assign(node.targets[0], "=", node.value)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> str:
+        op = PyToCTranslator().visit(node.op)
+        return self._assign(node.target, op + "=", node.value)
+
+    def _assign(self, target: ast.Subscript, op: str, value: ast.AST) -> str:
+        view, axes = self.window(target)
+        if len(set(axes)) < len(axes):
+            raise ValueError(f"Repeated iterator in target of '{target.value.id}'")
+        reduced = [name for n, name in enumerate(self.iterators) if n not in axes]
+        reduce = op != "=" and len(reduced) > 0
+        if reduce:
+            if op not in ("+=", "-="):
+                raise ValueError(f"Unsupported reduction operator: {op}")
+            contraction = self.contract(value, axes)
+            if contraction:
+                return f"{view}[...] {op} {contraction}"
+        elif any(isinstance(n, ast.Name) and n.id in reduced for n in ast.walk(value)):
+            raise ValueError(f"Value assigned to '{target.value.id}' varies over {reduced}")
+        return f"{view}[...] {op} _collapse({self.visit(value)}, {axes}, shape, {reduce})"
+
+    def contract(self, value: ast.AST, axes: Tuple[int, ...]) -> str:
+        """Return an ``einsum`` for products of subscripts reduced onto ``axes``, if any."""
+        factors: List[ast.AST] = []
+        stack = [value]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+                stack.extend([node.right, node.left])
+            else:
+                factors.append(node)
+
+        scalars: List[str] = []
+        operands: List[str] = []
+        specs: List[str] = []
+        for factor in factors:
+            if isinstance(factor, ast.Subscript):
+                view, view_axes = self.window(factor)
+                operands.append(view)
+                specs.append("".join(chr(ord("a") + axis) for axis in view_axes))
+            elif any(isinstance(n, (ast.Subscript, ast.Call)) for n in ast.walk(factor)):
+                return ""
+            elif any(isinstance(n, ast.Name) and n.id in self.iterators for n in ast.walk(factor)):
+                return ""
+            else:
+                scalars.append(self.visit(factor))
+        if not operands:
+            return ""
+
+        # Loops that index no operand scale the sum by their extent...
+        indexed = set("".join(specs))
+        for n, name in enumerate(self.iterators):
+            if chr(ord("a") + n) not in indexed and n not in axes:
+                scalars.append(f"{name}_n")
+            elif chr(ord("a") + n) not in indexed:
+                return ""
+
+        output = "".join(chr(ord("a") + axis) for axis in axes)
+        einsum = f"np.einsum('{','.join(specs)}->{output}', {', '.join(operands)}, optimize=True)"
+        return " * ".join(scalars + [einsum])
+
+    def visit_BinOp(self, node: ast.BinOp) -> str:
+        if isinstance(node.op, ast.Pow):
+            op = "**"
+        elif isinstance(node.op, ast.FloorDiv):
+            op = "//"
+        else:
+            op = PyToCTranslator().visit(node.op)
+        return f"({self.visit(node.left)} {op} {self.visit(node.right)})"
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> str:
+        op = PyToCTranslator().visit(node.op)
+        return f"{op}{self.visit(node.operand)}"
+
+    def visit_Subscript(self, node: ast.Subscript) -> str:
+        view, axes = self.window(node)
+        if len(set(axes)) < len(axes):
+            raise ValueError(f"Repeated iterator in subscript of '{node.value.id}'")
+        return f"_align({view}, {axes}, {len(self.iterators)})"
+
+    def visit_Name(self, node: ast.Name) -> str:
+        if node.id in self.iterators:
+            axis = self.iterators.index(node.id)
+            arange = f"np.arange({node.id}_lo, {node.id}_lo + {node.id}_n)"
+            return f"_align({arange}, ({axis},), {len(self.iterators)})"
+        return node.id
+
+    def visit_Constant(self, node: ast.Constant) -> str:
+        return repr(node.value)
+
+    def visit_Call(self, node: ast.Call) -> str:
+        raise ValueError(f"Unsupported call: {node.func.id}(...)")
+
+
+def numpy_kernel(space: Space, root: ast.Module, fields: Dict[str, Any]) -> Any:
+    """Return the NumPy function generated by ``PyToNumPyTranslator`` for a kernel."""
+    import numpy as np
+
+    source = PyToNumPyTranslator()(space, root, fields)
+    namespace = {"np": np, "_window": _window, "_align": _align, "_collapse": _collapse}
+    exec(compile(source, f"<pyomega:{space.name}>", "exec"), namespace)
+    kernel = namespace[space.name]
+    kernel.source = source
+    return kernel
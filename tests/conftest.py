@@ -0,0 +1,20 @@
+# tests/conftest.py
+import sys
+
+import pytest
+
+sys.path.append("./src")
+from pyomega.backend import OmegaBackend
+
+
+@pytest.fixture(scope="session")
+def omega_lib():
+    """
+    The OmegaLib bindings, loaded as the backend loads them, or a skip if they
+    are not built. ``importorskip("omega")`` is no guard: with ``./src`` on the
+    path, ``src/omega`` imports as a namespace package without a build.
+    """
+    try:
+        return OmegaBackend().lib
+    except ImportError:
+        pytest.skip("OmegaLib is not built")
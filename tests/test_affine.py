@@ -0,0 +1,65 @@
+# tests/test_affine.py
+import sys
+
+import pytest
+
+sys.path.append("./src")
+from pyomega.affine import (
+    AffineExpr,
+    functions,
+    identity_schedule,
+    linearize,
+    space_constraints,
+    to_native,
+)
+from pyomega.parser import RelParser
+
+
+def test_linearize():
+    space = RelParser(expression="s = {[i, j]: 0 <= i < N ^ j == 2 * i + 1 - M}").parse()
+    domain = to_native(space_constraints(space))
+    assert domain == [
+        ({"i": 1}, 0, False),
+        ({"N": 1, "i": -1}, -1, False),
+        ({"j": 1, "i": -2, "M": 1}, -1, True),
+    ]
+
+
+def test_non_affine():
+    space = RelParser(expression="s = {[i, j]: 0 <= i < N ^ j == i * M}").parse()
+    with pytest.raises(ValueError):
+        space_constraints(space)
+
+
+def test_functions():
+    expr = "spmv = {[i, n, j]: 0 <= i < N ^ rp(i) <= n < rp(i + 1) ^ j == col(n)}"
+    space = RelParser(expression=expr).parse()
+    domain = space_constraints(space)
+    assert str(domain[2].expr) == "n + -1*rp(i)"
+    ufuncs = functions(list(space.iterators), domain)
+    assert [(ufunc.name, ufunc.args, ufunc.params) for ufunc in ufuncs.values()] == [
+        ("rp", ("i",), ("i",)),
+        ("rp1", ("i + 1",), ("i",)),
+        ("col", ("n",), ("i", "n")),
+    ]
+    assert to_native(domain, ufuncs)[3] == ({"rp1": 1, "n": -1}, -1, False)
+
+    expr = "s = {[i, j]: 0 <= i < N ^ j == f(0)}"
+    space = RelParser(expression=expr).parse()
+    with pytest.raises(ValueError):
+        functions(list(space.iterators), space_constraints(space))
+
+
+def test_identity_schedule():
+    outputs, schedule = identity_schedule(["i", "j"], position=1, depth=3)
+    assert outputs == ["c1", "c2", "c3", "c4", "c5", "c6", "c7"]
+    assert [str(constraint.expr) for constraint in schedule] == [
+        "c1 + -1",
+        "c2 + -1*i",
+        "c3",
+        "c4 + -1*j",
+        "c5",
+        "c6",
+        "c7",
+    ]
+    assert AffineExpr({"i": 2}, 1).scale(-1).coeffs == {"i": -2}
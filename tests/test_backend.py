@@ -0,0 +1,146 @@
+# tests/test_backend.py
+import os
+import signal
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append("./src")
+from pyomega.backend import CalculatorSession, OmegaBackend
+from pyomega.parser import IRParser
+from pyomega.visit import CodeGenerator
+
+SPMV = "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]"
+
+
+class CountingLib:
+    def __init__(self):
+        self.calls = 0
+
+    def codegen(self, relmap, schedmap, names, givens):
+        self.calls += 1
+        return f"codegen {self.calls}"
+
+    def run(self, code, nstatements):
+        self.calls += 1
+        return f"run {self.calls}"
+
+
+def test_codegen_memo():
+    lib = CountingLib()
+    backend = OmegaBackend(lib=lib)
+    relmap = {"lap": "{[i]: 0 <= i < N}"}
+    schedmap = {"lap": ["r0lap := {[i] -> [0, i, 0]}"]}
+
+    first = backend.codegen(relmap, schedmap, ["lap"], ["N >= 1"])
+    relmap = {"lap": "{[i]:  0 <= i <  N}"}
+    second = backend.codegen(relmap, schedmap, ["lap"], ["N >= 1"])
+    assert first == second
+    assert lib.calls == 1
+    assert backend.stats.hits == 1
+    assert backend.stats.misses == 1
+
+    backend.codegen(relmap, schedmap, ["lap"], ["N >= 2"])
+    assert lib.calls == 2
+
+    backend.clear()
+    assert len(backend) == 0
+    backend.codegen(relmap, schedmap, ["lap"], ["N >= 1"])
+    assert lib.calls == 3
+
+
+def test_empty_backend_is_used():
+    lib = CountingLib()
+    backend = OmegaBackend(capacity=0, lib=lib)
+    assert len(backend) == 0 and backend
+
+    generator = CodeGenerator(backend=backend, direct=False)
+    generator.prepare(*IRParser("lap = {[i]: 0 <= i < N}\nx[i] = 0").parse())
+    assert generator.scan() == "codegen 1"
+    assert lib.calls == 1
+
+
+def test_lru_eviction():
+    lib = CountingLib()
+    backend = OmegaBackend(capacity=2, lib=lib)
+    for code in ("a", "b", "a", "c", "b"):
+        backend.run(code)
+    # 'b' was evicted by 'c' since 'a' was used more recently...
+    assert lib.calls == 4
+    assert backend.stats.evictions == 2
+    assert backend.stats.as_dict()["hits"] == 1
+
+
+def test_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    lib = CountingLib()
+    backend = OmegaBackend(capacity=8, lib=lib)
+    codes = [str(n % 4) for n in range(64)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(backend.run, codes))
+    assert len(results) == 64
+    assert len(backend) == 4
+    assert backend.stats.hits + backend.stats.misses == 64
+
+
+def test_session(omega_lib):
+    specs = [f"k{n} = {{[i, j]: 0 <= i < N ^ 0 <= j < {n + 1}}}\ny[i] += A[i, j]" for n in range(8)]
+    specs.append(SPMV)
+    backend = OmegaBackend(capacity=0)
+    expected = [CodeGenerator(backend=backend)(*IRParser(spec).parse()) for spec in specs]
+
+    with CalculatorSession() as session:
+        backend = OmegaBackend(capacity=0, lib=session)
+        sources = [None] * len(specs)
+
+        def compile_specs(first):
+            for n in range(first, len(specs), 3):
+                sources[n] = CodeGenerator(backend=backend)(*IRParser(specs[n]).parse())
+
+        threads = [threading.Thread(target=compile_specs, args=(first,)) for first in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sources == expected
+        assert session.restarts == 0
+
+        with pytest.raises(RuntimeError, match="Unknown OmegaLib method"):
+            session.call("omega_cmd", "")
+    assert session.pid == 0
+
+
+def test_session_restart(omega_lib):
+    session = CalculatorSession(timeout=1.0)
+    source = CodeGenerator(backend=OmegaBackend(capacity=0, lib=session))(*IRParser(SPMV).parse())
+
+    # A call in flight when the process dies fails, and the next call restarts it...
+    pid = session.pid
+    os.kill(pid, signal.SIGSTOP)
+    errors = []
+    thread = threading.Thread(
+        target=lambda: errors.append(pytest.raises(RuntimeError, session.run, ""))
+    )
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not session._pending and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert session._pending
+    os.kill(pid, signal.SIGKILL)
+    thread.join()
+    assert "exited with code" in str(errors[0].value)
+
+    backend = OmegaBackend(capacity=0, lib=session)
+    assert CodeGenerator(backend=backend)(*IRParser(SPMV).parse()) == source
+    assert session.restarts == 1 and session.pid != pid
+
+    # A call that hangs is killed after the timeout...
+    os.kill(session.pid, signal.SIGSTOP)
+    with pytest.raises(RuntimeError, match="timed out"):
+        session.run("")
+    assert CodeGenerator(backend=backend)(*IRParser(SPMV).parse()) == source
+    assert session.restarts == 2
+    session.close()
@@ -0,0 +1,87 @@
+# tests/test_bench.py
+import json
+import shutil
+import sys
+
+import click.testing
+import pytest
+
+sys.path.append("./src")
+from pyomega.bench import (
+    BENCHMARKS,
+    Result,
+    compare,
+    load,
+    main,
+    run,
+    save,
+    startup_modules,
+)
+
+
+def result(kernel: str, size: int, median: float) -> Result:
+    return Result(kernel, size, median=median)
+
+
+def test_compare():
+    baseline = [result("dmv", 64, 1.0), result("dmv", 256, 2.0)]
+    current = [result("dmv", 64, 1.05), result("dmv", 256, 3.0), result("lap", 64, 1.0)]
+    assert compare(baseline, current) == [("dmv", 256, 0.5)]
+    assert compare(baseline, current, tolerance=0.01)[0][:2] == ("dmv", 64)
+
+
+def test_setup():
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(0)
+    problem = BENCHMARKS["spmv"].setup(32, rng)
+    _, y, A, x, rp, col = problem.args
+    assert rp[0] == 0 and rp[-1] == len(col) == len(A) == problem.points
+    assert problem.flops == 2 * problem.points
+
+    problem = BENCHMARKS["spmv_coo"].setup(32, rng)
+    nnz, _, _, _, row, col = problem.args
+    assert nnz == len(row) == len(col) and np.all(np.diff(row) >= 0)
+
+
+def test_run(tmp_path, omega_lib):
+    pytest.importorskip("numpy")
+    if shutil.which("cc") is None:
+        pytest.skip("No C compiler available")
+    from pyomega.jit import JITCompiler
+
+    compiler = JITCompiler(path=str(tmp_path / "jit"))
+    results = run(sizes=(16,), warmup=0, repeat=2, compiler=compiler)
+    assert [r.kernel for r in results] == list(BENCHMARKS)
+    assert all(r.min <= r.median and r.gflops > 0 and r.bandwidth > 0 for r in results)
+
+    path = str(tmp_path / "results.json")
+    save(results, path, compiler)
+    assert load(path) == results
+    with open(path) as file:
+        assert json.load(file)["flags"] == list(compiler.flags)
+
+    with pytest.raises(ValueError):
+        run(["nope"], compiler=compiler)
+
+
+def test_main(tmp_path, omega_lib):
+    pytest.importorskip("numpy")
+    if shutil.which("cc") is None:
+        pytest.skip("No C compiler available")
+
+    runner = click.testing.CliRunner(env={"PYOMEGA_CACHE_DIR": str(tmp_path)})
+    output = str(tmp_path / "results.json")
+    args = ["-k", "dmv", "-s", "8", "--repeat", "1", "-o", output]
+    result = runner.invoke(main, args)
+    assert result.exit_code == 0, result.output
+    assert "dmv" in result.output
+
+    baseline = [Result(**dict(r.__dict__, median=r.median / 100)) for r in load(output)]
+    save(baseline, str(tmp_path / "baseline.json"))
+    result = runner.invoke(main, args + ["--baseline", str(tmp_path / "baseline.json")])
+    assert result.exit_code == 1
+    assert "Regression: dmv at size 8" in result.output
+
+
+def test_startup():
+    assert startup_modules() == []
@@ -0,0 +1,86 @@
+# tests/test_build.py
+import os
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+sys.path.append("./src")
+from pyomega.build import build, combine, discover, main, read_spec
+
+SPECS = {
+    "dmv.omega": "# Dense matrix-vector\n"
+    "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\n"
+    "y[i] += A[i, j] * x[j]\n",
+    "sparse/spmv.omega": "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\n"
+    "y[i] += A[n] * x[j]\n",
+}
+
+
+def write_specs(root):
+    for name, text in SPECS.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+def test_discover(tmp_path):
+    write_specs(tmp_path)
+    (tmp_path / "notes.txt").write_text("")
+    expected = [str(tmp_path / "dmv.omega"), str(tmp_path / "sparse" / "spmv.omega")]
+    assert discover([str(tmp_path)]) == expected
+    assert discover([str(tmp_path / "**" / "*.omega"), str(tmp_path / "dmv.omega")]) == expected
+    with pytest.raises(ValueError):
+        discover([str(tmp_path / "*.missing")])
+
+
+def test_read_spec(tmp_path):
+    write_specs(tmp_path)
+    spec = read_spec(str(tmp_path / "dmv.omega"))
+    assert spec.name == "dmv"
+    assert spec.text.startswith("dmv = ")
+    (tmp_path / "dmv.omega").write_text("\n# Comment\n" + SPECS["dmv.omega"])
+    assert read_spec(str(tmp_path / "dmv.omega")).key == spec.key
+    assert read_spec(str(tmp_path / "dmv.omega"), dict(parallel=True)).key != spec.key
+
+
+def test_combine():
+    source = combine(["#define s0(i) { x[(i)] = 0; }\nvoid a() {}\n", "#define s0(i) {}\n"])
+    assert source.count("#undef s0") == 2
+    assert source.index("void a") < source.index("#undef s0") < source.index("#define s0(i) {}")
+
+
+def test_build_incremental(tmp_path, omega_lib):
+    write_specs(tmp_path / "specs")
+    output = str(tmp_path / "build")
+    specs = [read_spec(path) for path in discover([str(tmp_path / "specs")])]
+
+    outcomes = build(specs, output, jobs=1, incremental=True)
+    assert [outcome.status for outcome in outcomes] == ["compiled", "compiled"]
+    assert sorted(os.listdir(output)) == [".pyomega-manifest.json", "dmv.c", "spmv.c"]
+
+    outcomes = build(specs, output, jobs=1, incremental=True)
+    assert [outcome.status for outcome in outcomes] == ["skipped", "skipped"]
+
+    (tmp_path / "specs" / "dmv.omega").write_text(SPECS["dmv.omega"] + "z[i] = y[i]\n")
+    specs = [read_spec(path) for path in discover([str(tmp_path / "specs")])]
+    outcomes = build(specs, output, jobs=1, incremental=True)
+    assert [outcome.status for outcome in outcomes] == ["compiled", "skipped"]
+    assert "z[(i)] = y[(i)]" in (tmp_path / "build" / "dmv.c").read_text()
+
+
+def test_compile_command(tmp_path, omega_lib):
+    write_specs(tmp_path)
+    output = str(tmp_path / "kernels.c")
+    runner = CliRunner()
+
+    result = runner.invoke(main, [str(tmp_path), "-o", output, "-j", "2", "--no-cache"])
+    assert result.exit_code == 0, result.output
+    assert "2 compiled, 0 skipped, 0 failed" in result.output
+    source = open(output).read()
+    assert "void dmv(" in source and "void spmv(" in source
+
+    (tmp_path / "bad.omega").write_text("bad = {[i]: 0 <= i <\n")
+    result = runner.invoke(main, [str(tmp_path), "-o", output, "-j", "1", "--no-cache"])
+    assert result.exit_code == 1
+    assert "2 compiled, 0 skipped, 1 failed" in result.output
@@ -0,0 +1,72 @@
+# tests/test_cache.py
+import ast
+import os
+import sys
+
+sys.path.append("./src")
+from pyomega.cache import CodeCache, canonical, content_hash
+from pyomega.ir import BinOp, Constant, Iterator, Relation
+
+
+def test_canonical_ignores_identity():
+    left = Relation(left=Iterator("i"), left_op="<", right=Constant("N"))
+    right = Relation(left=Iterator("i"), left_op="<", right=Constant("N"))
+    assert left.id != right.id
+    assert canonical(left) == canonical(right)
+    assert content_hash(left) == content_hash(right)
+
+    other = Relation(left=Iterator("i"), left_op="<=", right=Constant("N"))
+    assert content_hash(left) != content_hash(other)
+
+
+def test_key_covers_ast():
+    space = BinOp(Iterator("i"), "+", Constant("N"))
+    first = content_hash(space, ast.parse("y[i] += x[i]"))
+    second = content_hash(space, ast.parse("y[i] = x[i]"))
+    assert first != second
+
+
+def test_get_put(tmp_path):
+    cache = CodeCache(str(tmp_path))
+    key = cache.key("dmv", ["r0dmv := {[i] -> [0, i, 0]}"])
+    assert cache.get(key) is None
+    cache.put(key, "void dmv() {}")
+    assert cache.get(key) == "void dmv() {}"
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.stores == 1
+
+    # A second handle on the same directory shares entries...
+    assert CodeCache(str(tmp_path)).get(key) == "void dmv() {}"
+
+
+def test_eviction(tmp_path):
+    cache = CodeCache(str(tmp_path), max_bytes=250)
+    keys = [cache.key(n) for n in range(4)]
+    for n, key in enumerate(keys):
+        cache.put(key, str(n) * 100)
+        os.utime(cache.entry_path(key), (n, n))
+
+    assert cache.size() <= 250
+    assert cache.stats.evictions == 2
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[-1]) == "3" * 100
+
+
+def test_put_tracks_size(tmp_path, monkeypatch):
+    cache = CodeCache(str(tmp_path), max_bytes=1000)
+    scans = []
+    entries = cache.entries
+    monkeypatch.setattr(cache, "entries", lambda: scans.append(1) or entries())
+
+    # Stores below the limit scan the directory once, for its initial size...
+    for n in range(9):
+        cache.put(cache.key(n), str(n) * 100)
+    cache.put(cache.key(0), "0" * 50)
+    assert len(scans) == 1 and cache.stats.evictions == 0
+
+    # Exceeding it evicts down to the low-water mark, leaving room to store again...
+    for n in range(9, 11):
+        cache.put(cache.key(n), str(n % 10) * 100)
+    assert len(scans) == 2 and cache.stats.evictions > 0
+    assert cache.size() <= 750
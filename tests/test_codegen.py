@@ -2,9 +2,20 @@
 import sys
 from typing import List
 
+import pytest
+
 sys.path.append("./src")
+from pyomega.backend import OmegaBackend
+from pyomega.cache import CodeCache
 from pyomega.parser import IRParser
-from pyomega.visit import ASTVisitor, CodeGenerator
+from pyomega.visit import (
+    ASTVisitor,
+    BatchCodeGenerator,
+    CodeGenerator,
+    PyToNumPyTranslator,
+    numpy_kernel,
+    split_statements,
+)
 
 
 def codegen_test(
@@ -37,46 +48,46 @@ def codegen_test(
         assert c_ast is not None
 
 
-def test_dmv():
+def test_dmv(tmp_path):
     expr = "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\n"
     expr += "y[i] += A[i, j] * x[j]"
     code = "#define s0(i, j) { y[(i)] += A[(i), (j)] * x[(j)]; }\n\nvoid dmv(const int N, const int M, float *y, const float *A, const float *x) {\n  int t2, t4;\nfor(t2 = 0; t2 <= N-1; t2++) {\n  for(t4 = 0; t4 <= M-1; t4++) {\n    s0(t2,t4);\n  }\n}\n}"
-    codegen_test(expr, code, ["y", "A", "x"], "dmv")
+    codegen_test(expr, code, ["y", "A", "x"], str(tmp_path / "dmv"))
 
 
-def test_matmul():
+def test_matmul(tmp_path):
     expr = "matmul = {[i, j, k]: 0 <= i < N ^ 0 <= j < M ^ 0 <= k < K}\n"
     expr += "C[i, j] += A[i, k] * B[k, j]"
     code = "#define s0(i, j, k) { C[(i), (j)] += A[(i), (k)] * B[(k), (j)]; }\n\nvoid matmul(const int N, const int M, const int K, float *C, const float *A, const float *B) {\n  int t2, t4, t6;\nfor(t2 = 0; t2 <= N-1; t2++) {\n  for(t4 = 0; t4 <= M-1; t4++) {\n    for(t6 = 0; t6 <= K-1; t6++) {\n      s0(t2,t4,t6);\n    }\n  }\n}\n}"
-    codegen_test(expr, code, ["C", "A", "B"], "matmul")
+    codegen_test(expr, code, ["C", "A", "B"], str(tmp_path / "matmul"))
 
 
-def test_spmv():
+def test_spmv(tmp_path):
     expr = "spmv = {[i, n, j]: 0 <= i < N ^ rp(i) <= n < rp(i + 1) ^ j == col(n)}\n"
     expr += "y[i] += A[n] * x[j]"
     code = "#define s0(i, n, j) { y[(i)] += A[(n)] * x[(j)]; }\n\nvoid spmv(const int N, float *y, const float *A, const float *x) {\n  int t2, t4, t6;\nfor(t2 = 0; t2 <= N-1; t2++) {\n    for(t4 = rp(t2); t4 <= rp1(t2)-1; t4++) {\n      t6=col(t2,t4);\n      s0(t2,t4,t6);\n    }\n  }\n}"
-    codegen_test(expr, code, ["y", "A", "x"], "spmv")
+    codegen_test(expr, code, ["y", "A", "x"], str(tmp_path / "spmv"))
 
 
-def test_spmv_coo():
+def test_spmv_coo(tmp_path):
     expr = "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\n"
     expr += "y[i] += A[n] * x[j]"
     code = "#define s0(n, i, j) { y[(i)] += A[(n)] * x[(j)]; }\n\nvoid spmv(const int M, float *y, const float *A, const float *x) {\n  int t2, t4, t6;\nfor(t2 = 0; t2 <= M-1; t2++) {\n  t4=row(t2);\n  t6=col(t2);\n  s0(t2,t4,t6);\n}\n}"
-    codegen_test(expr, code, ["y", "A", "x"], "spmv_coo")
+    codegen_test(expr, code, ["y", "A", "x"], str(tmp_path / "spmv_coo"))
 
 
-def test_krp():
+def test_krp(tmp_path):
     expr = "krp = {[n, i, j, k, r]: 0 <= n < M ^ i == ind0(n) ^ j == ind1(n) ^ k == ind2(n) ^ 0 <= r < R}\n"
     expr += "A[i, r] += X[n] * C[k, r] * B[j, r]"
     code = "#define s0(n, i, j, k, r) { A[(i), (r)] += X[(n)] * C[(k), (r)] * B[(j), (r)]; }\n\nvoid krp(const int M, const int R, float *A, const float *X, const float *C, const float *B) {\n  int t2, t4, t6, t8, t10;\nfor(t2 = 0; t2 <= M-1; t2++) {\n  t4=ind0(t2);\n  t6=ind1(t2);\n  t8=ind2(t2);\n  for(t10 = 0; t10 <= R-1; t10++) {\n    s0(t2,t4,t6,t8,t10);\n  }\n}\n}"
-    codegen_test(expr, code, ["A", "X", "C", "B"], "krp")
+    codegen_test(expr, code, ["A", "X", "C", "B"], str(tmp_path / "krp"))
 
 
-def test_lap():
+def test_lap(tmp_path):
     expr = "lap = {[i, j, k]: 0 <= i < I ^ 0 <= j < J ^ 0 <= k < K}\n"
     expr += "out[i, j, k] = -4.0 * inp[i, j, k] + inp[i + 1, j, k] + inp[i - 1, j, k] + inp[i, j - 1, k] + inp[i, j + 1, k]"
     code = "#define s0(i, j, k) { out[(i), (j), (k)] = -4.0 * inp[(i), (j), (k)] + inp[(i) + 1, (j), (k)] + inp[(i) - 1, (j), (k)] + inp[(i), (j) - 1, (k)] + inp[(i), (j) + 1, (k)]; }\n\nvoid lap(const int I, const int J, const int K, float *out, const float *inp) {\n  int t2, t4, t6;\nfor(t2 = 0; t2 <= I-1; t2++) {\n  for(t4 = 0; t4 <= J-1; t4++) {\n    for(t6 = 0; t6 <= K-1; t6++) {\n      s0(t2,t4,t6);\n    }\n  }\n}\n}"
-    codegen_test(expr, code, ["out", "inp"], "lap")
+    codegen_test(expr, code, ["out", "inp"], str(tmp_path / "lap"))
 
 
 def test_corners():
@@ -92,3 +103,147 @@ def test_corners():
 
     code = "#define s0(i, j, k) { out[(i), (j), (k)] = inp[0, (j) + 5, 0]; }\n\nvoid dom(const int N, const int N, const int K, const int N, float *out, const float *inp) {\n  int t2, t4, t6;\nfor(t6 = 0; t6 <= K-1; t6++) {\n  s0(N-1,0,t6);\n}\n}"
     assert code == source
+
+
+def test_split_statements():
+    code = "t4=row(t2);\nif (N >= 1) {\n  s0(t2);\n}\nelse {\n  s1(t2);\n}\nfor(t6 = 0; t6 <= K-1; t6++) s2(t6);"
+    assert split_statements(code) == [
+        "t4=row(t2);",
+        "if (N >= 1) {\n  s0(t2);\n}\nelse {\n  s1(t2);\n}",
+        "for(t6 = 0; t6 <= K-1; t6++) s2(t6);",
+    ]
+
+
+def test_batch(omega_lib):
+    exprs = [
+        "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[i] += A[i, j] * x[j]",
+        "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]",
+        "lap = {[i, j, k]: 0 <= i < I ^ 0 <= j < J ^ 0 <= k < K}\nout[i, j, k] = inp[i + 1, j, k] + inp[i - 1, j, k]",
+    ]
+    expected = [CodeGenerator()(*IRParser(expr).parse()) for expr in exprs]
+
+    batch = BatchCodeGenerator()
+    assert batch.group(
+        [batch.prepare(expr) for expr in exprs + exprs[:1]], [0, 1, 2, 3]
+    ) == [[0, 1, 2], [3]]
+    assert batch(exprs) == expected
+
+
+def test_batch_split():
+    batch = BatchCodeGenerator()
+    code = (
+        "if (N >= 1) {\n  for(t2 = 0; t2 <= N-1; t2++) {\n    s0(t2);\n  }\n"
+        "  for(t2 = 0; t2 <= M-1; t2++) {\n    s1(t2);\n  }\n}\n"
+        "for(t2 = 0; t2 <= K-1; t2++) {\n  s2(t2);\n}"
+    )
+    bodies = batch.split(code, 3)
+    assert bodies[0] == ["if (N >= 1) {\nfor(t2 = 0; t2 <= N-1; t2++) {\n    s0(t2);\n  }\n}"]
+    assert bodies[1] == ["if (N >= 1) {\nfor(t2 = 0; t2 <= M-1; t2++) {\n    s0(t2);\n  }\n}"]
+    assert bodies[2] == ["for(t2 = 0; t2 <= K-1; t2++) {\n  s0(t2);\n}"]
+
+    # Shared guards with an else branch, and statements of no kernel, are not split...
+    assert batch.split("if (N >= 1) {\n  s0(t2);\n  s1(t2);\n}\nelse {\n  s1(t2);\n}", 2) is None
+    assert batch.split("t2 = 0;\ns0(t2);", 1) is None
+
+
+def test_batch_guard(tmp_path):
+    class GuardedLib:
+        def codegen(self, relmap, schedmap, names, givens):
+            loops = [f"  for(t2 = 0; t2 <= N-1; t2++) {{\n    s{n}(t2);\n  }}\n" for n in (0, 1)]
+            return "if (N >= 1) {\n" + "".join(loops) + "}"
+
+        def codegen_affine(self, *args):
+            raise ValueError("Not supported")
+
+    exprs = ["a = {[i]: 0 <= i < N}\nx[i] = 0", "b = {[i]: 0 <= i < N}\ny[i] = 1"]
+    batch = BatchCodeGenerator(backend=OmegaBackend(lib=GuardedLib()))
+    for source in batch(exprs):
+        assert "if (N >= 1) {\nfor(t2 = 0; t2 <= N-1; t2++) {\n    s0(t2);\n  }\n}" in source
+
+    # Batched sources keep the guard, so they are not served to a single generator...
+    cache = CodeCache(str(tmp_path))
+    backend = OmegaBackend(lib=GuardedLib())
+    sources = BatchCodeGenerator(cache=cache, backend=backend)(exprs)
+    space, py_ast, fields = IRParser(exprs[0]).parse()
+    single = CodeGenerator(cache=cache, backend=backend)(space, py_ast, fields)
+    assert single != sources[0]
+
+
+def test_direct(omega_lib):
+    exprs = [
+        "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[i] += A[i, j] * x[j]",
+        "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]",
+    ]
+    for expr in exprs:
+        space, py_ast, fields = IRParser(expr).parse()
+        text = CodeGenerator(direct=False)(space, py_ast, fields)
+        assert CodeGenerator(direct=True)(space, py_ast, fields) == text
+
+
+def test_direct_fallback(tmp_path):
+    class AffineLib:
+        def __init__(self, error: bool = False):
+            self.error = error
+
+        def codegen(self, relmap, schedmap, names, givens):
+            return "for(t2 = 0; t2 <= N-1; t2++) {\n  s0(t2);\n}"
+
+        def codegen_affine(self, *args):
+            if self.error:
+                raise ValueError("Unsupported constraint")
+            return "for(t2 = 0; t2 <= N-2; t2++) {\n  s0(t2);\n}"
+
+    space, py_ast, fields = IRParser("a = {[i]: 0 <= i < N}\nx[i] = 0").parse()
+    backend = OmegaBackend(lib=AffineLib(error=True))
+    assert "t2 <= N-1" in CodeGenerator(backend=backend)(space, py_ast, fields)
+
+    # Kernels generated with and without the direct path are cached apart...
+    cache = CodeCache(str(tmp_path))
+    backend = OmegaBackend(lib=AffineLib())
+    text = CodeGenerator(cache=cache, backend=backend, direct=False)(space, py_ast, fields)
+    assert "t2 <= N-1" in text
+    text = CodeGenerator(cache=cache, backend=backend, direct=True)(space, py_ast, fields)
+    assert "t2 <= N-2" in text
+
+
+def test_numpy():
+    np = pytest.importorskip("numpy")
+
+    expr = "matmul = {[i, j, k]: 0 <= i < N ^ 0 <= j < M ^ 0 <= k < K}\n"
+    expr += "C[i, j] += A[i, k] * B[k, j]"
+    matmul = numpy_kernel(*IRParser(expr).parse())
+    assert "np.einsum('ac,cb->ab'" in matmul.source
+    A = np.random.rand(4, 3).astype(np.float32)
+    B = np.random.rand(3, 5).astype(np.float32)
+    C = np.ones((4, 5), dtype=np.float32)
+    matmul(4, 5, 3, C, A, B)
+    assert np.allclose(C, 1 + A @ B)
+
+    expr = "lap = {[i, j, k]: 1 <= i < I - 1 ^ 1 <= j < J - 1 ^ 0 <= k < K}\n"
+    expr += "out[i, j, k] = -4.0 * inp[i, j, k] + inp[i + 1, j, k] + inp[i - 1, j, k] + inp[i, j - 1, k] + inp[i, j + 1, k]"
+    lap = numpy_kernel(*IRParser(expr).parse())
+    inp = np.random.rand(6, 5, 2)
+    out = np.zeros_like(inp)
+    lap(6, 5, 2, out, inp)
+    expected = np.zeros_like(inp)
+    for i in range(1, 5):
+        for j in range(1, 4):
+            for k in range(2):
+                expected[i, j, k] = -4.0 * inp[i, j, k] + inp[i + 1, j, k] + inp[i - 1, j, k] + inp[i, j - 1, k] + inp[i, j + 1, k]
+    assert np.allclose(out, expected)
+
+    # Stencils reading outside the arrays raise rather than wrap around...
+    expr = "lap = {[i]: 0 <= i < N}\nout[i] = inp[i - 1]"
+    with pytest.raises(IndexError):
+        numpy_kernel(*IRParser(expr).parse())(4, np.zeros(4), np.zeros(4))
+
+
+def test_numpy_errors():
+    exprs = [
+        "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]",
+        "tri = {[i, j]: 0 <= i < N ^ 0 <= j < i}\ny[i] += A[i, j] * x[j]",
+        "scan = {[i]: 1 <= i < N}\nx[i] = x[i - 1] + 1.0",
+    ]
+    for expr in exprs:
+        with pytest.raises(ValueError):
+            PyToNumPyTranslator()(*IRParser(expr).parse())
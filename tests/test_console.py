@@ -1,7 +1,12 @@
 # tests/test_console.py
+import json
+import sys
+
 import click.testing
 import pytest
 
+sys.path.append("./src")
+import pyomega
 from pyomega import console
 
 
@@ -11,4 +16,24 @@ def runner():
 
 
 def test_main_succeeds(runner):
-    assert runner.invoke(console.main).exit_code == 0
\ No newline at end of file
+    assert runner.invoke(console.main).exit_code == 0
+
+
+def test_parse(runner):
+    expr = "spmv = {[i, n, j]: 0 <= i < N ^ rp(i) <= n < rp(i + 1) ^ j == col(n)}\n"
+    expr += "y[i] += A[n] * x[j]"
+    result = runner.invoke(console.main, ["parse", expr])
+    assert result.exit_code == 0
+    data = json.loads(result.output)
+    assert data["iterators"] == ["i", "n", "j"] and len(data["constraints"]) == 5
+    assert data["fields"]["y"] == {"reads": 0, "writes": 1}
+
+    assert runner.invoke(console.main, ["parse"]).exit_code != 0
+    assert runner.invoke(console.main, ["parse", "s = {[i]: 0 <= i < }"]).exit_code != 0
+
+
+def test_lazy():
+    assert "bench" in console.main.list_commands(None)
+    assert pyomega.IRParser is pyomega.parser.IRParser
+    with pytest.raises(AttributeError):
+        pyomega.missing
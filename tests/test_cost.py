@@ -0,0 +1,74 @@
+# tests/test_cost.py
+import sys
+
+sys.path.append("./src")
+from pyomega.cost import Cache, CostModel
+from pyomega.parser import IRParser
+from pyomega.schedule import Schedule
+
+MATMUL = "matmul = {[i, j, k]: 0 <= i < N ^ 0 <= j < M ^ 0 <= k < K}\nC[i, j] += A[i, k] * B[k, j]"
+LAPLACE = "lap = {[i, j]: 1 <= i < N - 1 ^ 1 <= j < M - 1}\n"
+LAPLACE += "out[i, j] = inp[i + 1, j] + inp[i - 1, j] + inp[i, j + 1] + inp[i, j - 1]"
+
+
+def test_estimate():
+    space, _, fields = IRParser(MATMUL).parse()
+    model = CostModel(params={"N": 100, "M": 200, "K": 300})
+    assert model.trips(space) == {"i": 100, "j": 200, "k": 300}
+
+    estimate = model.estimate(space, fields, Schedule(["i", "j", "k"]))
+    assert estimate.iterations == 100 * 200 * 300
+    assert [level.stride1 for level in estimate.levels] == [1 / 3, 1.0, 2 / 3]
+    assert [level.reuse for level in estimate.levels] == [1 / 3] * 3
+    # One iteration of k touches an element of each field, and the k loop a row
+    # of A, a column of B and one element of C...
+    assert estimate.levels[-1].working_set == 4 * (1 + 300 + 300)
+    assert estimate.levels[-1].reuse_distance == 12
+
+    tiled = Schedule(["i", "j", "k"]).tile({"i": 10, "j": 10, "k": 10})
+    estimate = model.estimate(space, fields, tiled)
+    assert [level.trips for level in estimate.levels] == [10, 20, 30, 10, 10, 10]
+    assert estimate.levels[3].working_set == 3 * 4 * 10 * 10
+
+
+def test_stencil():
+    space, _, fields = IRParser(LAPLACE).parse()
+    model = CostModel(params={"N": 1000, "M": 1000})
+    estimate = model.estimate(space, fields, Schedule(["i", "j"]))
+    # The points of the stencil share the bounding box of the rows they touch...
+    assert estimate.levels[0].working_set == 4 * (998 * 998 + 1000 * 1000)
+    assert estimate.levels[1].working_set == 4 * (998 + 3 * 1000)
+    assert [level.stride1 for level in estimate.levels] == [0.0, 1.0]
+
+
+def test_rank():
+    space, _, fields = IRParser(MATMUL).parse()
+    model = CostModel(tile_sizes=(0,))
+    ranked = [schedule.names for schedule, _ in model.rank(space, fields)]
+    assert ranked[0][-1] == "j" and ranked[-1][-1] == "i"
+
+    model = CostModel(tile_sizes=(0, 32))
+    assert model.best(space, fields).names == ["ii", "kk", "jj", "i", "k", "j"]
+
+    # A larger L1 cache holds the whole problem, so tiling cannot help...
+    model = CostModel([Cache("L1", 1 << 30, 4.0)], params={"N": 64, "M": 64, "K": 64})
+    assert model.best(space, fields).names == ["i", "k", "j"]
+
+    space, _, fields = IRParser(LAPLACE).parse()
+    ranked = [schedule.names for schedule, _ in CostModel(tile_sizes=(0,)).rank(space, fields)]
+    assert ranked == [["i", "j"], ["j", "i"]]
+
+    expr = "spmv = {[i, n, j]: 0 <= i < N ^ rp(i) <= n < rp(i + 1) ^ j == col(n)}\n"
+    space, _, fields = IRParser(expr + "y[i] += A[n] * x[j]").parse()
+    assert CostModel().best(space, fields).names == ["i", "n", "j"]
+
+
+def test_codegen_model(omega_lib):
+    import pytest
+
+    from pyomega.visit import CodeGenerator
+
+    generator = CodeGenerator(model=CostModel(tile_sizes=(0,)))
+    source = generator(*IRParser(MATMUL).parse())
+    assert generator.loops.names == ["i", "k", "j"]
+    assert "s0(t2,t6,t4);" in source
@@ -0,0 +1,137 @@
+# tests/test_deps.py
+import sys
+
+import pytest
+
+sys.path.append("./src")
+from pyomega.deps import DependenceAnalysis
+from pyomega.parser import IRParser
+
+
+def parallel_test(expr: str, expected):
+    space, _, fields = IRParser(expr).parse()
+    analysis = DependenceAnalysis(space, fields)
+    loops = [(iterator, True) for iterator in space.iterators]
+    assert analysis.parallel_loops(loops) == expected
+
+
+def test_dense():
+    parallel_test(
+        "matmul = {[i, j, k]: 0 <= i < N ^ 0 <= j < M ^ 0 <= k < K}\nC[i, j] += A[i, k] * B[k, j]",
+        [True, True, False],
+    )
+    parallel_test(
+        "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[j] += A[i, j] * x[i]",
+        [False, True],
+    )
+
+
+def test_stencil():
+    parallel_test(
+        "lap = {[i, j]: 1 <= i < N ^ 0 <= j < M}\nu[i, j] = u[i - 1, j] + v[i, j]",
+        [False, True],
+    )
+    parallel_test(
+        "red = {[i]: 0 <= i < N}\nu[2 * i] = u[2 * i + 1]",
+        [True],
+    )
+
+
+def test_indirect():
+    parallel_test(
+        "spmv = {[i, n, j]: 0 <= i < N ^ rp(i) <= n < rp(i + 1) ^ j == col(n)}\ny[i] += A[n] * x[j]",
+        [True, False, False],
+    )
+    parallel_test(
+        "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]",
+        [False, False, False],
+    )
+    parallel_test(
+        "krp = {[n, i, j, k, r]: 0 <= n < M ^ i == ind0(n) ^ j == ind1(n) ^ k == ind2(n) ^ 0 <= r < R}\n"
+        "A[i, r] += X[n] * C[k, r] * B[j, r]",
+        [False, False, False, False, True],
+    )
+
+
+def test_codegen_pragma(omega_lib):
+    from pyomega.visit import CodeGenerator
+
+    expr = "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[i] += A[i, j] * x[j]"
+    source = CodeGenerator(parallel=True, omp_schedule="dynamic", omp_chunk=16)(*IRParser(expr).parse())
+    assert "#pragma omp parallel for schedule(dynamic, 16) private(t4)\nfor(t2 = 0;" in source
+
+    expr = "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]"
+    assert "#pragma" not in CodeGenerator(parallel=True, reduction="none")(*IRParser(expr).parse())
+
+
+def test_access_indices():
+    expr = "lap = {[i, j]: 0 <= i < N ^ 0 <= j < M}\nout[i, j] = inp[i + 1, -j] + x[col(i)]"
+    _, _, fields = IRParser(expr).parse()
+    write = fields["out"].accesses[0]
+    assert write.is_write
+    assert [index.name for index in write.indices] == ["i", "j"]
+    read = fields["inp"].accesses[0]
+    assert not read.is_write
+    assert read.indices[0].op == "+" and read.indices[1].op == "*"
+    assert fields["x"].accesses[0].indices[0].name == "col"
+
+
+def test_reductions():
+    expr = "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]"
+    space, _, fields = IRParser(expr).parse()
+    analysis = DependenceAnalysis(space, fields)
+    assert analysis.plan([("n", True)]) == [{"y": "+"}]
+    assert analysis.pattern("y", "n") == "indirect"
+    assert not analysis.is_parallel("n")
+
+    expr = "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[j] += A[i, j] * x[i]\nz[j] = y[j]"
+    space, _, fields = IRParser(expr).parse()
+    analysis = DependenceAnalysis(space, fields)
+    assert analysis.plan([("i", True), ("j", True)]) == [None, {}]
+    assert analysis.pattern("y", "i") == "direct"
+
+
+def test_codegen_reductions(tmp_path, omega_lib):
+    from pyomega.visit import CodeGenerator
+
+    expr = "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]"
+    source = CodeGenerator(parallel=True)(*IRParser(expr).parse())
+    assert '{ _Pragma("omp atomic") y[(i)] +=' in source
+    assert "#pragma omp parallel for schedule(static) private(t4, t6)\nfor(t2" in source
+
+    expr = "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[j] += A[i, j] * x[i]"
+    source = CodeGenerator(parallel=True, extents={"y": "M"})(*IRParser(expr).parse())
+    assert "reduction(+: y[0:M])\nfor(t2" in source
+    with pytest.raises(ValueError):
+        CodeGenerator(parallel=True, reduction="privatize")(*IRParser(expr).parse())
+    source = CodeGenerator(parallel=True, reduction="none")(*IRParser(expr).parse())
+    assert "#pragma omp parallel for schedule(static)\n  for(t4" in source
+
+
+def test_jit_reductions(tmp_path, omega_lib):
+    np = pytest.importorskip("numpy")
+    import shutil
+
+    if shutil.which("cc") is None:
+        pytest.skip("No C compiler available")
+    from pyomega.jit import DEFAULT_FLAGS, JITCompiler
+    from pyomega.visit import CodeGenerator
+
+    compiler = JITCompiler(flags=DEFAULT_FLAGS + ("-fopenmp",), path=str(tmp_path))
+    expr = "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]"
+    generator = CodeGenerator(standalone=True, parallel=True)
+    try:
+        kernel = compiler.compile(generator, generator(*IRParser(expr).parse()))
+    except RuntimeError:
+        pytest.skip("No OpenMP support")
+
+    nnz, size = 4000, 7
+    row = np.random.randint(0, size, nnz).astype(np.int32)
+    col = np.random.randint(0, size, nnz).astype(np.int32)
+    A = np.random.rand(nnz).astype(np.float32)
+    x = np.random.rand(size).astype(np.float32)
+    y = np.zeros(size, dtype=np.float32)
+    kernel(nnz, y, A, x, row, col)
+    expected = np.zeros(size)
+    np.add.at(expected, row, A * x[col])
+    assert np.allclose(y, expected, rtol=1e-3)
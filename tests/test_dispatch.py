@@ -0,0 +1,110 @@
+# tests/test_dispatch.py
+import sys
+
+from dataclasses import dataclass
+from typing import List
+
+import pytest
+
+sys.path.append("./src")
+from pyomega.dispatch import Dispatcher, iter_fields, lookup
+from pyomega.ir import BinOp, Constant, Function, Iterator, Literal, Node, Relation
+
+
+@dataclass
+class Leaf(Node):
+    value: int = 0
+
+
+@dataclass
+class Branch(Node):
+    children: List[Node] = ()
+
+
+class Collector(Dispatcher):
+    inherit_visitors = True
+
+    def __init__(self):
+        self.seen = []
+
+    def visit_Leaf(self, node: Leaf) -> int:
+        self.seen.append(node)
+        return node.value
+
+    def visit_Branch(self, node: Branch) -> int:
+        total = 0
+        for child in node.children:
+            total += yield child
+        return total
+
+    def generic_visit(self, node, **kwargs):
+        return 0
+
+
+def test_lookup():
+    method, is_generator = lookup(Collector, Leaf)
+    assert method is Collector.visit_Leaf and not is_generator
+    assert lookup(Collector, Branch)[1]
+    assert lookup(Collector, Leaf) is lookup(Collector, Leaf)
+
+    # Bases are only searched if visitors inherit...
+    assert lookup(Collector, BinOp) == (None, False)
+    Collector.visit_Node = lambda self, node: -1
+    try:
+        assert Collector().visit(Constant("N")) == -1
+        assert lookup(Collector, Constant, inherit=False) == (None, False)
+    finally:
+        del Collector.visit_Node
+
+
+def test_iter_fields():
+    leaf = Leaf(1)
+    branch = Branch([leaf])
+    fields = dict(iter_fields(branch))
+    assert fields["children"][0] is leaf
+
+
+def test_deep_generator():
+    tree = Leaf(1)
+    for _ in range(5 * sys.getrecursionlimit()):
+        tree = Branch([tree, Leaf(1)])
+    collector = Collector()
+    assert collector.visit(tree) == 5 * sys.getrecursionlimit() + 1
+
+
+def test_generic_visit(omega_lib):
+    from pyomega.visit import Visitor
+
+    class LeafCollector(Visitor):
+        def visit_Leaf(self, node: Leaf) -> None:
+            self.seen.append(node)
+
+    leaves = [Leaf(n) for n in range(3)]
+    tree = Branch([leaves[0], {"key": leaves[1]}])
+    for _ in range(5 * sys.getrecursionlimit()):
+        tree = Branch([tree])
+    tree = Branch([tree, [leaves[2], "text"]])
+
+    collector = LeafCollector()
+    collector.seen = []
+    collector.visit(tree)
+    assert collector.seen == leaves and collector.seen[0] is leaves[0]
+
+
+def test_deep_space(omega_lib):
+    from pyomega.visit import CodeGenerator, FunctionCollector
+
+    expr = Iterator("i")
+    for _ in range(5 * sys.getrecursionlimit()):
+        expr = BinOp(expr, "+", Literal("1"))
+    relation = Relation(left=Function("f", [Iterator("i")]), left_op="<=", right=expr)
+
+    generator = CodeGenerator()
+    generator.constants = []
+    code = generator.visit(relation)
+    assert code.startswith("f(i) <= i + 1 + 1") and code.count("+") == 5 * sys.getrecursionlimit()
+
+    collector = FunctionCollector()
+    collector.names = set()
+    collector.visit(relation)
+    assert collector.names == {"f"}
@@ -0,0 +1,40 @@
+# tests/test_engine.py
+import ast
+import pickle
+import sys
+
+import pytest
+
+sys.path.append("./src")
+from pyomega.engine import CompileEngine
+from pyomega.parser import IRParser
+
+EXPRS = [
+    "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[i] += A[i, j] * x[j]",
+    "matmul = {[i, j, k]: 0 <= i < N ^ 0 <= j < M ^ 0 <= k < K}\nC[i, j] += A[i, k] * B[k, j]",
+    "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]",
+]
+
+
+def test_specs_are_picklable():
+    space, py_ast, fields = IRParser(EXPRS[2]).parse()
+    space2, py_ast2, fields2 = pickle.loads(pickle.dumps((space, py_ast, fields)))
+    assert space2 == space
+    assert ast.dump(py_ast2) == ast.dump(py_ast)
+    assert list(fields2) == ["y", "A", "x"]
+
+
+def test_engine_order(omega_lib):
+    with CompileEngine(jobs=1) as engine:
+        expected = engine.compile(EXPRS)
+
+    specs = [IRParser(expr).parse() for expr in EXPRS]
+    with CompileEngine(jobs=2) as engine:
+        assert engine.compile(specs * 2) == expected * 2
+
+
+def test_engine_errors(omega_lib):
+    with CompileEngine(jobs=2) as engine:
+        future = engine.submit("dmv = {[i, j]: 0 <= i <")
+        with pytest.raises(SyntaxError):
+            future.result()
@@ -0,0 +1,60 @@
+# tests/test_instrument.py
+import logging
+import sys
+
+import pytest
+
+sys.path.append("./src")
+from pyomega import instrument
+from pyomega.instrument import Instrument, phase, profiling
+from pyomega.parser import IRParser
+
+MATMUL = "matmul = {[i, j, k]: 0 <= i < N ^ 0 <= j < M ^ 0 <= k < K}\nC[i, j] += A[i, k] * B[k, j]"
+
+
+def test_disabled():
+    assert instrument.active() is None
+    span = phase("omega", "matmul")
+    assert span is phase("assemble")
+    with span as inner:
+        inner.count("input_size", 10)
+
+
+def test_phases():
+    events = []
+    with profiling(Instrument([events.append])) as stats:
+        with phase("omega", "a") as span:
+            span.count("input_size", 10)
+            span.count("calls")
+        with phase("omega", "b") as span:
+            span.count("input_size", 5)
+    assert instrument.active() is None
+
+    omega = stats.stats["omega"]
+    assert omega.calls == 2 and omega.counters == {"input_size": 15, "calls": 1}
+    assert list(omega.kernels) == ["a", "b"]
+    assert omega.seconds == pytest.approx(sum(event.seconds for event in events))
+    assert [(event.phase, event.kernel) for event in events] == [("omega", "a"), ("omega", "b")]
+    assert stats.as_dict()["omega"]["calls"] == 2
+
+    stats.reset()
+    assert stats.stats == {}
+
+
+def test_log(caplog):
+    with caplog.at_level(logging.DEBUG, logger="pyomega"):
+        with profiling(Instrument(log=True)):
+            with phase("rel_parse") as span:
+                span.count("chars", 3)
+    assert caplog.records[0].event["counters"] == {"chars": 3}
+
+
+def test_pipeline(omega_lib):
+    from pyomega.visit import CodeGenerator
+
+    with profiling() as stats:
+        source = CodeGenerator()(*IRParser(MATMUL).parse())
+    assert list(stats.stats) == ["rel_parse", "comp_parse", "visit_space", "omega", "assemble"]
+    assert stats.stats["omega"].kernels.keys() == {"matmul"}
+    assert stats.stats["omega"].counters["output_size"] > 0
+    assert stats.stats["assemble"].counters["output_size"] == len(source)
@@ -0,0 +1,51 @@
+# tests/test_ir.py
+import sys
+
+sys.path.append("./src")
+from pyomega.ir import BinOp, Function, Iterator, Literal, NodeTable, Relation, Space
+from pyomega.parser import RelParser
+
+
+def test_node_table():
+    nodes = NodeTable()
+    i = nodes.iterator("i")
+    assert nodes.iterator("i") is i and nodes.constant("i") is not i
+
+    term = nodes.binop(nodes.literal("2"), "*", i)
+    assert nodes.binop(nodes.literal("2"), "*", nodes.iterator("i")) is term
+    assert nodes.binop(term, "+", nodes.constant("N")) is nodes.binop(term, "+", nodes.constant("N"))
+    assert nodes.function("rp", [i]) is nodes.function("rp", [i])
+    assert len(nodes) == 7
+
+    # Trees built elsewhere are shared through intern...
+    mid = BinOp(Literal("2"), "*", Iterator("i"))
+    tree = Relation("", Literal("0"), "<=", mid, "<", Function("rp", [Iterator("i")]))
+    shared = nodes.intern(tree)
+    assert shared == tree and shared.mid is term and shared.right is nodes.function("rp", [i])
+    assert nodes.intern(tree) is shared
+
+
+def test_add_relation():
+    space = Space()
+    relation = Relation("", Iterator("i"), "<", None, "", Literal("4"))
+    space.add_relation(relation)
+    space.add_relation(relation)
+    space.add_relation(Relation("", Iterator("i"), "<", None, "", Literal("4")))
+    assert len(space.relations) == 2
+
+    space.relations = [relation]
+    space.add_relation(relation)
+    assert space.relations == [relation]
+
+
+def test_parse_shared():
+    terms = " + ".join(["2 * i + j"] * 20)
+    relations = ["0 <= i < N", "0 <= j < M"] + [f"{terms} <= N + {n % 4}" for n in range(100)]
+    parser = RelParser(expression=f"s = {{[i, j]: {' ^ '.join(relations)}}}")
+    space = parser.parse()
+
+    assert len(space.relations) == 6
+    assert space.iterators["i"] is parser.nodes.iterator("i")
+    assert len(parser.nodes) < 100
+    lefts = {id(relation.left) for relation in space.relations[2:]}
+    assert len(lefts) == 1
@@ -0,0 +1,110 @@
+# tests/test_jit.py
+import shutil
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+if shutil.which("cc") is None:
+    pytest.skip("No C compiler available", allow_module_level=True)
+
+sys.path.append("./src")
+from pyomega.jit import JITCompiler, Kernel
+from pyomega.parser import IRParser
+
+SAXPY = "void saxpy(const int N, float *y, const float *x) {\n  for (int i = 0; i < N; i++) y[i] += 2.0f * x[i];\n}"
+
+
+def test_compile_source(tmp_path):
+    compiler = JITCompiler(path=str(tmp_path))
+    func = compiler.load(SAXPY).saxpy
+    func.restype = None
+    params = [("constant", "const int", "N"), ("field", "float *", "y"), ("field", "const float *", "x")]
+    kernel = Kernel("saxpy", params, {"y": 1, "x": 1}, func)
+
+    y = np.ones(8, dtype=np.float32)
+    x = np.arange(8, dtype=np.float32)
+    kernel(8, y, x)
+    assert np.allclose(y, 1 + 2 * x)
+
+    # Shared libraries are reused from disk...
+    assert compiler.build(SAXPY) == JITCompiler(path=str(tmp_path)).build(SAXPY)
+
+    with pytest.raises(TypeError):
+        kernel(8, y.astype(np.float64), x)
+    with pytest.raises(ValueError):
+        kernel(4, y[::2], x[:4])
+    with pytest.raises(RuntimeError):
+        compiler.build("void broken( {")
+
+
+def test_jit_dmv(tmp_path, omega_lib):
+    from pyomega.jit import jit
+
+    expr = "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[i] += A[i, j] * x[j]"
+    kernel = jit(*IRParser(expr).parse(), compiler=JITCompiler(path=str(tmp_path)))
+    assert kernel.arguments == ["N", "M", "y", "A", "x"]
+
+    A = np.random.rand(5, 3).astype(np.float32)
+    x = np.random.rand(3).astype(np.float32)
+    y = np.zeros(5, dtype=np.float32)
+    kernel(5, 3, y, A, x)
+    assert np.allclose(y, A @ x, atol=1e-5)
+
+    # Arrays smaller than the bounds imply are rejected before the call...
+    with pytest.raises(ValueError, match="'y' has 5 element"):
+        kernel(6, 3, y, A, x)
+    with pytest.raises(ValueError, match="'A' has 3 element.* dimension 1"):
+        kernel(5, 4, y, A, np.zeros(4, dtype=np.float32))
+    kernel(0, 3, y[:0], A[:0], x)
+
+
+def test_jit_spmv(tmp_path, omega_lib):
+    from pyomega.jit import jit
+
+    expr = "spmv = {[i, n, j]: 0 <= i < N ^ rp(i) <= n < rp(i + 1) ^ j == col(n)}\n"
+    expr += "y[i] += A[n] * x[j]"
+    kernel = jit(*IRParser(expr).parse(), compiler=JITCompiler(path=str(tmp_path)))
+    assert kernel.arguments == ["N", "y", "A", "x", "rp", "col"]
+
+    dense = np.array([[1, 0, 2], [0, 0, 3], [4, 5, 0]], dtype=np.float32)
+    rows, cols = np.nonzero(dense)
+    rp = np.searchsorted(rows, np.arange(4)).astype(np.int32)
+    col = cols.astype(np.int32)
+    A = dense[rows, cols]
+    x = np.array([1, 2, 3], dtype=np.float32)
+    y = np.zeros(3, dtype=np.float32)
+    kernel(3, y, A, x, rp, col)
+    assert np.allclose(y, dense @ x)
+
+    with pytest.raises(ValueError, match="'x' has 2 element"):
+        kernel(3, y, A, x[:2], rp, col)
+    with pytest.raises(ValueError, match="'col' has 4 element"):
+        kernel(3, y, A, x, rp, col[:4])
+    with pytest.raises(ValueError, match="'rp' has 3 element"):
+        kernel(3, y, A, x, rp[:3], col)
+
+
+def test_jit_counters(tmp_path, omega_lib):
+    from pyomega.jit import jit
+
+    expr = "spmv = {[i, n, j]: 0 <= i < N ^ rp(i) <= n < rp(i + 1) ^ j == col(n)}\n"
+    expr += "y[i] += A[n] * x[j]"
+    kernel = jit(*IRParser(expr).parse(), compiler=JITCompiler(path=str(tmp_path)), counters=True)
+    assert kernel.arguments == ["N", "y", "A", "x", "rp", "col"]
+
+    rp = np.array([0, 2, 2, 7], dtype=np.int32)
+    col = np.array([0, 1, 0, 1, 2, 0, 1], dtype=np.int32)
+    A = np.ones(7, dtype=np.float32)
+    x = np.ones(3, dtype=np.float32)
+    y = np.zeros(3, dtype=np.float32)
+    counters = kernel(3, y, A, x, rp, col)
+    assert np.allclose(y, [2, 0, 5])
+
+    assert counters.iterations == {"i": 3, "n": 7, "j": 7}
+    assert counters.executions == {"s0": 7}
+    assert counters.bytes_read == {"y": 28, "A": 28, "x": 28}
+    assert counters.bytes_written == {"y": 28}
+    assert (counters.min_work, counters.max_work) == (0, 5)
+    assert counters.imbalance == pytest.approx(5 * 3 / 7)
+    assert counters.seconds >= 0
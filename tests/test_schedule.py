@@ -0,0 +1,153 @@
+# tests/test_schedule.py
+import shutil
+import sys
+
+import pytest
+
+sys.path.append("./src")
+from pyomega.parser import IRParser
+from pyomega.schedule import Schedule
+
+MATMUL = "matmul = {[i, j, k]: 0 <= i < N ^ 0 <= j < M ^ 0 <= k < K}\nC[i, j] += A[i, k] * B[k, j]"
+
+
+def test_tile():
+    schedule = Schedule(["i", "j", "k"]).tile({"i": 64, "j": 64}).tile({"i": 8, "j": 8})
+    assert schedule.names == ["ii", "jj", "iii", "jjj", "i", "j", "k"]
+    assert schedule.relation("matmul") == (
+        "r0matmul := {[i, j, k] -> [0, ii, 0, jj, 0, iii, 0, jjj, 0, i, 0, j, 0, k, 0]: "
+        "64*ii <= i <= 64*ii + 63 && 64*jj <= j <= 64*jj + 63 && "
+        "8*iii <= i <= 8*iii + 7 && 8*jjj <= j <= 8*jjj + 7}"
+    )
+
+    outputs, constraints = schedule.affine()
+    assert len(outputs) == 15
+    # c2 is the 'ii' tile: 64*c2 <= i <= 64*c2 + 63
+    assert [(c.expr.coeffs, c.expr.const) for c in constraints[-8:-6]] == [
+        ({"i": 1, "c2": -64}, 0),
+        ({"i": -1, "c2": 64}, 63),
+    ]
+
+
+def test_permute():
+    schedule = Schedule(["i", "j", "k"]).permute(["k", "i", "j"])
+    assert schedule.relation("matmul", 1, 4) == "r0matmul := {[i, j, k] -> [1, k, 0, i, 0, j, 0, 0, 0]}"
+
+    schedule = Schedule(["i", "j"]).tile({"i": 16})
+    with pytest.raises(ValueError):
+        schedule.permute(["i", "ii"])
+    with pytest.raises(ValueError):
+        Schedule(["i"]).tile({"q": 4})
+
+
+def test_codegen_tiled(omega_lib):
+    from pyomega.visit import CodeGenerator
+
+    schedule = Schedule(["i", "j", "k"]).tile({"i": 32, "j": 32, "k": 32})
+    source = CodeGenerator(transform=schedule)(*IRParser(MATMUL).parse())
+    assert "int t2, t4, t6, t8, t10, t12;" in source
+    assert "s0(t8,t10,t12);" in source
+    assert "#define intFloor(x, y)" in source
+
+
+def test_helper_dependencies():
+    from pyomega.visit import CodeGenerator
+
+    generator = CodeGenerator()
+    generator.prepare(*IRParser(MATMUL).parse())
+    code = "for(t2 = 0; t2 <= intCeil(N, 32); t2++) {\n  s0(t2, 0, intMod(t2, 4));\n}"
+    source = generator.function(code)
+    for helper in ("intCeil", "intMod", "intFloor"):
+        assert source.count(f"#define {helper}(x, y)") == 1
+    assert "#define min(" not in source
+
+
+def test_jit_tiled(tmp_path, omega_lib):
+    np = pytest.importorskip("numpy")
+    if shutil.which("cc") is None:
+        pytest.skip("No C compiler available")
+    from pyomega.jit import JITCompiler
+    from pyomega.visit import CodeGenerator
+
+    schedule = Schedule(["i", "j", "k"]).tile({"i": 4, "j": 4}).tile({"i": 2}).permute(["k", "i"])
+    generator = CodeGenerator(standalone=True, transform=schedule)
+    source = generator(*IRParser(MATMUL).parse())
+    kernel = JITCompiler(path=str(tmp_path)).compile(generator, source)
+
+    A = np.random.rand(7, 5).astype(np.float32)
+    B = np.random.rand(5, 9).astype(np.float32)
+    C = np.zeros((7, 9), dtype=np.float32)
+    kernel(7, 9, 5, C, A, B)
+    assert np.allclose(C, A @ B, atol=1e-5)
+
+
+LAPLACE2 = """lap1 = {[i, j]: 1 <= i < N - 1 ^ 1 <= j < M - 1}
+tmp[i, j] = -4.0 * inp[i, j] + inp[i + 1, j] + inp[i - 1, j] + inp[i, j - 1] + inp[i, j + 1]
+lap2 = {[i, j]: 2 <= i < N - 2 ^ 2 <= j < M - 2}
+out[i, j] = -4.0 * tmp[i, j] + tmp[i + 1, j] + tmp[i - 1, j] + tmp[i, j - 1] + tmp[i, j + 1]"""
+
+
+def test_fuse():
+    from pyomega.schedule import distribute, fuse
+
+    computation = IRParser(LAPLACE2).computation("lap2x")
+    assert [statement.space.name for statement in computation.statements] == ["lap1", "lap2"]
+    assert list(computation.fields) == ["tmp", "inp", "out"]
+    assert len(computation.fields["tmp"].accesses) == 6
+
+    fuse(computation)
+    assert [statement.schedule for statement in computation.statements] == [(0, 0, 0), (0, 0, 1)]
+    assert [statement.shifts for statement in computation.statements] == [(0, 0), (1, 1)]
+
+    schedule = Schedule(["i", "j"], {"i": 1, "j": 1})
+    assert schedule.relation("lap2", (0, 0, 1)) == "r0lap2 := {[i, j] -> [0, i + 1, 0, j + 1, 1]}"
+
+    fuse(computation, 1)
+    assert [statement.shifts for statement in computation.statements] == [(0,), (1,)]
+    distribute(computation)
+    assert [statement.schedule for statement in computation.statements] == [(0,), (1,)]
+
+    transposed = "a = {[i, j]: 0 <= i < N ^ 0 <= j < N}\nx[i, j] = y[i, j]\n"
+    transposed += "b = {[i, j]: 0 <= i < N ^ 0 <= j < N}\nz[i, j] = x[j, i]"
+    with pytest.raises(ValueError):
+        fuse(IRParser(transposed).computation())
+
+
+def test_codegen_fused(omega_lib):
+    from pyomega.schedule import fuse
+    from pyomega.visit import ComputationGenerator
+
+    computation = fuse(IRParser(LAPLACE2).computation("lap2x"))
+    source = ComputationGenerator()(computation)
+    assert "void lap2x(const int N, const int M, float *tmp, const float *inp, float *out) {" in source
+    assert "s0(t2,t4);\n        s1(t2-1,t4-1);" in source
+
+
+def test_jit_fused(tmp_path, omega_lib):
+    np = pytest.importorskip("numpy")
+    if shutil.which("cc") is None:
+        pytest.skip("No C compiler available")
+    from pyomega.jit import JITCompiler
+    from pyomega.schedule import distribute, fuse
+    from pyomega.visit import ComputationGenerator
+
+    compiler = JITCompiler(path=str(tmp_path))
+    inp = np.random.rand(9, 8).astype(np.float32)
+    results = []
+    for schedule in (distribute, fuse):
+        generator = ComputationGenerator(standalone=True)
+        source = generator(schedule(IRParser(LAPLACE2).computation("lap2x")))
+        kernel = compiler.compile(generator, source)
+        tmp = np.zeros_like(inp)
+        out = np.zeros_like(inp)
+        kernel(9, 8, tmp, inp, out)
+        results.append(out)
+
+    def laplace(a):
+        b = np.zeros_like(a)
+        b[1:-1, 1:-1] = -4.0 * a[1:-1, 1:-1] + a[2:, 1:-1] + a[:-2, 1:-1] + a[1:-1, :-2] + a[1:-1, 2:]
+        return b
+
+    expected = laplace(laplace(inp))
+    for out in results:
+        assert np.allclose(out[2:-2, 2:-2], expected[2:-2, 2:-2], atol=1e-4)
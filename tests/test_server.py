@@ -0,0 +1,103 @@
+# tests/test_server.py
+import asyncio
+import json
+import socket
+import sys
+
+import pytest
+
+sys.path.append("./src")
+from pyomega.engine import compile_spec
+from pyomega.server import CompileClient, CompileServer
+
+DMV = "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[i] += A[i, j] * x[j]"
+
+
+def serve(path, test, **kwargs):
+    async def run():
+        server = CompileServer(str(path), **kwargs)
+        await server.start()
+        try:
+            return await test(server)
+        finally:
+            await server.close()
+
+    return asyncio.run(run())
+
+
+def test_server_compile(tmp_path, omega_lib):
+    specs = [f"k{n} = {{[i]: 0 <= i < N}}\nx[i] = {n}" for n in range(16)]
+
+    async def test(server):
+        async with await CompileClient.connect(server.path) as first:
+            async with await CompileClient.connect(server.path) as second:
+                sources = await asyncio.gather(
+                    *(client.compile(spec) for spec in specs for client in (first, second))
+                )
+                with pytest.raises(RuntimeError, match="SyntaxError"):
+                    await first.compile("bad = {[i]: 0 <=")
+                assert await first.ping() > 0
+                return sources, await second.stats()
+
+    # A queue of one slot still serves many pipelined requests from two clients...
+    sources, stats = serve(tmp_path / "pyomega.sock", test, queue_size=1)
+    assert sources == [compile_spec(spec) for spec in specs for _ in range(2)]
+    assert stats["requests"] == 33
+    assert stats["failed"] == 1
+    assert stats["memo_hits"] + stats["coalesced"] == 16
+
+
+def test_server_protocol(tmp_path, omega_lib):
+    async def test(server):
+        reader, writer = await asyncio.open_unix_connection(server.path)
+        writer.write(b'{"id": 7, "spec": "%s"}\n' % DMV.replace("\n", "\\n").encode())
+        writer.write(b"[1, 2]\n")
+        writer.write(b'{"id": 8, "op": "restart"}\n')
+        responses = [json.loads(await reader.readline()) for _ in range(3)]
+        writer.close()
+        return {response["id"]: response for response in responses}
+
+    responses = serve(tmp_path / "pyomega.sock", test)
+    assert responses[7]["ok"] and responses[7]["source"] == compile_spec(DMV)
+    assert "Invalid request" in responses[None]["error"]
+    assert responses[8]["error"] == "Unknown operation 'restart'"
+
+
+def test_server_shutdown(tmp_path, omega_lib):
+    path = tmp_path / "pyomega.sock"
+
+    async def run():
+        server = CompileServer(str(path))
+        await server.start()
+        async with await CompileClient.connect(server.path) as client:
+            await client.shutdown()
+        await asyncio.wait_for(server.serve_forever(), 10)
+
+    asyncio.run(run())
+    assert not path.exists()
+
+
+def test_server_claim(tmp_path, omega_lib):
+    path = tmp_path / "pyomega.sock"
+
+    async def test(server):
+        second = CompileServer(server.path)
+        try:
+            with pytest.raises(RuntimeError, match="already listening"):
+                await second.start()
+        finally:
+            await second.close()
+        async with await CompileClient.connect(server.path) as client:
+            return await client.ping()
+
+    # A socket left by a server that did not shut down is replaced...
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(str(path))
+    stale.close()
+    assert serve(path, test) > 0
+    assert not path.exists()
+
+    path.write_text("")
+    with pytest.raises(RuntimeError, match="not a socket"):
+        serve(path, test)
+    assert path.exists()
@@ -0,0 +1,56 @@
+# tests/test_stress.py
+import sys
+
+import click.testing
+import pytest
+
+sys.path.append("./src")
+from pyomega.parser import IRParser
+from pyomega.stress import PHASES, Profile, Spec, growth, main, profile, sweep
+
+
+def test_spec():
+    space, body = Spec(iterators=3, constraints=2, ufuncs=1, terms=2).source()
+    assert space == (
+        "kernel = {[i0, i1, i2]: 0 <= i0 < N ^ 0 <= i1 < N ^ 0 <= i2 < N ^ "
+        "f0(i0) <= i1 < f0(i0 + 1) ^ i0 + i1 <= 2 * N + 0 ^ i1 - i2 <= N + 1}"
+    )
+    assert body == "out[i0, i2] += a0[i0] * b0[i2] + a1[i1] * b1[i2]"
+
+    space, _, fields = IRParser(f"{space}\n{body}").parse()
+    assert len(space.iterators) == 3 and len(space.relations) == 6
+    assert list(fields) == ["out", "a0", "b0", "a1", "b1"]
+
+    with pytest.raises(ValueError):
+        Spec(iterators=1, ufuncs=1).source()
+
+
+def test_growth():
+    profiles = [
+        Profile(Spec(terms=n), {phase: n * n * 1e-3 for phase in PHASES}, {})
+        for n in (0, 2, 4, 8)
+    ]
+    exponents = growth("terms", profiles)
+    assert exponents["omega"] == pytest.approx(2.0)
+    assert exponents["total"] == pytest.approx(2.0)
+
+
+def test_profile(omega_lib):
+    result = profile(Spec(iterators=3, constraints=4, ufuncs=1), repeat=1)
+    assert list(result.times) == list(PHASES) and list(result.peaks) == list(PHASES)
+    assert all(seconds > 0 for seconds in result.times.values())
+    assert result.peaks["comp_parse"] > 0
+
+    profiles = sweep("terms", [1, 2], repeat=1, memory=False)
+    assert [p.spec.terms for p in profiles] == [1, 2] and profiles[0].peaks == {}
+    with pytest.raises(ValueError):
+        sweep("loops", [1])
+
+
+def test_main(tmp_path, omega_lib):
+    output = str(tmp_path / "stress.json")
+    runner = click.testing.CliRunner()
+    result = runner.invoke(main, ["-s", "iterators=2,3", "--repeat", "1", "-o", output])
+    assert result.exit_code == 0, result.output
+    assert "rel_parse" in result.output
+    assert runner.invoke(main, ["-s", "iterators=a"]).exit_code != 0
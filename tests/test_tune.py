@@ -0,0 +1,133 @@
+# tests/test_tune.py
+import json
+import shutil
+import sys
+
+import pytest
+
+sys.path.append("./src")
+from pyomega.deps import DependenceAnalysis
+from pyomega.parser import IRParser
+from pyomega.tune import Autotuner, TuningDatabase, kernel_key, legal_orders, rebuild
+
+MATMUL = "matmul = {[i, j, k]: 0 <= i < N ^ 0 <= j < M ^ 0 <= k < K}\nC[i, j] += A[i, k] * B[k, j]"
+
+
+def test_legal():
+    space, _, fields = IRParser(MATMUL).parse()
+    analysis = DependenceAnalysis(space, fields)
+    assert analysis.is_legal([("k", True), ("j", True), ("i", True)])
+
+    expr = "skew = {[i, j]: 1 <= i < N ^ 0 <= j < M - 1}\nu[i, j] = u[i - 1, j + 1]"
+    space, _, fields = IRParser(expr).parse()
+    analysis = DependenceAnalysis(space, fields)
+    assert analysis.is_legal([("i", True), ("j", True)])
+    assert not analysis.is_legal([("j", True), ("i", True)])
+    assert not analysis.is_legal([("ii", False), ("i", True), ("j", True)])
+
+
+def test_candidates(tmp_path):
+    tuner = Autotuner(database=TuningDatabase(str(tmp_path / "tuning.json")), tile_sizes=(0, 16))
+    space, _, fields = IRParser(MATMUL).parse()
+    assert len(legal_orders(space, fields)) == 6
+    names = [schedule.names for schedule in tuner.candidates(space, fields)]
+    assert names[:2] == [["i", "j", "k"], ["ii", "jj", "kk", "i", "j", "k"]]
+    assert len(names) == 12
+
+    expr = "spmv = {[i, n, j]: 0 <= i < N ^ rp(i) <= n < rp(i + 1) ^ j == col(n)}\n"
+    space, _, fields = IRParser(expr + "y[i] += A[n] * x[j]").parse()
+    assert legal_orders(space, fields) == [["i", "n", "j"]]
+    assert [schedule.names for schedule in tuner.candidates(space, fields)] == [["i", "n", "j"]]
+
+    expr = "krp = {[n, i, j, k, r]: 0 <= n < M ^ i == ind0(n) ^ j == ind1(n) ^ k == ind2(n) ^ 0 <= r < R}\n"
+    space, _, fields = IRParser(expr + "A[i, r] += X[n] * C[k, r] * B[j, r]").parse()
+    assert legal_orders(space, fields) == [["n", "i", "j", "k", "r"], ["r", "n", "i", "j", "k"]]
+
+
+def test_database(tmp_path):
+    path = str(tmp_path / "tuning.json")
+    record = dict(order=["kk", "ii", "k", "i", "j"], tiles=[{"i": 8, "k": 4}])
+    TuningDatabase(path, "here").put("key", record)
+    assert TuningDatabase(path, "here").get("key") == record
+    assert TuningDatabase(path, "there").get("key") is None
+    with open(path) as file:
+        assert list(json.load(file)) == ["here"]
+
+    schedule = rebuild(["i", "j", "k"], record)
+    assert schedule.names == record["order"]
+    assert [loop.size for loop in schedule.loops] == [4, 8, 0, 0, 0]
+
+
+def test_database_concurrent_puts(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    path = str(tmp_path / "tuning.json")
+
+    def put(n):
+        TuningDatabase(path, f"machine{n % 2}").put(f"key{n}", dict(order=["i"]))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(put, range(64)))
+    for n in range(64):
+        assert TuningDatabase(path, f"machine{n % 2}").get(f"key{n}") == dict(order=["i"])
+
+
+def test_autotune_baseline(tmp_path):
+    pytest.importorskip("numpy")
+
+    class Reverse:
+        def rank(self, space, fields, schedules):
+            return [(schedule, 0.0) for schedule in reversed(schedules)]
+
+    class Tuner(Autotuner):
+        def compile(self, space, ast, fields, schedule):
+            return schedule
+
+        def measure(self, kernel, inputs):
+            return 1.0 if kernel.is_identity else 0.5
+
+    database = TuningDatabase(str(tmp_path / "tuning.json"))
+    tuner = Tuner(object(), database, tile_sizes=(0,), check=False, model=Reverse())
+    space, ast, fields = IRParser(MATMUL).parse()
+
+    # The original order is the baseline even when the model ranks it last...
+    record = tuner.tune(space, ast, fields, ())
+    assert tuner.results[0][0].is_identity
+    assert record["baseline"] == 1.0 and record["seconds"] == 0.5
+    assert record["candidates"] == 6
+
+
+def test_autotune(tmp_path, omega_lib):
+    np = pytest.importorskip("numpy")
+    if shutil.which("cc") is None:
+        pytest.skip("No C compiler available")
+    from pyomega.jit import JITCompiler, jit
+    from pyomega.visit import CodeGenerator
+
+    compiler = JITCompiler(path=str(tmp_path / "jit"))
+    database = TuningDatabase(str(tmp_path / "tuning.json"))
+    tuner = Autotuner(compiler, database, tile_sizes=(0, 8), repeat=2)
+
+    space, ast, fields = IRParser(MATMUL).parse()
+    A = np.random.rand(24, 16).astype(np.float32)
+    B = np.random.rand(16, 20).astype(np.float32)
+    C = np.zeros((24, 20), dtype=np.float32)
+    schedule = tuner(space, ast, fields, (24, 20, 16, C, A, B))
+    assert len(tuner.results) == 12
+
+    record = database.get(kernel_key(space, ast, fields))
+    assert record["order"] == schedule.names and record["candidates"] == 12
+
+    # Stored schedules are reused without tuning again...
+    tuner.results = []
+    assert tuner(space, ast, fields, ()).names == schedule.names
+    assert tuner.results == []
+
+    generator = CodeGenerator(tuning=database)
+    generator.prepare(space, ast, fields)
+    assert generator.loops.names == schedule.names
+
+    kernel = jit(space, ast, fields, compiler, tuning=database)
+    C = np.zeros((24, 20), dtype=np.float32)
+    kernel(24, 20, 16, C, A, B)
+    assert np.allclose(C, A @ B, atol=1e-5)
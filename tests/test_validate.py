@@ -0,0 +1,84 @@
+# tests/test_validate.py
+import sys
+
+import pytest
+
+pytest.importorskip("pycparser")
+
+sys.path.append("./src")
+from pyomega.validate import Validator, check, parser, preprocess
+
+KERNEL = """#ifndef min
+#define min(x, y) ((x) < (y) ? (x) : (y))
+#endif
+#define s0(i, j) { _Pragma("omp atomic") y[(i)] += A[((i)) * A_stride0 + (j)] * x[(j)]; }
+
+void dmv(const int N, const int M, float *y, const float *A, const float *x, const int A_stride0) {
+  int t2, t4;
+#pragma omp parallel for schedule(static) private(t4)
+for(t2 = 0; t2 <= N-1; t2++) {
+  for(t4 = 0; t4 <= min(M-1,t2); t4++) {
+    s0(t2,t4);
+  }
+}
+}"""
+
+
+def test_preprocess():
+    source = preprocess(KERNEL)
+    assert "#" not in source and "_Pragma" not in source
+    assert "void pyomega_macro_min(void) { (void)(((x) < (y) ? (x) : (y))); }" in source
+    assert parser() is parser()
+    assert check(KERNEL) == (True, "")
+
+    valid, error = check(KERNEL.replace("t4++) {", "t4++ {"))
+    assert not valid and error
+    assert not check(KERNEL.replace("+= A", "+= A +"))[0]
+
+
+def test_validator():
+    broken = KERNEL.replace("int t2, t4;", "int t2 t4;")
+    validator = Validator(capacity=2)
+    results = validator.batch([KERNEL, broken, KERNEL])
+    assert [result.valid for result in results] == [True, False, True]
+    assert results[0] is results[2] and results[1].error
+
+    assert validator(KERNEL) is results[0]
+    validator(KERNEL.replace("dmv", "dmv2"))
+    assert len(validator.results) == 2 and results[1].key not in validator.results
+
+
+def test_validator_eviction(monkeypatch):
+    import pyomega.validate as validate
+
+    validator = Validator()
+    cached = validator(KERNEL)
+    checked = validate._validate
+
+    def evicting(item):
+        validator.results.clear()  # As another thread evicting the cached result...
+        return checked(item)
+
+    monkeypatch.setattr(validate, "_validate", evicting)
+    results = validator.batch([KERNEL, KERNEL.replace("dmv", "dmv2")])
+    assert results[0] is cached and results[1].valid
+    assert list(validator.results) == [result.key for result in results]
+
+
+def test_pool():
+    sources = [KERNEL.replace("dmv", f"dmv{n}") for n in range(4)] + ["void f( {"]
+    with Validator(jobs=2) as validator:
+        results = validator.batch(sources)
+    assert [result.valid for result in results] == [True] * 4 + [False]
+
+
+def test_batch_codegen(omega_lib):
+    from pyomega.visit import BatchCodeGenerator
+
+    exprs = [
+        "dmv = {[i, j]: 0 <= i < N ^ 0 <= j < M}\ny[i] += A[i, j] * x[j]",
+        "spmv = {[n, i, j]: 0 <= n < M ^ i == row(n) ^ j == col(n)}\ny[i] += A[n] * x[j]",
+    ]
+    validator = Validator()
+    BatchCodeGenerator(validator=validator)(exprs)
+    assert len(validator.results) == 2